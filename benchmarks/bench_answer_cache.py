@@ -0,0 +1,210 @@
+"""Hit rate and latency saved by the semantic answer cache on FAQ-style questions.
+
+    python -m benchmarks.bench_answer_cache [--turns 200] [--llm-latency 0.2] [--threshold 0.75]
+
+Sends `turns` questions, each as the first message of a new conversation of
+one of several passengers, to an agent with an AnswerCache and to one without.
+The questions are rewordings of a few policy FAQs, in Persian and English,
+drawn with Zipf-like frequencies, plus greetings and policy questions whose
+answer names the passenger's ticket. A ScriptedChatModel that sleeps
+`llm-latency` per call looks the policy up and answers with the FAQ's answer.
+
+Reports the hit rate, the mean turn latency of hits, misses and the agent
+without cache, and checks that:
+
+  - every hit is the answer of the FAQ that was asked,
+  - no answer naming a ticket is ever served from the cache,
+  - a cached question asked later in a conversation is neither answered
+    from the cache nor stored, its meaning may depend on the turns before,
+  - editing the policy file empties the cache.
+
+Exits with status 1 if a check fails.
+"""
+import argparse
+import os
+import random
+import shutil
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+import uuid
+
+os.environ.setdefault("TAVILY_API_KEY", "offline")
+
+from benchmarks.fixtures import PASSENGER_ID, make_travel_db
+
+FAQS = {
+    "refund": (
+        ["سیاست استرداد بلیط چیه؟", "قوانین استرداد بلیط چیه", "سیاست استرداد بلیط چیست؟"],
+        "استرداد بلیط تا ۳ ساعت قبل از پرواز با کسر جریمه امکان پذیر است.",
+    ),
+    "refund_en": (
+        ["what is the refund policy", "what's the refund policy?", "tell me the refund policy"],
+        "Tickets can be refunded up to 3 hours before departure, minus a fee.",
+    ),
+    "baggage": (
+        ["چقدر بار می تونم با خودم ببرم؟", "چقدر بار میتونم ببرم؟", "چه مقدار بار می تونم ببرم"],
+        "در پروازهای داخلی ۲۰ کیلوگرم بار مجاز است.",
+    ),
+    "baggage_en": (
+        ["what is the baggage allowance", "what's my baggage allowance?", "baggage allowance please"],
+        "Domestic flights allow 20 kg of checked baggage.",
+    ),
+    "pets": (
+        ["آیا میشه حیوان خانگی رو با خودم ببرم؟", "میشه حیوان خانگی با خودم ببرم؟"],
+        "حمل حیوان خانگی فقط با هماهنگی قبلی با ایرلاین ممکن است.",
+    ),
+    "change": (
+        ["آیا اجازه دارم پروازم رو تغییر بدم؟", "اجازه دارم پروازم رو تغییر بدم؟"],
+        "تغییر پرواز تا ۳ ساعت قبل از حرکت امکان پذیر است.",
+    ),
+}
+# answered from the policy and the passenger's ticket: must never be cached
+PERSONAL = ["با بلیط من میشه پول رو پس گرفت؟", "can I get a refund for my ticket?"]
+GREETINGS = ["سلام", "hello", "ممنون"]
+
+
+def workload(turns, seed=0):
+    rng = random.Random(seed)
+    kinds = list(FAQS) + ["personal", "greeting"]
+    weights = [1 / (rank + 1) for rank in range(len(FAQS))] + [0.3, 0.3]
+    for _ in range(turns):
+        kind = rng.choices(kinds, weights)[0]
+        if kind == "personal":
+            yield kind, rng.choice(PERSONAL)
+        elif kind == "greeting":
+            yield kind, rng.choice(GREETINGS)
+        else:
+            yield kind, rng.choice(FAQS[kind][0])
+
+
+def make_responder(tickets):
+    from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+
+    answers = {text: (kind, answer) for kind, (texts, answer) in FAQS.items() for text in texts}
+
+    def respond(messages):
+        last = max(i for i, m in enumerate(messages) if isinstance(m, HumanMessage))
+        question = messages[last].content
+        # the prompt ends with the context system message, the tool answer comes before it
+        looked_up = any(isinstance(m, ToolMessage) for m in messages[last:])
+        if question in GREETINGS:
+            return AIMessage(content="سلام! چطور می تونم کمک کنم؟")
+        if not looked_up:
+            return AIMessage(content="", tool_calls=[{"name": "lookup_policy", "args": {"query": question},
+                                                      "id": "call_" + uuid.uuid4().hex[:12]}])
+        if question in PERSONAL:
+            # the passenger's flights are in the prompt
+            prompt = "".join(str(m.content) for m in messages)
+            ticket = next(ticket for ticket in tickets.values() if ticket in prompt)
+            return AIMessage(content=f"بلیط {ticket} شما قابل استرداد است.")
+        return AIMessage(content=answers[question][1])
+    return respond
+
+
+def send(agent, text, config):
+    """(seconds, served from the cache, answer) of one turn."""
+    from langchain_core.messages import AIMessage
+
+    start = time.perf_counter()
+    for _ in agent.graph.stream({"messages": ("user", text)}, config, stream_mode="values"):
+        pass
+    wall = time.perf_counter() - start
+    last = agent.graph.get_state(config).values["messages"][-1]
+    hit = isinstance(last, AIMessage) and last.response_metadata.get("answer_cache") == "hit"
+    return wall, hit, last.content
+
+
+def run(agent, llm, turns, passengers, tickets):
+    results = []
+    for i, (kind, text) in enumerate(turns):
+        passenger = passengers[i % len(passengers)]
+        config = {"configurable": {"passenger_id": passenger, "thread_id": str(uuid.uuid4())}}
+        results.append((kind, text, *send(agent, text, config)))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--turns", type=int, default=200)
+    parser.add_argument("--llm-latency", type=float, default=0.2)
+    parser.add_argument("--threshold", type=float, default=0.75)
+    parser.add_argument("--passengers", type=int, default=5)
+    args = parser.parse_args()
+
+    from langchain_core.embeddings import DeterministicFakeEmbedding
+
+    from src.agent import CustomerSupportAgent
+    from src.models.answer_cache import AnswerCache
+    from src.models.stub_llm import ScriptedChatModel, StubChatModel
+    from src.tools.db import prepare_db
+    from src.tools.registry import handlers
+
+    turns = list(workload(args.turns))
+    with tempfile.TemporaryDirectory() as tmp:
+        db = os.environ["TRAVEL_DB_PATH"] = make_travel_db(os.path.join(tmp, "travel.sqlite"))
+        prepare_db(db)
+        conn = sqlite3.connect(db)
+        tickets = dict(conn.execute(
+            "SELECT passenger_id, MIN(ticket_no) FROM tickets GROUP BY passenger_id ORDER BY passenger_id = ? DESC,"
+            " passenger_id LIMIT ?", (PASSENGER_ID, args.passengers)).fetchall())
+        conn.close()
+        passengers = list(tickets)
+        handlers.configure("general", chroma_persist_dir=os.path.join(tmp, "chroma"))
+        policy_file = shutil.copy("files/alibaba.md", os.path.join(tmp, "alibaba.md"))
+        cache = AnswerCache(threshold=args.threshold, policy_file=policy_file)
+        results = {}
+        for name, answer_cache in (("no cache", None), ("answer cache", cache)):
+            llm = ScriptedChatModel(latency=args.llm_latency, script=[make_responder(tickets)])
+            agent = CustomerSupportAgent(
+                llm=llm, tool_llm=StubChatModel(response="refund policy"),
+                embeddings=DeterministicFakeEmbedding(size=256), answer_cache=answer_cache)
+            agent.logger.log_event = lambda event, config=None: None
+            agent.warmup()
+            results[name] = run(agent, llm, turns, passengers, tickets)
+
+        stats = cache.stats()
+        probe = FAQS["refund"][0][0]
+        config = {"configurable": {"passenger_id": PASSENGER_ID, "thread_id": str(uuid.uuid4())}}
+        send(agent, GREETINGS[0], config)
+        _, follow_up_hit, _ = send(agent, probe, config)
+        follow_up_ok = not follow_up_hit and cache.stats()["stores"] == stats["stores"]
+        cached_before = cache.lookup(probe) is not None
+        with open(policy_file, "a") as f:
+            f.write("\n\nبند جدید: استرداد بلیط چارتری امکان پذیر نیست.\n")
+        invalidated = cached_before and cache.lookup(probe) is None and cache.stats()["size"] == 0
+        handlers.reset()
+
+    answers = {text: answer for texts, answer in FAQS.values() for text in texts}
+    hits = [r for r in results["answer cache"] if r[3]]
+    misses = [r for r in results["answer cache"] if not r[3]]
+    wrong = [r for r in hits if answers.get(r[1]) != r[4]]
+    personal = [r for r in hits if any(ticket in r[4] for ticket in tickets.values())]
+    policy_turns = [r for r in results["answer cache"] if r[0] in FAQS]
+
+    print(f"{args.turns} first turns, {len(passengers)} passengers, {args.llm_latency * 1e3:.0f}ms per model call,"
+          f" threshold {args.threshold}")
+    print(f"  hit rate        {len(hits) / len(turns):7.1%} of all turns,"
+          f" {len(hits) / len(policy_turns):.1%} of FAQ turns ({stats['stores']} answers stored)")
+    print(f"  cache lookup    {stats['lookup_ms_mean']:7.3f}ms mean")
+    print(f"  {'':14s} {'turns':>6s} {'mean':>9s}")
+    print(f"  no cache       {len(turns):6d} {statistics.mean(r[2] for r in results['no cache']) * 1e3:7.1f}ms")
+    print(f"  with cache     {len(turns):6d} {statistics.mean(r[2] for r in results['answer cache']) * 1e3:7.1f}ms")
+    print(f"    hits         {len(hits):6d} {statistics.mean(r[2] for r in hits) * 1e3:7.1f}ms" if hits else "    hits 0")
+    print(f"    misses       {len(misses):6d} {statistics.mean(r[2] for r in misses) * 1e3:7.1f}ms")
+    baseline = {r[1]: [] for r in results["no cache"]}
+    for r in results["no cache"]:
+        baseline[r[1]].append(r[2])
+    saved = [statistics.mean(baseline[r[1]]) - r[2] for r in hits]
+    if saved:
+        print(f"  saved          {statistics.mean(saved) * 1e3:7.1f}ms per hit")
+    print(f"  wrong answers served {len(wrong)}, answers naming a ticket served {len(personal)},"
+          f" follow-up kept out: {follow_up_ok}, emptied when the policy changed: {invalidated}")
+    if wrong or personal or not follow_up_ok or not invalidated:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
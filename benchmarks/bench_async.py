@@ -0,0 +1,65 @@
+"""Concurrency scaling of CustomerSupportAgent.arun with a stubbed LLM.
+
+    python -m benchmarks.bench_async [--latency 0.1] [--conversations 1 10 100 300]
+
+Every conversation is one turn (fetch_user_info -> primary_assistant -> END)
+against a synthetic database and a stub model that sleeps `latency` seconds per
+call. With the async path the wall time should stay close to one LLM latency no
+matter how many conversations run at once; the sync `run` is shown for reference.
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+import uuid
+
+os.environ.setdefault("TAVILY_API_KEY", "offline")
+
+
+def make_agent(latency):
+    from src.agent import CustomerSupportAgent
+    from src.models.stub_llm import StubChatModel
+
+    agent = CustomerSupportAgent(llm=StubChatModel(latency=latency))
+    agent.logger.log_event = lambda event, config=None: None
+    return agent
+
+
+def config(passenger_id):
+    return {"configurable": {"passenger_id": passenger_id, "thread_id": str(uuid.uuid4())}}
+
+
+async def run_concurrently(agent, n, passenger_id):
+    start = time.perf_counter()
+    await asyncio.gather(*(agent.arun("پرواز من چه زمانی است؟", config(passenger_id)) for _ in range(n)))
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--latency", type=float, default=0.1)
+    parser.add_argument("--conversations", type=int, nargs="+", default=[1, 10, 100, 300])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        from benchmarks.fixtures import PASSENGER_ID, make_travel_db
+
+        os.environ["TRAVEL_DB_PATH"] = make_travel_db(os.path.join(tmp, "travel.sqlite"))
+        agent = make_agent(args.latency)
+        agent.warmup(["database", "flight"])
+
+        start = time.perf_counter()
+        for _ in range(min(args.conversations)):
+            agent.run("پرواز من چه زمانی است؟", config(PASSENGER_ID))
+        sync_wall = time.perf_counter() - start
+        print(f"sync  run   {min(args.conversations):4d} conversations {sync_wall:7.3f}s")
+
+        for n in args.conversations:
+            wall = asyncio.run(run_concurrently(agent, n, PASSENGER_ID))
+            print(f"async arun  {n:4d} conversations {wall:7.3f}s  "
+                  f"{n / wall:8.1f} turns/s  (ideal {args.latency:.3f}s)")
+
+
+if __name__ == "__main__":
+    main()
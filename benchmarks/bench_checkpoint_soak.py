@@ -0,0 +1,79 @@
+"""Soak run of the file-backed checkpointer.
+
+    python -m benchmarks.bench_checkpoint_soak [--conversations 10000] [--turns 2]
+        [--keep 5] [--ttl 5] [--no-retention]
+
+Runs many short conversations through the agent (stub LLM, synthetic database)
+against a DurableSqliteSaver file, and prints process RSS, checkpoint file size
+(database + WAL) and stored rows every tenth of the run. With retention the
+numbers level off once threads start expiring; `--no-retention` shows the
+unbounded growth of keeping every checkpoint.
+"""
+import argparse
+import os
+import tempfile
+import time
+import uuid
+
+os.environ.setdefault("TAVILY_API_KEY", "offline")
+
+
+def rss_mb():
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+
+
+def file_mb(path):
+    return sum(os.path.getsize(p) for p in (path, path + "-wal") if os.path.exists(p)) / 2 ** 20
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--conversations", type=int, default=10000)
+    parser.add_argument("--turns", type=int, default=2)
+    parser.add_argument("--keep", type=int, default=5)
+    parser.add_argument("--ttl", type=float, default=5.0)
+    parser.add_argument("--compaction-interval", type=float, default=1.0)
+    parser.add_argument("--no-retention", action="store_true")
+    args = parser.parse_args()
+
+    from benchmarks.fixtures import PASSENGER_ID, make_travel_db
+    from src.agent import CustomerSupportAgent
+    from src.checkpoint import DurableSqliteSaver
+    from src.models.stub_llm import StubChatModel
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["TRAVEL_DB_PATH"] = make_travel_db(os.path.join(tmp, "travel.sqlite"))
+        path = os.path.join(tmp, "checkpoints.sqlite")
+        if args.no_retention:
+            saver = DurableSqliteSaver.from_conn_string(path, max_checkpoints=10 ** 9, thread_ttl=None,
+                                                        compaction_interval=args.compaction_interval)
+        else:
+            saver = DurableSqliteSaver.from_conn_string(path, max_checkpoints=args.keep, thread_ttl=args.ttl,
+                                                        compaction_interval=args.compaction_interval)
+        agent = CustomerSupportAgent(llm=StubChatModel(), checkpointer=saver)
+        agent.logger.log_event = lambda event, config=None: None
+        agent.warmup(["database", "flight"])
+
+        print(f"{'conversations':>13s} {'rss MB':>8s} {'file MB':>8s} {'threads':>8s} {'checkpoints':>11s} {'conv/s':>7s}")
+        start = last = time.perf_counter()
+        step = max(1, args.conversations // 10)
+        for n in range(1, args.conversations + 1):
+            config = {"configurable": {"passenger_id": PASSENGER_ID, "thread_id": str(uuid.uuid4())}}
+            for _ in range(args.turns):
+                for _ in agent.graph.stream({"messages": ("user", "پرواز من چه زمانی است؟")}, config):
+                    pass
+            if n % step == 0:
+                now = time.perf_counter()
+                with saver.lock, saver.cursor(transaction=False) as cur:
+                    threads = cur.execute("SELECT COUNT(*) FROM thread_activity").fetchone()[0]
+                    checkpoints = cur.execute("SELECT COUNT(*) FROM checkpoints").fetchone()[0]
+                print(f"{n:13d} {rss_mb():8.1f} {file_mb(path):8.2f} {threads:8d} {checkpoints:11d}"
+                      f" {step / (now - last):7.1f}")
+                last = now
+        saver.stop_compaction()
+        print(f"total {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
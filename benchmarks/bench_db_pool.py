@@ -0,0 +1,88 @@
+"""Per-call latency of search_flights / search_hotels with and without pooling.
+
+    python -m benchmarks.bench_db_pool [--db travel2.sqlite] [--calls 2000]
+
+Without --db a synthetic database is generated in a temporary directory.
+"""
+import argparse
+import os
+import sqlite3
+import statistics
+import tempfile
+import time
+
+from benchmarks.fixtures import make_travel_db
+from src.tools.db import prepare_db
+from src.tools.flight_tool_handler import FlightToolHandler
+from src.tools.hotel_tool_handler import HotelToolHandler
+
+
+def legacy_search_flights(db, departure_airport, arrival_airport, limit=20):
+    # connect-per-call implementation the handlers used before pooling
+    conn = sqlite3.connect(db)
+    cursor = conn.cursor()
+    cursor.execute(
+        "SELECT * FROM flights WHERE 1 = 1 AND departure_airport = ? AND arrival_airport = ? LIMIT ?",
+        (departure_airport, arrival_airport, limit),
+    )
+    rows = cursor.fetchall()
+    column_names = [column[0] for column in cursor.description]
+    results = [dict(zip(column_names, row)) for row in rows]
+    cursor.close()
+    conn.close()
+    return results
+
+
+def legacy_search_hotels(db, location):
+    conn = sqlite3.connect(db)
+    cursor = conn.cursor()
+    cursor.execute("SELECT * FROM hotels WHERE 1=1 AND location LIKE ?", (f"%{location}%",))
+    results = cursor.fetchall()
+    conn.close()
+    return [dict(zip([column[0] for column in cursor.description], row)) for row in results]
+
+
+def measure(fn, calls):
+    samples = []
+    for _ in range(calls):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    samples.sort()
+    return {
+        "mean_us": statistics.fmean(samples) * 1e6,
+        "p50_us": samples[len(samples) // 2] * 1e6,
+        "p99_us": samples[int(len(samples) * 0.99) - 1] * 1e6,
+    }
+
+
+def report(name, result):
+    print(f"{name:<28} mean {result['mean_us']:9.1f}us  p50 {result['p50_us']:9.1f}us  p99 {result['p99_us']:9.1f}us")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--db")
+    parser.add_argument("--calls", type=int, default=2000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = args.db or make_travel_db(os.path.join(tmp, "travel.sqlite"))
+        # the handlers query derived columns (e.g. scheduled_departure_epoch)
+        prepare_db(db)
+        flights = FlightToolHandler(db)
+        hotels = HotelToolHandler(db)
+
+        results = {
+            "search_flights (per-call)": measure(lambda: legacy_search_flights(db, "BSL", "ZRH"), args.calls),
+            "search_flights (pooled)": measure(lambda: flights.search_flights("BSL", "ZRH"), args.calls),
+            "search_hotels (per-call)": measure(lambda: legacy_search_hotels(db, "Zurich"), args.calls),
+            "search_hotels (pooled)": measure(lambda: hotels.search_hotels("Zurich"), args.calls),
+        }
+        for name, result in results.items():
+            report(name, result)
+        flights.pool.close_all()
+
+
+if __name__ == "__main__":
+    main()
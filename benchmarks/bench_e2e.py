@@ -0,0 +1,249 @@
+"""Offline end-to-end replay of the main.py conversation.
+
+    python -m benchmarks.bench_e2e [--repeat 5] [--llm-latency 0]
+
+Runs the 14 questions of main.py through the real graph, tools and
+checkpointer, with a ScriptedChatModel standing in for the LLM, hash-based fake
+embeddings for the policy index and a synthetic database, so nothing leaves the
+machine and every run takes the same path. Sensitive tool calls are approved.
+
+Reports wall time per conversation and where it went: per graph node, per tool,
+in the (stand-in) LLM, and the framework overhead left over outside the nodes.
+"""
+import argparse
+import os
+import shutil
+import tempfile
+import time
+import uuid
+from collections import defaultdict
+
+os.environ.setdefault("TAVILY_API_KEY", "offline")
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+from benchmarks.fixtures import PASSENGER_ID, make_travel_db
+
+
+class TimingCallbackHandler(BaseCallbackHandler):
+    """Accumulates wall time of graph nodes, tools and chat model calls, and
+    the estimated prompt size of every model call by conversation turn."""
+
+    run_inline = True
+
+    def __init__(self):
+        self.nodes = defaultdict(list)
+        self.tools = defaultdict(list)
+        self.llm = []
+        self.turn = 0
+        self.turn_walls = defaultdict(list)
+        self.prompt_tokens = defaultdict(list)
+        self._roots = set()
+        self._started = {}
+
+    def on_chain_start(self, serialized, inputs, *, run_id, parent_run_id=None, **kwargs):
+        if parent_run_id is None:
+            self._roots.add(run_id)
+        elif parent_run_id in self._roots:
+            self._started[run_id] = (kwargs.get("name"), time.perf_counter())
+
+    def on_chain_end(self, outputs, *, run_id, **kwargs):
+        self._end(self.nodes, run_id)
+
+    def on_chain_error(self, error, *, run_id, **kwargs):
+        self._end(self.nodes, run_id)
+
+    def on_tool_start(self, serialized, input_str, *, run_id, **kwargs):
+        self._started[run_id] = (serialized.get("name") or kwargs.get("name"), time.perf_counter())
+
+    def on_tool_end(self, output, *, run_id, **kwargs):
+        self._end(self.tools, run_id)
+
+    def on_tool_error(self, error, *, run_id, **kwargs):
+        self._end(self.tools, run_id)
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+        from src.models.history import approximate_tokens
+
+        self.prompt_tokens[self.turn].append(approximate_tokens(messages[0]))
+        self._started[run_id] = ("llm", time.perf_counter())
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        started = self._started.pop(run_id, None)
+        if started is not None:
+            self.llm.append(time.perf_counter() - started[1])
+
+    def _end(self, bucket, run_id):
+        started = self._started.pop(run_id, None)
+        if started is not None:
+            bucket[started[0]].append(time.perf_counter() - started[1])
+
+
+def build_script(db, passenger_id=PASSENGER_ID):
+    """One scripted model answer per LLM call of the main.py conversation."""
+    from src.models.stub_llm import tool_call
+    from src.tools.schema import parse_timestamp
+    import sqlite3
+
+    conn = sqlite3.connect(db)
+    ticket_no = conn.execute(
+        "SELECT ticket_no FROM tickets WHERE passenger_id = ? ORDER BY ticket_no", (passenger_id,)
+    ).fetchone()[0]
+    rows = conn.execute("SELECT flight_id, scheduled_departure FROM flights").fetchall()
+    conn.close()
+    future = sorted((parse_timestamp(departure), flight_id) for flight_id, departure in rows
+                    if parse_timestamp(departure).timestamp() > time.time() + 24 * 3600)
+    new_flight_id = future[0][1]
+    city = "Basel"
+
+    return [
+        # 1. when is my flight
+        "پرواز شما طبق اطلاعات رزرو در زمان ذکر شده انجام می شود.",
+        # 2. may I move it earlier
+        tool_call("lookup_policy", query="تغییر پرواز به زمان زودتر"),
+        "طبق سیاست ها تغییر پرواز تا سه ساعت قبل از حرکت امکان پذیر است.",
+        # 3. move it to next week
+        tool_call("ToFlightBookingAssistant", request="move the flight to next week"),
+        tool_call("search_flights", departure_airport="BSL"),
+        "این پروازها در هفته ی آینده موجود هستند.",
+        # 4. the next option is great (approved)
+        tool_call("update_ticket_to_new_flight", ticket_no=ticket_no, new_flight_id=new_flight_id),
+        "پرواز شما با موفقیت تغییر کرد.",
+        # 5. what about lodging and transport
+        tool_call("CompleteOrEscalate", cancel=False, reason="user asks about hotels and cars"),
+        "برای چه مدت و در کدام شهر به اقامت و ماشین نیاز دارید؟",
+        # 6. an affordable hotel for 7 days, and a car
+        tool_call("ToHotelBookingAssistant", location=city, checkin_date="2024-05-01",
+                  checkout_date="2024-05-08", request="affordable hotel for a week"),
+        tool_call("search_hotels", location=city, price_tier="Midscale",
+                  checkin_date="2024-05-01", checkout_date="2024-05-08"),
+        "چند هتل مقرون به صرفه پیدا کردم.",
+        # 7. book the suggested hotel (approved)
+        tool_call("book_hotel", hotel_id=1, checkin_date="2024-05-01", checkout_date="2024-05-08"),
+        "هتل رزرو شد.",
+        # 8. book whatever is mid-priced
+        tool_call("CompleteOrEscalate", cancel=False, reason="user wants a car rental"),
+        tool_call("ToBookCarRental", location=city, start_date="2024-05-01",
+                  end_date="2024-05-08", request="mid-priced car"),
+        tool_call("search_car_rentals", location=city, start_date="2024-05-01", end_date="2024-05-08"),
+        "این ماشین ها در دسترس هستند.",
+        # 9. what are my car options
+        tool_call("search_car_rentals", location=city, price_tier="Economy",
+                  start_date="2024-05-01", end_date="2024-05-08"),
+        "ارزان ترین گزینه ها این ها هستند.",
+        # 10. book the cheapest for 7 days (approved)
+        tool_call("book_car_rental", rental_id=1, start_date="2024-05-01", end_date="2024-05-08"),
+        "ماشین رزرو شد.",
+        # 11. excursion recommendations
+        tool_call("CompleteOrEscalate", cancel=False, reason="user wants excursions"),
+        tool_call("ToBookExcursion", location=city, request="excursion recommendations"),
+        tool_call("search_trip_recommendations", location=city),
+        "این گشت ها را پیشنهاد می کنم.",
+        # 12. are they available while I'm there
+        tool_call("search_trip_recommendations", location=city),
+        "بله، در زمان اقامت شما در دسترس هستند.",
+        # 13. I like museums
+        tool_call("search_trip_recommendations", location=city, keywords="museum"),
+        "این موزه ها را می توانید ببینید.",
+        # 14. book one for the second day (approved)
+        tool_call("book_excursion", recommendation_id=1),
+        "گشت برای روز دوم رزرو شد.",
+    ]
+
+
+def replay(agent, questions, timing=None, passenger_id=PASSENGER_ID):
+    config = {
+        "configurable": {"passenger_id": passenger_id, "thread_id": str(uuid.uuid4())},
+        "callbacks": [timing] if timing else [],
+    }
+    for turn, question in enumerate(questions, 1):
+        if timing:
+            timing.turn = turn
+        start = time.perf_counter()
+        for _ in agent.graph.stream({"messages": ("user", question)}, config, stream_mode="values"):
+            pass
+        while agent.graph.get_state(config).next:
+            agent.graph.invoke(None, config)
+        if timing:
+            timing.turn_walls[turn].append(time.perf_counter() - start)
+    return config
+
+
+def report(title, bucket, repeat):
+    print(title)
+    for name, samples in sorted(bucket.items(), key=lambda item: -sum(item[1])):
+        print(f"  {name:34s} {len(samples) // repeat:4d} calls {sum(samples) / repeat * 1e3:9.2f}ms"
+              f" {sum(samples) / len(samples) * 1e3:8.3f}ms/call")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--llm-latency", type=float, default=0.0)
+    parser.add_argument("--history-tokens", type=int, default=4000,
+                        help="prompt token budget (instructions, tool schemas, summary and history), 0 sends the full history")
+    args = parser.parse_args()
+
+    from langchain_core.embeddings import DeterministicFakeEmbedding
+
+    from main import QUESTIONS
+    from src.agent import CustomerSupportAgent
+    from src.models.stub_llm import ScriptedChatModel, StubChatModel
+    from src.tools.db import prepare_db, reset_db
+    from src.tools.registry import handlers
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = os.environ["TRAVEL_DB_PATH"] = make_travel_db(os.path.join(tmp, "travel.sqlite"))
+        backup_file = shutil.copy(db, os.path.join(tmp, "travel.backup.sqlite"))
+        handlers.configure("general", chroma_persist_dir=os.path.join(tmp, "chroma"))
+        llm = ScriptedChatModel(latency=args.llm_latency)
+        agent = CustomerSupportAgent(
+            llm=llm,
+            tool_llm=StubChatModel(response="change flight to an earlier time"),
+            embeddings=DeterministicFakeEmbedding(size=256),
+        )
+        agent.history.max_tokens = args.history_tokens or float("inf")
+        agent.history.target_tokens = args.history_tokens // 2 or float("inf")
+        agent.logger.log_event = lambda event, config=None: None
+        start = time.perf_counter()
+        agent.warmup()
+        print(f"warmup           {(time.perf_counter() - start) * 1e3:9.2f}ms")
+
+        timing = TimingCallbackHandler()
+        flight = handlers.get("flight")
+        walls = []
+        for i in range(args.repeat + 1):
+            # every run starts from the same data, the first one is a warm-up
+            reset_db(db, backup_file)
+            prepare_db(db)
+            llm.script = build_script(db)
+            llm.reset()
+            queries = flight.user_info_queries
+            start = time.perf_counter()
+            replay(agent, QUESTIONS, timing if i else None)
+            if i:
+                walls.append(time.perf_counter() - start)
+            user_info_queries = flight.user_info_queries - queries
+        handlers.reset()
+
+    wall = sum(walls) / len(walls)
+    nodes = sum(map(sum, timing.nodes.values())) / args.repeat
+    tools = sum(map(sum, timing.tools.values())) / args.repeat
+    llm_time = sum(timing.llm) / args.repeat
+    print(f"conversation     {wall * 1e3:9.2f}ms  ({len(QUESTIONS)} turns, min {min(walls) * 1e3:.2f}ms)")
+    print(f"  in nodes       {nodes * 1e3:9.2f}ms")
+    print(f"    llm          {llm_time * 1e3:9.2f}ms  ({len(timing.llm) // args.repeat} calls)")
+    print(f"    tools        {tools * 1e3:9.2f}ms")
+    print(f"  framework      {(wall - nodes) * 1e3:9.2f}ms  (checkpoints, channels, scheduling)")
+    print(f"user info joins  {user_info_queries:9d}    per conversation")
+    report("per node", timing.nodes, args.repeat)
+    report("per tool", timing.tools, args.repeat)
+    prompt_tokens = sum(map(sum, timing.prompt_tokens.values())) // args.repeat
+    print(f"prompt tokens    {prompt_tokens:9d}    sent per conversation, all LLM calls")
+    print("per turn                     max prompt tokens")
+    for turn, samples in sorted(timing.turn_walls.items()):
+        print(f"  {turn:2d} {sum(samples) / len(samples) * 1e3:9.2f}ms {max(timing.prompt_tokens[turn], default=0):8d}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""Hotel and excursion search on a large inventory: FTS5 vs the old LIKE scans.
+
+    python -m benchmarks.bench_fulltext [--rows 1000000] [--repeat 20]
+
+Fills the hotels and trip_recommendations tables with `rows` items each, with
+names and most locations drawn from a vocabulary of made-up words so that
+searches are as selective as in a real inventory, and times a few typical
+searches through the handlers (FTS5) and the LIKE queries they replaced.
+Keywords come from the fixture's 14, so each one is on a fifth of all rows.
+"""
+import argparse
+import os
+import random
+import sqlite3
+import string
+import tempfile
+import time
+
+from benchmarks.fixtures import CITIES, HOTEL_BRANDS, HOTEL_TIERS, KEYWORDS, make_travel_db
+
+LIKE_HOTELS = "SELECT * FROM hotels WHERE location LIKE ? AND name LIKE ? LIMIT 21"
+LIKE_TRIPS = ("SELECT * FROM trip_recommendations WHERE location LIKE ? AND (keywords LIKE ? OR keywords LIKE ?)"
+              " LIMIT 21")
+
+
+def fill(path, rows, seed=0):
+    rng = random.Random(seed)
+    words = ["".join(rng.choices(string.ascii_lowercase, k=rng.randrange(5, 9))).capitalize()
+             for _ in range(max(100, rows // 50))]
+    # a big inventory covers many more places than the fixture's cities
+    cities = CITIES + words[:max(10, rows // 500)]
+    conn = sqlite3.connect(path)
+    conn.executemany(
+        "INSERT INTO hotels VALUES (?, ?, ?, ?, ?, ?, 0)",
+        ((i, f"{rng.choice(HOTEL_BRANDS)} {rng.choice(words)}", rng.choice(cities), rng.choice(HOTEL_TIERS),
+          "2024-05-01", "2024-05-04") for i in range(1, rows + 1)),
+    )
+    conn.executemany(
+        "INSERT INTO trip_recommendations VALUES (?, ?, ?, ?, ?, 0)",
+        ((i, f"{rng.choice(words)} {rng.choice(KEYWORDS)} tour", rng.choice(cities),
+          ", ".join(rng.sample(KEYWORDS, 3)), "A guided visit.") for i in range(1, rows + 1)),
+    )
+    conn.commit()
+    conn.close()
+    return words
+
+
+def timed(fn, repeat):
+    fn()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = fn()
+    return (time.perf_counter() - start) / repeat, len(result)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=1000000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    from src.tools.db import prepare_db
+    from src.tools.excursion_tool_handler import ExcursionToolHandler
+    from src.tools.hotel_tool_handler import HotelToolHandler
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = make_travel_db(os.path.join(tmp, "travel.sqlite"), hotels=0, trip_recommendations=0)
+        start = time.perf_counter()
+        fill(path, args.rows)
+        print(f"fill {args.rows} rows   {time.perf_counter() - start:6.1f}s")
+        start = time.perf_counter()
+        prepare_db(path)
+        print(f"ensure_schema       {time.perf_counter() - start:6.1f}s (FTS tables built from scratch)")
+
+        hotels, trips = HotelToolHandler(path), ExcursionToolHandler(path)
+        conn = sqlite3.connect(path)
+        word = conn.execute("SELECT name FROM hotels WHERE location = 'Basel'").fetchone()[0].split()[-1]
+        searches = [
+            (f"hotel name '{word}' in Basel",
+             lambda: hotels.search_hotels(location="Basel", name=word, limit=21),
+             lambda: conn.execute(LIKE_HOTELS, ("%Basel%", f"%{word}%")).fetchall()),
+            (f"hotel name prefix '{word[:4]}'",
+             lambda: hotels.search_hotels(name=word[:4], limit=21),
+             lambda: conn.execute(LIKE_HOTELS, ("%%", f"%{word[:4]}%")).fetchall()),
+            ("hotels in Basel",
+             lambda: hotels.search_hotels(location="Basel", limit=21),
+             lambda: conn.execute(LIKE_HOTELS, ("%Basel%", "%%")).fetchall()),
+            ("trips: museum, old town",
+             lambda: trips.search_trip_recommendations(keywords="museum, old town", limit=21),
+             lambda: conn.execute(LIKE_TRIPS, ("%%", "%museum%", "%old town%")).fetchall()),
+            ("trips in Basel: museum, old town",
+             lambda: trips.search_trip_recommendations(location="Basel", keywords="museum, old town", limit=21),
+             lambda: conn.execute(LIKE_TRIPS, ("%Basel%", "%museum%", "%old town%")).fetchall()),
+        ]
+        print(f"{'':40s} {'FTS5':>10s} {'rows':>5s} {'LIKE':>10s} {'rows':>5s}")
+        for label, fts, like in searches:
+            fts_time, fts_rows = timed(fts, args.repeat)
+            like_time, like_rows = timed(like, args.repeat)
+            print(f"  {label:38s} {fts_time * 1e3:8.2f}ms {fts_rows:5d} {like_time * 1e3:8.2f}ms {like_rows:5d}")
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""Cold import time of src.agent, with the network disabled.
+
+    python -m benchmarks.bench_import [--budget 0.15] [--runs 5]
+
+Each run is a fresh interpreter. The framework imports (langgraph, langchain_core)
+are timed separately, and the budget is what this project may add on top as a
+fraction of them, so it holds on slower machines too. Most of the project's
+share is the @tool schema generation of the tool modules.
+Exits non-zero if the budget is exceeded, a handler was built during import or
+anything tried to open a socket.
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+
+FRAMEWORK_IMPORTS = [
+    "langchain_core.tools",
+    "langchain_core.messages",
+    "langchain_core.runnables",
+    "langchain_core.prompts",
+    "langchain_core.pydantic_v1",
+    "langgraph.graph",
+    "langgraph.prebuilt",
+    "langgraph.checkpoint.sqlite",
+]
+
+CHILD = """
+import importlib, json, socket, sys, time
+
+def _no_network(*args, **kwargs):
+    raise RuntimeError("network access during import")
+socket.socket.connect = _no_network
+socket.create_connection = _no_network
+
+start = time.perf_counter()
+for name in {framework!r}:
+    importlib.import_module(name)
+framework = time.perf_counter() - start
+
+start = time.perf_counter()
+import src.agent
+from src.tools.registry import handlers
+own = time.perf_counter() - start
+
+built = [name for name in handlers._factories if handlers.is_built(name)]
+print(json.dumps({{"framework_ms": framework * 1e3, "own_ms": own * 1e3, "built": built}}))
+"""
+
+
+def run_once():
+    out = subprocess.run(
+        [sys.executable, "-c", CHILD.format(framework=FRAMEWORK_IMPORTS)],
+        check=True, capture_output=True, text=True,
+    )
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--budget", type=float, default=0.15,
+                        help="time of import src.agent on top of the framework imports, as a fraction of them")
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    results = [run_once() for _ in range(args.runs)]
+    framework = statistics.median(r["framework_ms"] for r in results)
+    own = statistics.median(r["own_ms"] for r in results)
+    built = sorted({name for r in results for name in r["built"]})
+    print(f"framework imports {framework:8.1f}ms (median of {args.runs})")
+    print(f"import src.agent  {own:8.1f}ms on top, {own / framework:.1%} (budget {args.budget:.0%},"
+          f" {framework * args.budget:.0f}ms)")
+    print(f"handlers built during import: {built or 'none'}")
+
+    if built or own > framework * args.budget:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
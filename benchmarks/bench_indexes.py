@@ -0,0 +1,97 @@
+"""Latency of the handler queries, with and without indexes.
+
+    python -m benchmarks.bench_indexes [--flights 200000] [--passengers 50000] [--repeat 20]
+
+Builds a scaled synthetic database and times every handler method on a copy
+without the `idx_` indexes and on the copy after ensure_schema(), then pages
+through all flights from one airport with the search_flights cursor against
+asking for a wider LIMIT every time. The query plans themselves are checked
+in tests/test_indexes.py.
+"""
+import argparse
+import os
+import shutil
+import sqlite3
+import tempfile
+import time
+
+from benchmarks.fixtures import handler_calls, make_travel_db
+
+
+def time_calls(db, repeat):
+    calls, pool = handler_calls(db)
+    pool.close_all()
+    timings = {}
+    for label, fn in calls:
+        fn()  # warm the connection and page cache
+        start = time.perf_counter()
+        for _ in range(repeat):
+            fn()
+        timings[label] = (time.perf_counter() - start) / repeat
+    return timings
+
+
+def page_through(db, airport, limit=20):
+    """Pages of all flights from `airport`: cursor pages vs re-running a wider LIMIT."""
+    from src.tools.flight_tool_handler import FlightToolHandler
+
+    flight = FlightToolHandler(db)
+    cursor, keyset, pages = None, [], 0
+    while True:
+        start = time.perf_counter()
+        page = flight.search_flights(departure_airport=airport, limit=limit, cursor=cursor)
+        keyset.append(time.perf_counter() - start)
+        pages += 1
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+    widening = []
+    for n in range(1, pages + 1):
+        start = time.perf_counter()
+        flight.search_flights(departure_airport=airport, limit=n * limit)["flights"][-limit:]
+        widening.append(time.perf_counter() - start)
+    print(f"paging {airport}, {pages} pages of {limit}     first page  last page      total")
+    for name, samples in [("cursor", keyset), ("wider LIMIT", widening)]:
+        print(f"  {name:30s} {samples[0] * 1e3:8.3f}ms {samples[-1] * 1e3:8.3f}ms {sum(samples) * 1e3:8.1f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--flights", type=int, default=200000)
+    parser.add_argument("--passengers", type=int, default=50000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    from src.tools.schema import INDEXES, ensure_schema, shift_to_present
+
+    with tempfile.TemporaryDirectory() as tmp:
+        plain = make_travel_db(os.path.join(tmp, "plain.sqlite"), flights=args.flights,
+                               passengers=args.passengers, hotels=20000, car_rentals=20000,
+                               trip_recommendations=20000)
+        conn = sqlite3.connect(plain)
+        shift_to_present(conn)  # so update_ticket_to_new_flight finds future flights
+        conn.close()
+        indexed = shutil.copy(plain, os.path.join(tmp, "indexed.sqlite"))
+        conn = sqlite3.connect(indexed)
+        start = time.perf_counter()
+        changed = ensure_schema(conn)
+        print(f"ensure_schema    {len(changed)} columns, triggers and indexes in"
+              f" {(time.perf_counter() - start) * 1e3:.1f}ms, again: {ensure_schema(conn) or 'nothing to do'}")
+        conn.close()
+        # the unindexed copy still needs the derived columns the queries use
+        conn = sqlite3.connect(plain)
+        ensure_schema(conn)
+        with conn:
+            for name in INDEXES:
+                conn.execute(f"DROP INDEX IF EXISTS {name}")
+        conn.close()
+
+        before, after = time_calls(plain, args.repeat), time_calls(indexed, args.repeat)
+        print(f"{'':32s} {'no index':>10s} {'indexed':>10s}")
+        for label in before:
+            print(f"  {label:30s} {before[label] * 1e3:8.3f}ms {after[label] * 1e3:8.3f}ms")
+        page_through(indexed, "BSL")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""Startup time and peak RSS of the DB time shift: pandas rewrite vs in-place SQL.
+
+    python -m benchmarks.bench_init_db [--flights 200000]
+
+Every variant runs in a fresh subprocess on its own copy of a synthetic database
+so peak RSS is not shared between runs.
+"""
+import argparse
+import json
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.fixtures import make_travel_db
+
+
+def legacy_init_db(path):
+    # the pandas implementation GeneralToolHandler.init_db used before
+    import sqlite3
+
+    import pandas as pd
+
+    conn = sqlite3.connect(path)
+    tables = pd.read_sql(
+        "SELECT name FROM sqlite_master WHERE type='table';", conn
+    ).name.tolist()
+    tdf = {}
+    for t in tables:
+        tdf[t] = pd.read_sql(f"SELECT * from {t}", conn)
+
+    example_time = pd.to_datetime(
+        tdf["flights"]["actual_departure"].replace("\\N", pd.NaT)
+    ).max()
+    current_time = pd.to_datetime("now").tz_localize(example_time.tz)
+    time_diff = current_time - example_time
+
+    tdf["bookings"]["book_date"] = (
+        pd.to_datetime(tdf["bookings"]["book_date"].replace("\\N", pd.NaT), utc=True)
+        + time_diff
+    )
+    for column in ["scheduled_departure", "scheduled_arrival", "actual_departure", "actual_arrival"]:
+        tdf["flights"][column] = (
+            pd.to_datetime(tdf["flights"][column].replace("\\N", pd.NaT)) + time_diff
+        )
+    for table_name, df in tdf.items():
+        df.to_sql(table_name, conn, if_exists="replace", index=False)
+    conn.commit()
+    conn.close()
+
+
+def incremental_init_db(path):
+    import sqlite3
+
+    from src.tools.schema import shift_to_present
+
+    conn = sqlite3.connect(path)
+    shift_to_present(conn)
+    conn.close()
+
+
+VARIANTS = {"pandas": legacy_init_db, "sql": incremental_init_db}
+
+
+def child(variant, path):
+    start = time.perf_counter()
+    VARIANTS[variant](path)
+    elapsed = time.perf_counter() - start
+    # ru_maxrss is in KiB on Linux
+    print(json.dumps({"seconds": elapsed, "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024}))
+
+
+def run(variant, path):
+    out = subprocess.run(
+        [sys.executable, "-m", "benchmarks.bench_init_db", "--child", variant, path],
+        check=True, capture_output=True, text=True,
+    )
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--flights", type=int, default=200000)
+    parser.add_argument("--child", nargs=2)
+    args = parser.parse_args()
+    if args.child:
+        child(*args.child)
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        source = make_travel_db(os.path.join(tmp, "source.sqlite"), flights=args.flights, passengers=args.flights // 10)
+        for variant in VARIANTS:
+            path = os.path.join(tmp, f"{variant}.sqlite")
+            shutil.copy(source, path)
+            first = run(variant, path)
+            second = run(variant, path)
+            print(f"{variant:<7} first run {first['seconds']:7.3f}s {first['max_rss_mb']:8.1f}MB peak RSS | "
+                  f"second run {second['seconds']:7.3f}s {second['max_rss_mb']:8.1f}MB peak RSS")
+
+
+if __name__ == "__main__":
+    main()
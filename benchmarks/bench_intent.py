@@ -0,0 +1,201 @@
+"""Routing accuracy of the local intent router, and the latency it saves.
+
+    python -m benchmarks.bench_intent [--llm-latency 0.2] [--min-score 0.2] [--min-margin 0.1]
+
+LABELED holds Persian and English messages (none of them in the training
+examples of src/models/intent_examples.py) with the call the primary
+assistant should make for them, "other" when it should answer itself. The
+report gives, for the router's thresholds:
+
+  accuracy    best label right, whatever the confidence
+  coverage    messages routed without the primary assistant
+  precision   routed messages that went where they should
+  misrouted   routed messages that went elsewhere (an "other" one included)
+
+Then every message is sent as the first turn of a new conversation to an
+agent with the router and to one without, both with a ScriptedChatModel that
+sleeps `llm-latency` per call and makes the call of the message's label. The
+difference of the mean turn latency is the time saved. Exits with status 1 if
+precision is below 95%.
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+import uuid
+
+os.environ.setdefault("TAVILY_API_KEY", "offline")
+
+from benchmarks.fixtures import PASSENGER_ID, make_travel_db
+
+LABELED = [
+    # main.py
+    ("سلام، پرواز من چه زمانی است؟", "other"),
+    ("آیا اجازه دارم پروازم رو به زمانی زودتر موکول کنم؟ من دوست دارم همین امروز برم.", "policy"),
+    ("پس پروازم رو به زمانی توی هفته ی آینده تغییر بده.", "flight"),
+    ("در مورد اسکان و حمل و نقل چطور؟", "other"),
+    ("خب حالا چه توصیه هایی برای گشت و گذار دارید؟", "excursion"),
+    # flight
+    ("میشه پرواز منو بندازی برای پس فردا؟", "flight"),
+    ("بلیطم رو به یه پرواز صبح زود تغییر بده لطفا", "flight"),
+    ("پروازهای امروز به ژنو رو نشونم بده", "flight"),
+    ("دیگه نمی خوام سفر کنم، پروازم رو کنسل کن", "flight"),
+    ("I'd like to take an earlier flight today", "flight"),
+    ("please cancel my flight to Paris", "flight"),
+    ("move my ticket to the flight on Monday", "flight"),
+    ("look for flights from Zurich to London next week", "flight"),
+    # hotel
+    ("یه هتل سه ستاره برای پنج شب می خوام", "hotel"),
+    ("هتل خوب و تمیز نزدیک ایستگاه قطار پیدا کن", "hotel"),
+    ("رزرو هتلم رو یک روز تمدید کن", "hotel"),
+    ("اتاقی که تو هتل گرفتم رو کنسل کن", "hotel"),
+    ("I need a place to stay in Basel for the weekend", "hotel"),
+    ("book a hotel room with a lake view", "hotel"),
+    ("please cancel the hotel I booked", "hotel"),
+    ("find me a budget hotel for four nights", "hotel"),
+    # car
+    ("یه ماشین کرایه می خوام برای آخر هفته", "car"),
+    ("ارزون ترین ماشین اجاره ای رو برام رزرو کن", "car"),
+    ("اجاره ی خودرو رو دو روز تمدید کن", "car"),
+    ("ماشینی که اجاره کردم رو کنسل کن", "car"),
+    ("I'd like to hire a car when I land", "car"),
+    ("cancel the car I rented", "car"),
+    ("what rental cars do you have for next week", "car"),
+    ("book the cheapest rental car for seven days", "car"),
+    # excursion
+    ("تو زوریخ چه جاهایی برای دیدن هست؟", "excursion"),
+    ("یه تور یک روزه به کوه برام رزرو کن", "excursion"),
+    ("برای بچه ها چه تفریحی پیشنهاد میدی؟", "excursion"),
+    ("موزه ی هنر رو برام رزرو کن", "excursion"),
+    ("what sightseeing tours are there in Basel", "excursion"),
+    ("recommend a museum to visit on Sunday", "excursion"),
+    ("book a boat tour on the lake", "excursion"),
+    ("fun things to do with kids", "excursion"),
+    # policy
+    ("اگه پروازم رو کنسل کنم پولم برمی گرده؟", "policy"),
+    ("حداکثر وزن چمدون چقدره؟", "policy"),
+    ("برای تغییر بلیط باید جریمه بدم؟", "policy"),
+    ("آیا میشه حیوان خانگی رو با خودم ببرم؟", "policy"),
+    ("do I get my money back if I cancel", "policy"),
+    ("how heavy can my suitcase be", "policy"),
+    ("is there a fee for changing my ticket", "policy"),
+    ("can I bring my pet on board", "policy"),
+    # other
+    ("درود", "other"),
+    ("مرسی از کمکت", "other"),
+    ("پرواز من ساعت چنده؟", "other"),
+    ("شماره ی صندلیم رو بگو", "other"),
+    ("اوکی، ممنون", "other"),
+    ("good morning", "other"),
+    ("thank you so much", "other"),
+    ("what's my booking reference", "other"),
+    ("when do I board", "other"),
+    ("sounds good", "other"),
+]
+
+
+def classify(router):
+    rows = []
+    for text, expected in LABELED:
+        label, score, margin = router.classifier.predict(text)
+        rows.append((text, expected, label, router.decide(label, score, margin)))
+    routed = [row for row in rows if row[3] is not None]
+    return {
+        "accuracy": sum(label == expected for _, expected, label, _ in rows) / len(rows),
+        "coverage": len(routed) / len(rows),
+        "precision": sum(decided == expected for _, expected, _, decided in routed) / len(routed) if routed else 1.0,
+        "misrouted": [(text, expected, decided) for text, expected, _, decided in routed if decided != expected],
+        "routed": sum(decided == expected for _, expected, _, decided in routed),
+    }
+
+
+def replay_turns(agent, llm, texts):
+    """Mean latency of `texts`, each as the first turn of a new conversation."""
+    from langchain_core.messages import AIMessage
+
+    from src.graph_utils import INTENT_CALLS
+    from src.models.stub_llm import tool_call
+
+    walls = []
+    for text, expected in texts:
+        name, arg = INTENT_CALLS[expected]
+        config = {"configurable": {"passenger_id": PASSENGER_ID, "thread_id": str(uuid.uuid4())}}
+        steps = [tool_call(name, **{arg: text}), "ok"]
+
+        def respond(messages, steps=steps):
+            # the call of the label unless the router made it already, then the answer
+            made = any(isinstance(m, AIMessage) and m.tool_calls for m in messages)
+            step = steps[1] if made else steps[0]
+            return AIMessage(content=step) if isinstance(step, str) else AIMessage(
+                content="", tool_calls=[{**step, "id": "call_" + uuid.uuid4().hex[:12]}])
+
+        llm.script = [respond]
+        start = time.perf_counter()
+        for _ in agent.graph.stream({"messages": ("user", text)}, config, stream_mode="values"):
+            pass
+        walls.append(time.perf_counter() - start)
+    return statistics.mean(walls)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--llm-latency", type=float, default=0.2)
+    parser.add_argument("--min-score", type=float, default=0.2)
+    parser.add_argument("--min-margin", type=float, default=0.1)
+    args = parser.parse_args()
+
+    from langchain_core.embeddings import DeterministicFakeEmbedding
+
+    from src.agent import CustomerSupportAgent
+    from src.models.intent import IntentRouter
+    from src.models.stub_llm import ScriptedChatModel, StubChatModel
+    from src.tools.db import prepare_db
+    from src.tools.registry import handlers
+
+    router = IntentRouter(min_score=args.min_score, min_margin=args.min_margin)
+    result = classify(router)
+    start = time.perf_counter()
+    for text, _ in LABELED * 20:
+        router.classifier.predict(text)
+    per_message = (time.perf_counter() - start) / (len(LABELED) * 20)
+
+    print(f"{len(LABELED)} labeled messages, min_score {args.min_score}, min_margin {args.min_margin}")
+    print(f"  accuracy   {result['accuracy']:7.1%}")
+    print(f"  coverage   {result['coverage']:7.1%}")
+    print(f"  precision  {result['precision']:7.1%}")
+    print(f"  classify   {per_message * 1e6:7.1f}us per message")
+    for text, expected, decided in result["misrouted"]:
+        print(f"  misrouted to {decided}: {text!r} ({expected})")
+
+    actionable = [(text, expected) for text, expected in LABELED if expected != "other"]
+    with tempfile.TemporaryDirectory() as tmp:
+        db = os.environ["TRAVEL_DB_PATH"] = make_travel_db(os.path.join(tmp, "travel.sqlite"))
+        prepare_db(db)
+        handlers.configure("general", chroma_persist_dir=os.path.join(tmp, "chroma"))
+        latencies = {}
+        for name, intent_router in (("primary assistant", None), ("intent router", IntentRouter(
+                min_score=args.min_score, min_margin=args.min_margin))):
+            llm = ScriptedChatModel(latency=args.llm_latency)
+            agent = CustomerSupportAgent(
+                llm=llm, tool_llm=StubChatModel(response="refund policy"),
+                embeddings=DeterministicFakeEmbedding(size=256), intent_router=intent_router)
+            agent.warmup()
+            latencies[name] = replay_turns(agent, llm, actionable)
+            if intent_router is not None:
+                stats = intent_router.stats()
+        handlers.reset()
+
+    print(f"first turn of {len(actionable)} skill or policy messages, {args.llm_latency * 1e3:.0f}ms per model call")
+    for name, latency in latencies.items():
+        print(f"  {name:18s} {latency * 1e3:8.1f}ms")
+    saved = latencies["primary assistant"] - latencies["intent router"]
+    print(f"  saved              {saved * 1e3:8.1f}ms per message ({stats['routed']} routed,"
+          f" {stats['fallbacks']} left to the assistant)")
+    if result["precision"] < 0.95:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
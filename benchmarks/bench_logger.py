@@ -0,0 +1,135 @@
+"""Cost of logging graph states on the request path: former Logger vs src.logger.
+
+    python -m benchmarks.bench_logger [--events 100000] [--threads 100] [--sink-latency 0.0001]
+
+Logs `events` graph states (each adds a message to one of `threads`
+conversations, like stream_mode="values" does) to /dev/null and reports the
+time spent in the calling thread per event, the time until everything is
+written, and how many message ids each logger still holds at the end. The
+same is done once more against a sink that takes `sink-latency` seconds per
+write, like a terminal or a pipe that is read slowly.
+
+The former Logger rendered and printed every message inline and remembered
+every id it printed; it is reproduced here as InlineLogger.
+"""
+import argparse
+import contextlib
+import os
+import sys
+import time
+
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+
+
+class InlineLogger:
+    """src/logger.py before the structured logger."""
+
+    def __init__(self) -> None:
+        self._printed = set()
+
+    def log_event(self, event: dict, max_length=1500):
+        current_state = event.get("dialog_state")
+        if current_state:
+            print(f"Currently in: ", current_state[-1])
+        message = event.get("messages")
+        if message:
+            if isinstance(message, list):
+                message = message[-1]
+            if message.id not in self._printed:
+                msg_repr = message.pretty_repr(html=True)
+                if len(msg_repr) > max_length:
+                    msg_repr = msg_repr[:max_length] + " ... (truncated)"
+                print(msg_repr)
+                self._printed.add(message.id)
+
+
+def make_events(count, threads):
+    kinds = [
+        lambda i: HumanMessage(content="آیا اجازه دارم پروازم رو به زمانی زودتر موکول کنم؟", id=f"m{i}"),
+        lambda i: AIMessage(content="", id=f"m{i}", tool_calls=[
+            {"name": "search_flights", "args": {"departure_airport": "BSL"}, "id": f"call_{i}"}]),
+        lambda i: ToolMessage(content="flight_id|flight_no|departure_airport\n" + "1|LX0112|BSL\n" * 20,
+                              tool_call_id=f"call_{i - 1}", id=f"m{i}"),
+        lambda i: AIMessage(content="این پروازها در هفته ی آینده موجود هستند." * 3, id=f"m{i}"),
+    ]
+    histories = [[] for _ in range(threads)]
+    events = []
+    for i in range(count):
+        thread = i % threads
+        histories[thread].append(kinds[len(histories[thread]) % len(kinds)](i))
+        state = {"messages": histories[thread][-8:], "dialog_state": ["update_flight"]}
+        events.append((state, {"configurable": {"thread_id": str(thread)}}))
+    return events
+
+
+class SlowSink:
+    def __init__(self, latency):
+        self.latency = latency
+
+    def write(self, text):
+        time.sleep(self.latency)
+        return len(text)
+
+    def flush(self):
+        pass
+
+
+def measure(name, logger, events, flush, devnull):
+    with contextlib.redirect_stdout(devnull):
+        start = time.perf_counter()
+        for state, config in events:
+            if isinstance(logger, InlineLogger):
+                logger.log_event(state)
+            else:
+                logger.log_event(state, config)
+        caller = time.perf_counter() - start
+        flush()
+        total = time.perf_counter() - start
+    return name, caller, total
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--events", type=int, default=100000)
+    parser.add_argument("--threads", type=int, default=100)
+    parser.add_argument("--sink-latency", type=float, default=0.0001)
+    args = parser.parse_args()
+
+    from src.logger import Logger
+
+    events = make_events(args.events, args.threads)
+    devnull = open(os.devnull, "w")
+    slow = SlowSink(args.sink_latency)
+    slow_events = events[:args.events // 10]
+    inline = InlineLogger()
+    json_logger = Logger(devnull, queue_size=args.events)
+    text_logger = Logger(devnull, fmt="text", queue_size=args.events)
+    small_queue = Logger(devnull, queue_size=1000)
+    quiet = Logger(devnull, level="warning")
+    results = [
+        measure("former inline Logger", inline, events, lambda: None, devnull),
+        measure("Logger json", json_logger, events, json_logger.flush, devnull),
+        measure("Logger text", text_logger, events, text_logger.flush, devnull),
+        measure("Logger json, queue 1000", small_queue, events, small_queue.flush, devnull),
+        measure("Logger level=warning", quiet, events, quiet.flush, devnull),
+    ]
+    slow_logger = Logger(slow, queue_size=args.events)
+    slow_results = [
+        measure("former inline Logger", InlineLogger(), slow_events, lambda: None, slow),
+        measure("Logger json", slow_logger, slow_events, slow_logger.flush, devnull),
+    ]
+    print(f"{args.events} states over {args.threads} threads, to /dev/null")
+    print(f"{'':28s} {'caller/event':>12s} {'all written':>12s}")
+    for name, caller, total in results:
+        print(f"  {name:26s} {caller / args.events * 1e6:10.2f}us {total:10.2f}s")
+    print(f"{len(slow_events)} states to a sink taking {args.sink_latency * 1e6:.0f}us per write")
+    for name, caller, total in slow_results:
+        print(f"  {name:26s} {caller / len(slow_events) * 1e6:10.2f}us {total:10.2f}s")
+    held = sum(len(state["messages"]) for state in json_logger._seen.values())
+    print(f"message ids held: former {len(inline._printed)}, now {held}"
+          f" (at most {json_logger.dedupe_window} for each of {len(json_logger._seen)} threads)")
+    print(f"queue 1000: {small_queue.stats()}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
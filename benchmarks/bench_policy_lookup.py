@@ -0,0 +1,62 @@
+"""Latency of the local BM25 policy index over files/alibaba.md.
+
+    python -m benchmarks.bench_policy_lookup [--repeat 2000]
+
+Reports index build time, per-query BM25 search time and the time of a
+cache-warm lookup through PolicyCache. Both replace a translation LLM call plus
+an embedding request and a Chroma query in the default "vector" mode.
+"""
+import argparse
+import statistics
+import time
+
+from src.tools.policy_cache import PolicyCache
+from src.tools.policy_index import BM25Index, split_policy_sections
+
+POLICY_FILE = "files/alibaba.md"
+
+QUERIES = [
+    "آیا می‌توانم پروازم را تغییر دهم؟",
+    "میزان بار مجاز در پرواز خارجی",
+    "شرایط استرداد بلیط پرواز خارجی",
+    "پذیرش حیوان خانگی در پرواز",
+    "اشیاء ممنوعه",
+    "هزینه اضافه بار ایرلاین",
+    "کنسلی بلیط چارتری",
+    "شرایط ویزا",
+]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=2000)
+    args = parser.parse_args()
+
+    with open(POLICY_FILE) as f:
+        sections = split_policy_sections(f.read())
+    start = time.perf_counter()
+    index = BM25Index(sections)
+    print(f"index build      {(time.perf_counter() - start) * 1e3:8.2f}ms for {len(sections)} sections")
+
+    samples = []
+    for _ in range(args.repeat):
+        for query in QUERIES:
+            start = time.perf_counter()
+            index.search(query, 2)
+            samples.append(time.perf_counter() - start)
+    print(f"bm25 search      {statistics.median(samples) * 1e6:8.1f}us median per query")
+
+    cache = PolicyCache(POLICY_FILE)
+    for query in QUERIES:
+        cache.put_sections(query, 2, [index.documents[i] for i, _ in index.search(query, 2)], mode="bm25")
+    samples = []
+    for _ in range(args.repeat):
+        for query in QUERIES:
+            start = time.perf_counter()
+            cache.get_sections(query, 2, mode="bm25")
+            samples.append(time.perf_counter() - start)
+    print(f"cache-warm hit   {statistics.median(samples) * 1e6:8.1f}us median per query")
+
+
+if __name__ == "__main__":
+    main()
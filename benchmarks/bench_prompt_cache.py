@@ -0,0 +1,163 @@
+"""Share of prompt tokens a provider could serve from its prompt cache.
+
+    python -m benchmarks.bench_prompt_cache [--passengers 5] [--seconds-per-call 20]
+
+Replays the main.py conversation (see bench_e2e) for several passengers, one
+after the other, against a PrefixCachingChatModel, which counts as cached the
+longest prompt prefix (tool schemas, then messages) that any earlier call sent,
+like OpenAI's automatic prompt caching. The cached ratio is read back from the
+usage metadata of the answers through CustomerSupportAgent.usage.
+
+Three prompt layouts are compared:
+
+  system+frozen   user flights and time inside the system message, the time
+                  fixed when the prompt was built (the former prompts)
+  system+clock    the same with the time taken on every call
+  static prefix   static instructions first, flights and time after the
+                  conversation (src/tools/prompts.py)
+
+The clock advances `seconds-per-call` on every model call, as it would while
+the user reads and types. Exits with status 1 if the static prefix layout does
+not cache more than the others, or if its first system message differs
+between passengers.
+"""
+import argparse
+import itertools
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+from datetime import datetime, timedelta
+
+os.environ.setdefault("TAVILY_API_KEY", "offline")
+
+from benchmarks.bench_e2e import build_script, replay
+from benchmarks.fixtures import PASSENGER_ID, make_travel_db
+
+PROMPT_BUILDERS = ["get_flight_booking_prompt", "get_book_hotel_prompt", "get_car_rental_prompt",
+                   "get_book_excursion_prompt", "get_primary_assistant_prompt"]
+
+
+class Clock:
+    def __init__(self, step):
+        self.now = datetime(2024, 5, 1, 9, 0)
+        self.step = timedelta(seconds=step)
+
+    def __call__(self):
+        self.now += self.step
+        return self.now.isoformat(sep=" ", timespec="minutes")
+
+
+def in_system_message(builder, time):
+    """The prompt of `builder` with its context inside the system message, as before."""
+    from langchain_core.prompts import ChatPromptTemplate
+
+    def build():
+        instructions, _, context = builder().messages
+        return ChatPromptTemplate.from_messages([
+            ("system", instructions.prompt.template + "\n\n" + context.prompt.template),
+            ("placeholder", "{messages}"),
+        ]).partial(time=time)
+    return build
+
+
+def layouts(clock):
+    import src.agent
+
+    builders = {name: getattr(src.agent, name) for name in PROMPT_BUILDERS}
+    return builders, {
+        "system+frozen": {name: in_system_message(b, clock()) for name, b in builders.items()},
+        "system+clock": {name: in_system_message(b, clock) for name, b in builders.items()},
+        "static prefix": {name: (lambda b=b: b().partial(time=clock)) for name, b in builders.items()},
+    }
+
+
+def run_layout(prompts, db, backup_file, passengers, tmp):
+    import src.agent
+    from langchain_core.embeddings import DeterministicFakeEmbedding
+
+    from main import QUESTIONS
+    from src.models.stub_llm import PrefixCachingChatModel, StubChatModel
+    from src.tools.db import prepare_db, reset_db
+    from src.tools.registry import handlers
+
+    for name, build in prompts.items():
+        setattr(src.agent, name, build)
+    reset_db(db, backup_file)
+    prepare_db(db)
+    handlers.configure("general", chroma_persist_dir=os.path.join(tmp, "chroma"))
+    llm = PrefixCachingChatModel()
+    agent = src.agent.CustomerSupportAgent(
+        llm=llm,
+        tool_llm=StubChatModel(response="change flight to an earlier time"),
+        embeddings=DeterministicFakeEmbedding(size=256),
+    )
+    agent.logger.log_event = lambda event, config=None: None
+    ratios = []
+    for passenger_id in passengers:
+        before = agent.usage.stats()
+        llm.script = build_script(db, passenger_id)
+        llm.reset()
+        replay(agent, QUESTIONS, passenger_id=passenger_id)
+        after = agent.usage.stats()
+        sent = after["input_tokens"] - before["input_tokens"]
+        ratios.append((after["cached_tokens"] - before["cached_tokens"]) / sent)
+    handlers.reset()
+    return agent.usage.stats(), ratios
+
+
+def static_prefixes(passengers):
+    """The first message of every prompt, formatted for each passenger."""
+    import src.agent
+
+    prefixes = set()
+    for name, passenger_id in itertools.product(PROMPT_BUILDERS, passengers):
+        messages = getattr(src.agent, name)().format_messages(messages=[("user", "hi")], user_info=passenger_id)
+        prefixes.add((name, messages[0].content))
+    return len(prefixes) == len(PROMPT_BUILDERS)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--passengers", type=int, default=5)
+    parser.add_argument("--seconds-per-call", type=float, default=20.0)
+    args = parser.parse_args()
+
+    import src.agent
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = os.environ["TRAVEL_DB_PATH"] = make_travel_db(os.path.join(tmp, "travel.sqlite"))
+        backup_file = shutil.copy(db, os.path.join(tmp, "travel.backup.sqlite"))
+        conn = sqlite3.connect(db)
+        others = [row[0] for row in conn.execute(
+            "SELECT DISTINCT passenger_id FROM tickets WHERE passenger_id != ? ORDER BY passenger_id LIMIT ?",
+            (PASSENGER_ID, args.passengers - 1))]
+        conn.close()
+        passengers = [PASSENGER_ID] + others
+
+        builders, candidates = layouts(Clock(args.seconds_per_call))
+        stable = static_prefixes(passengers)
+        results = {}
+        try:
+            for name, prompts in candidates.items():
+                results[name] = run_layout(prompts, db, backup_file, passengers, tmp)
+        finally:
+            for name, build in builders.items():
+                setattr(src.agent, name, build)
+
+    print(f"{len(passengers)} conversations, {results['static prefix'][0]['calls'] // len(passengers)} model calls each")
+    print(f"{'':16s} {'prompt tokens':>14s} {'cached':>10s} {'ratio':>7s} {'first':>7s} {'later':>7s}")
+    for name, (stats, ratios) in results.items():
+        later = sum(ratios[1:]) / len(ratios[1:]) if len(ratios) > 1 else 0.0
+        print(f"  {name:14s} {stats['input_tokens']:14d} {stats['cached_tokens']:10d}"
+              f" {stats['cached_ratio']:7.1%} {ratios[0]:7.1%} {later:7.1%}")
+    print(f"static prefix identical for all passengers: {stable}")
+    best = results["static prefix"][0]["cached_ratio"]
+    if not stable or any(stats["cached_ratio"] >= best for name, (stats, _) in results.items()
+                         if name != "static prefix"):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""Tail latency of an Assistant under a flaky, slow-tailed model.
+
+    python -m benchmarks.bench_retry [--calls 2000] [--concurrency 50]
+        [--latency 0.05] [--slow-rate 0.05] [--slow-factor 20] [--error-rate 0.02]
+
+The stand-in model answers after `latency` seconds, but `slow-rate` of the
+calls take `slow-factor` times longer and `error-rate` of them fail with a 429
+carrying a retry-after header. The same workload runs once with retries only
+and once with hedging at the observed p95; p50/p99 latency and the policy
+counters are printed for both.
+"""
+import argparse
+import asyncio
+import random
+import time
+from operator import itemgetter
+
+from langchain_core.outputs import ChatGeneration, ChatResult
+from langchain_core.runnables import RunnableLambda
+
+from src.models.assistant import Assistant
+from src.models.retry import RetryPolicy
+from src.models.stub_llm import StubChatModel
+
+
+class RateLimited(Exception):
+    status_code = 429
+
+    class response:
+        status_code = 429
+        headers = {"retry-after-ms": "20"}
+
+
+class FlakyChatModel(StubChatModel):
+    slow_rate: float = 0.05
+    slow_factor: float = 20.0
+    error_rate: float = 0.02
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        if random.random() < self.error_rate:
+            await asyncio.sleep(self.latency / 2)
+            raise RateLimited()
+        slow = random.random() < self.slow_rate
+        await asyncio.sleep(self.latency * (self.slow_factor if slow else 1))
+        return ChatResult(generations=[ChatGeneration(message=self._respond(messages))])
+
+
+def percentile(samples, q):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * q))]
+
+
+async def run(assistant, calls, concurrency):
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies, errors = [], []
+
+    async def one():
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                await assistant.acall({"messages": [("user", "سلام")]}, {})
+            except RateLimited as e:
+                errors.append(e)
+            latencies.append(time.perf_counter() - start)
+
+    await asyncio.gather(*(one() for _ in range(calls)))
+    return latencies, errors
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--calls", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--slow-rate", type=float, default=0.05)
+    parser.add_argument("--slow-factor", type=float, default=20.0)
+    parser.add_argument("--error-rate", type=float, default=0.02)
+    args = parser.parse_args()
+
+    llm = FlakyChatModel(latency=args.latency, slow_rate=args.slow_rate,
+                         slow_factor=args.slow_factor, error_rate=args.error_rate)
+    runnable = RunnableLambda(itemgetter("messages")) | llm
+    for name, policy in [
+        ("retries only", RetryPolicy(base_delay=0.01)),
+        ("hedge at p95", RetryPolicy(base_delay=0.01, hedge_quantile=0.95)),
+    ]:
+        random.seed(0)
+        latencies, errors = asyncio.run(run(Assistant(runnable, retry=policy), args.calls, args.concurrency))
+        stats = policy.stats()
+        print(f"{name:14s} p50 {percentile(latencies, 0.5) * 1e3:7.1f}ms  p99 {percentile(latencies, 0.99) * 1e3:7.1f}ms"
+              f"  retries {stats['retries']:4d} rate_limited {stats['rate_limited']:4d}"
+              f" hedges {stats['hedges']:4d} won {stats['hedge_wins']:4d} failed calls {len(errors)}")
+
+
+if __name__ == "__main__":
+    main()
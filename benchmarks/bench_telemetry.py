@@ -0,0 +1,148 @@
+"""Per-node spans and latency quantiles of the main.py conversation, and what they cost.
+
+    python -m benchmarks.bench_telemetry [--repeat 5] [--llm-latency 0]
+
+Replays the main.py conversation (see bench_e2e) `repeat` times with
+src.telemetry recording every node, and as often with the nodes left
+unwrapped, alternating the two. The spans of the first conversation are
+written out and checked. Prints the wall time per conversation of both,
+the p50/p95/p99 of every node, the spans of the turn that looks up the policy
+(where the translation model call shows up under the lookup_policy tool), and
+the first lines of the Prometheus text written to a file. The policy is
+looked up in English here, so that lookup_policy calls the translation model.
+
+Exits with status 1 if the spans file is not OTLP/JSON with one trace per
+user message, or if the policy translation is not a child of lookup_policy.
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+os.environ.setdefault("TAVILY_API_KEY", "offline")
+
+from benchmarks.bench_e2e import build_script, replay
+from benchmarks.fixtures import make_travel_db
+
+
+def untraced():
+    from langgraph.utils import coerce_to_runnable
+
+    from src.telemetry import Telemetry
+
+    class Untraced(Telemetry):
+        def wrap(self, name, node, entry=False):
+            return coerce_to_runnable(node, name=name, trace=False)
+    return Untraced()
+
+
+def english_policy_lookup(script):
+    """`script` with the lookup_policy query in English: Persian ones are searched untranslated."""
+    from src.models.stub_llm import tool_call
+
+    return [tool_call("lookup_policy", query="change flight to an earlier time")
+            if isinstance(step, dict) and step.get("name") == "lookup_policy" else step
+            for step in script]
+
+
+def check_spans(path, turns):
+    spans = []
+    with open(path) as f:
+        for line in f:
+            for resource in json.loads(line)["resourceSpans"]:
+                for scope in resource["scopeSpans"]:
+                    spans.extend(scope["spans"])
+    by_id = {span["spanId"]: span for span in spans}
+    traces = {span["traceId"] for span in spans}
+    translations = [span for span in spans if span["name"].startswith("llm ")
+                    and {"key": "llm.role", "value": {"stringValue": "tool"}} in span["attributes"]]
+    nested = all(by_id[span["parentSpanId"]]["name"] == "tool lookup_policy" for span in translations)
+    return spans, by_id, len(traces) == turns and bool(translations) and nested
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--llm-latency", type=float, default=0.0)
+    args = parser.parse_args()
+
+    from langchain_core.embeddings import DeterministicFakeEmbedding
+
+    from main import QUESTIONS
+    from src.agent import CustomerSupportAgent
+    from src.models.stub_llm import ScriptedChatModel, StubChatModel
+    from src.telemetry import Telemetry
+    from src.tools.db import prepare_db, reset_db
+    from src.tools.registry import handlers
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = os.environ["TRAVEL_DB_PATH"] = make_travel_db(os.path.join(tmp, "travel.sqlite"))
+        backup_file = shutil.copy(db, os.path.join(tmp, "travel.backup.sqlite"))
+        handlers.configure("general", chroma_persist_dir=os.path.join(tmp, "chroma"))
+        spans_file, metrics_file = os.path.join(tmp, "spans.jsonl"), os.path.join(tmp, "metrics.prom")
+        telemetry = Telemetry(spans_file=spans_file, metrics_file=metrics_file)
+        agents = {}
+        for name, t in (("telemetry", telemetry), ("unwrapped", untraced())):
+            llm = ScriptedChatModel(latency=args.llm_latency)
+            agents[name] = (llm, CustomerSupportAgent(
+                llm=llm, tool_llm=StubChatModel(response="change flight to an earlier time"),
+                embeddings=DeterministicFakeEmbedding(size=256), telemetry=t))
+            agents[name][1].logger.log_event = lambda event, config=None: None
+        agents["telemetry"][1].warmup()
+
+        walls = {name: [] for name in agents}
+        for i in range(args.repeat + 1):
+            order = list(agents.items())
+            for name, (llm, agent) in order[i % 2:] + order[:i % 2]:
+                reset_db(db, backup_file)
+                prepare_db(db)
+                llm.script = english_policy_lookup(build_script(db))
+                llm.reset()
+                start = time.perf_counter()
+                replay(agent, QUESTIONS)
+                if i:
+                    walls[name].append(time.perf_counter() - start)
+            if not i:
+                # the spans of the first run are checked: later ones find the policy translation cached
+                telemetry.flush()
+            else:
+                telemetry.take_spans()
+        spans, by_id, ok = check_spans(spans_file, len(QUESTIONS))
+        telemetry.flush()
+        with open(metrics_file) as f:
+            metrics = f.read()
+        handlers.reset()
+
+    for name, samples in walls.items():
+        print(f"{name:10s} {sum(samples) / len(samples) * 1e3:9.2f}ms per conversation"
+              f" (min {min(samples) * 1e3:.2f}ms)")
+    node_spans = sum(1 for span in spans if span["name"].startswith("node "))
+    overhead = (sum(walls["telemetry"]) - sum(walls["unwrapped"])) / len(walls["telemetry"])
+    print(f"{len(spans)} spans per conversation, {node_spans} of them nodes,"
+          f" {overhead / node_spans * 1e6:.1f}us more per node with telemetry")
+    print(f"{'node':32s} {'count':>6s} {'p50':>9s} {'p95':>9s} {'p99':>9s}")
+    for node, stats in telemetry.stats().items():
+        print(f"  {node:30s} {stats['count']:6d} {stats['p50_ms']:7.3f}ms {stats['p95_ms']:7.3f}ms"
+              f" {stats['p99_ms']:7.3f}ms")
+    policy = next(span for span in spans if span["name"] == "tool lookup_policy")
+    print("policy turn:")
+    for span in sorted(spans, key=lambda span: int(span["startTimeUnixNano"])):
+        if span["traceId"] != policy["traceId"]:
+            continue
+        depth, parent = 0, span.get("parentSpanId")
+        while parent:
+            depth, parent = depth + 1, by_id[parent].get("parentSpanId")
+        duration = (int(span["endTimeUnixNano"]) - int(span["startTimeUnixNano"])) / 1e6
+        print(f"  {'  ' * depth}{span['name']:{40 - 2 * depth}s} {duration:8.3f}ms")
+    print("metrics file:")
+    print("".join(f"  {line}\n" for line in metrics.splitlines()[:8]), end="")
+    print(f"spans are OTLP/JSON, one trace per message, translation under lookup_policy: {ok}")
+    if not ok:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
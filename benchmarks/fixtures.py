@@ -0,0 +1,177 @@
+import random
+import re
+import sqlite3
+from datetime import datetime, timedelta, timezone
+
+# The real travel2.sqlite is downloaded on first use, which is not possible in
+# offline benchmark runs. This builds a database with the same tables and value
+# formats so the handlers can be exercised against any amount of data.
+
+AIRPORTS = ["BSL", "ZRH", "GVA", "CDG", "FRA", "MUC", "AMS", "LHR", "VIE", "MXP",
+            "SHA", "PVG", "HKG", "NRT", "DXB", "IKA", "IST", "BCN", "FCO", "LIS"]
+CITIES = ["Basel", "Zurich", "Geneva", "Lucerne", "Bern", "Lugano", "Paris",
+          "Frankfurt", "Munich", "Amsterdam", "London", "Vienna", "Milan"]
+HOTEL_TIERS = ["Midscale", "Upper Midscale", "Upscale", "Luxury"]
+CAR_TIERS = ["Economy", "Midscale", "Premium", "Luxury"]
+HOTEL_BRANDS = ["Hilton", "Marriott", "Hyatt", "Holiday Inn", "Sheraton", "Ibis",
+                "Radisson", "Novotel", "Four Seasons", "Best Western"]
+CAR_BRANDS = ["Europcar", "Avis", "Hertz", "Sixt", "Budget", "Thrifty", "Enterprise"]
+KEYWORDS = ["museum", "history", "art", "culture", "hiking", "lake", "boat",
+            "shopping", "food", "wine", "castle", "old town", "mountains", "zoo"]
+
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S.%f%z"
+
+SCHEMA = """
+CREATE TABLE aircrafts_data (aircraft_code TEXT, model TEXT, range INTEGER);
+CREATE TABLE airports_data (airport_code TEXT, airport_name TEXT, city TEXT, coordinates TEXT, timezone TEXT);
+CREATE TABLE boarding_passes (ticket_no TEXT, flight_id INTEGER, boarding_no INTEGER, seat_no TEXT);
+CREATE TABLE bookings (book_ref TEXT, book_date TEXT, total_amount INTEGER);
+CREATE TABLE flights (flight_id INTEGER, flight_no TEXT, scheduled_departure TEXT, scheduled_arrival TEXT,
+                      departure_airport TEXT, arrival_airport TEXT, status TEXT, aircraft_code TEXT,
+                      actual_departure TEXT, actual_arrival TEXT);
+CREATE TABLE seats (aircraft_code TEXT, seat_no TEXT, fare_conditions TEXT);
+CREATE TABLE ticket_flights (ticket_no TEXT, flight_id INTEGER, fare_conditions TEXT, amount INTEGER);
+CREATE TABLE tickets (ticket_no TEXT, book_ref TEXT, passenger_id TEXT);
+CREATE TABLE car_rentals (id INTEGER, name TEXT, location TEXT, price_tier TEXT,
+                          start_date TEXT, end_date TEXT, booked INTEGER);
+CREATE TABLE hotels (id INTEGER, name TEXT, location TEXT, price_tier TEXT,
+                     checkin_date TEXT, checkout_date TEXT, booked INTEGER);
+CREATE TABLE trip_recommendations (id INTEGER, name TEXT, location TEXT, keywords TEXT,
+                                   details TEXT, booked INTEGER);
+"""
+
+PASSENGER_ID = "3442 587242"
+
+FTS_SHADOW = re.compile(r"_fts_(config|data|idx|content|docsize)\b")
+
+
+def _ts(value: datetime) -> str:
+    text = value.strftime(TIMESTAMP_FORMAT)
+    return text[:-2] + ":" + text[-2:]
+
+
+def make_travel_db(path: str, flights: int = 2000, passengers: int = 200,
+                   hotels: int = 500, car_rentals: int = 500,
+                   trip_recommendations: int = 500, seed: int = 0) -> str:
+    """Create a synthetic travel database at `path` and return the path.
+
+    Timestamps are written in the same text format pandas produces, and the
+    newest `actual_departure` lies in the past, like in the published dataset.
+    """
+    rng = random.Random(seed)
+    tz = timezone(timedelta(hours=-4))
+    base = datetime(2024, 4, 1, tzinfo=tz)
+    conn = sqlite3.connect(path)
+    conn.executescript(SCHEMA)
+
+    conn.executemany(
+        "INSERT INTO airports_data VALUES (?, ?, ?, ?, ?)",
+        [(code, code + " Airport", rng.choice(CITIES), "(0,0)", "Europe/Zurich") for code in AIRPORTS],
+    )
+    conn.execute("INSERT INTO aircrafts_data VALUES ('773', 'Boeing 777-300', 11100)")
+
+    flight_rows = []
+    for flight_id in range(1, flights + 1):
+        departure_airport, arrival_airport = rng.sample(AIRPORTS, 2)
+        departure = base + timedelta(minutes=rng.randrange(0, 60 * 24 * 60))
+        arrival = departure + timedelta(minutes=rng.randrange(60, 60 * 12))
+        flown = departure < base + timedelta(days=30)
+        flight_rows.append((
+            flight_id, "LX%04d" % rng.randrange(10000), _ts(departure), _ts(arrival),
+            departure_airport, arrival_airport, "Arrived" if flown else "Scheduled", "773",
+            _ts(departure) if flown else "\\N", _ts(arrival) if flown else "\\N",
+        ))
+    conn.executemany("INSERT INTO flights VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", flight_rows)
+
+    for n in range(passengers):
+        passenger_id = PASSENGER_ID if n == 0 else "%04d %06d" % (rng.randrange(10000), rng.randrange(10 ** 6))
+        book_ref = "%06X" % n
+        conn.execute("INSERT INTO bookings VALUES (?, ?, ?)",
+                     (book_ref, _ts(base - timedelta(days=rng.randrange(1, 60))), rng.randrange(100, 5000)))
+        for leg in range(rng.randrange(1, 4)):
+            ticket_no = "%013d" % (n * 10 + leg)
+            flight_id = rng.randrange(1, flights + 1)
+            conn.execute("INSERT INTO tickets VALUES (?, ?, ?)", (ticket_no, book_ref, passenger_id))
+            conn.execute("INSERT INTO ticket_flights VALUES (?, ?, ?, ?)",
+                         (ticket_no, flight_id, rng.choice(["Economy", "Business"]), rng.randrange(100, 2000)))
+            conn.execute("INSERT INTO boarding_passes VALUES (?, ?, ?, ?)",
+                         (ticket_no, flight_id, leg + 1, "%d%s" % (rng.randrange(1, 40), rng.choice("ABCDEF"))))
+
+    day = base.date()
+    conn.executemany(
+        "INSERT INTO hotels VALUES (?, ?, ?, ?, ?, ?, ?)",
+        [(i, "%s %s" % (rng.choice(HOTEL_BRANDS), rng.choice(CITIES)), rng.choice(CITIES),
+          rng.choice(HOTEL_TIERS), str(day + timedelta(days=i % 30)),
+          str(day + timedelta(days=i % 30 + 3)), 0) for i in range(1, hotels + 1)],
+    )
+    conn.executemany(
+        "INSERT INTO car_rentals VALUES (?, ?, ?, ?, ?, ?, ?)",
+        [(i, rng.choice(CAR_BRANDS), rng.choice(CITIES), rng.choice(CAR_TIERS),
+          str(day + timedelta(days=i % 30)), str(day + timedelta(days=i % 30 + 5)), 0)
+         for i in range(1, car_rentals + 1)],
+    )
+    conn.executemany(
+        "INSERT INTO trip_recommendations VALUES (?, ?, ?, ?, ?, ?)",
+        [(i, "%s %s tour" % (rng.choice(CITIES), rng.choice(KEYWORDS)), rng.choice(CITIES),
+          ", ".join(rng.sample(KEYWORDS, 3)), "A guided visit.", 0)
+         for i in range(1, trip_recommendations + 1)],
+    )
+    conn.commit()
+    conn.close()
+    return path
+
+
+def handler_calls(db):
+    """(label, callable) for every handler query, on fresh handlers for `db`."""
+    from src.tools.car_tool_handler import CarToolHandler
+    from src.tools.excursion_tool_handler import ExcursionToolHandler
+    from src.tools.flight_tool_handler import FlightToolHandler
+    from src.tools.hotel_tool_handler import HotelToolHandler
+
+    flight = FlightToolHandler(db, user_info_cache_size=0)
+    hotel, car, excursion = HotelToolHandler(db), CarToolHandler(db), ExcursionToolHandler(db)
+    conn = sqlite3.connect(db)
+    ticket_no = conn.execute("SELECT ticket_no FROM tickets WHERE passenger_id = ?", (PASSENGER_ID,)).fetchone()[0]
+    flight_id = conn.execute("SELECT flight_id FROM flights ORDER BY scheduled_departure DESC").fetchone()[0]
+    conn.close()
+    return [
+        ("fetch_user_flight_information", lambda: flight.fetch_user_flight_information(PASSENGER_ID)),
+        ("search_flights(departure)", lambda: flight.search_flights(departure_airport="BSL")),
+        ("search_flights(route, time)", lambda: flight.search_flights(
+            departure_airport="BSL", arrival_airport="ZRH", start_time="2024-05-01", end_time="2024-05-15")),
+        ("search_flights(arrival)", lambda: flight.search_flights(arrival_airport="ZRH")),
+        ("search_flights(time)", lambda: flight.search_flights(start_time="2024-05-01", end_time="2024-05-02")),
+        ("search_flights(next page)", lambda: flight.search_flights(departure_airport="BSL", cursor="0:0")),
+        ("update_ticket_to_new_flight", lambda: flight.update_ticket_to_new_flight(ticket_no, flight_id, PASSENGER_ID)),
+        ("cancel_ticket", lambda: flight.cancel_ticket("0" * 13, PASSENGER_ID)),
+        ("search_hotels", lambda: hotel.search_hotels(location="Basel")),
+        ("search_hotels(stay)", lambda: hotel.search_hotels(
+            location="Basel", price_tier="Midscale", checkin_date="2024-05-01", checkout_date="2024-05-08")),
+        ("book_hotel", lambda: hotel.book_hotel(1, "2024-05-01", "2024-05-08", PASSENGER_ID)),
+        ("update_hotel", lambda: hotel.update_hotel(1, "2024-05-02", "2024-05-09", PASSENGER_ID)),
+        ("cancel_hotel", lambda: hotel.cancel_hotel(1, PASSENGER_ID)),
+        ("search_car_rentals", lambda: car.search_car_rentals(location="Basel")),
+        ("search_car_rentals(dates)", lambda: car.search_car_rentals(
+            location="Basel", price_tier="Economy", start_date="2024-05-01", end_date="2024-05-08")),
+        ("book_car_rental", lambda: car.book_car_rental(1, "2024-05-01", "2024-05-08", PASSENGER_ID)),
+        ("update_car_rental", lambda: car.update_car_rental(1, "2024-05-02", "2024-05-09", PASSENGER_ID)),
+        ("cancel_car_rental", lambda: car.cancel_car_rental(1, PASSENGER_ID)),
+        ("search_trip_recommendations", lambda: excursion.search_trip_recommendations(location="Basel")),
+        ("book_excursion", lambda: excursion.book_excursion(1)),
+        ("update_excursion", lambda: excursion.update_excursion(1, "a new plan")),
+        ("cancel_excursion", lambda: excursion.cancel_excursion(1)),
+    ], flight.pool
+
+
+def traced(pool, fn):
+    """Run `fn` and return the SQL statements it executed on this thread's connection."""
+    statements = []
+    conn = pool.connection()
+    conn.set_trace_callback(statements.append)
+    try:
+        fn()
+    finally:
+        conn.set_trace_callback(None)
+    # leave out what FTS5 runs on its own shadow tables
+    return [sql for sql in statements if sql.lstrip().split(None, 1)[0].upper() in ("SELECT", "INSERT", "UPDATE", "DELETE")
+            and not FTS_SHADOW.search(sql)]
@@ -0,0 +1,139 @@
+"""Load generator for serve.py.
+
+    python -m benchmarks.load_generator [--conversations 200] [--turns 3] [--stub-llm-latency 0.2]
+                                        [--stream] [--stub-token-latency 0.02]
+
+Starts `serve.py` with the local stand-in LLM on a synthetic database, then
+drives `--conversations` concurrent conversations of `--turns` turns each, every
+turn sent once the previous answer arrived. Reports throughput and p50/p99
+latency per turn as seen by the client; with --stream the turns are streamed
+and the time to the first reply token is reported as well.
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+import uuid
+
+from benchmarks.fixtures import PASSENGER_ID, make_travel_db
+
+QUESTIONS = [
+    "سلام، پرواز من چه زمانی است؟",
+    "آیا اجازه دارم پروازم رو به زمانی زودتر موکول کنم؟",
+    "در مورد اسکان و حمل و نقل چطور؟",
+    "خب حالا چه توصیه هایی برای گشت و گذار دارید؟",
+]
+
+
+def percentile(samples, q):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * q))]
+
+
+class Client:
+    def __init__(self, process):
+        self.process = process
+        self.pending = {}
+        self.listeners = {}
+
+    async def read_responses(self):
+        while True:
+            line = await self.process.stdout.readline()
+            if not line:
+                break
+            response = json.loads(line)
+            if response.get("event") not in (None, "end"):
+                listener = self.listeners.get(response.get("id"))
+                if listener is not None:
+                    listener(response)
+                continue
+            self.listeners.pop(response.get("id"), None)
+            future = self.pending.pop(response.get("id"), None)
+            if future is not None:
+                future.set_result(response)
+
+    async def request(self, on_event=None, **payload):
+        request_id = str(uuid.uuid4())
+        future = asyncio.get_running_loop().create_future()
+        self.pending[request_id] = future
+        if on_event is not None:
+            # streamed request: every event before the last goes to on_event
+            self.listeners[request_id] = on_event
+            payload["stream"] = True
+        self.process.stdin.write((json.dumps({"id": request_id, **payload}) + "\n").encode())
+        await self.process.stdin.drain()
+        return await future
+
+
+async def conversation(client, turns, latencies, errors, first_tokens=None):
+    thread_id = str(uuid.uuid4())
+    for turn in range(turns):
+        start = time.perf_counter()
+        first = []
+        on_event = None
+        if first_tokens is not None:
+            def on_event(event):
+                if event["event"] == "token" and not first:
+                    first.append(time.perf_counter() - start)
+        response = await client.request(on_event, thread_id=thread_id, passenger_id=PASSENGER_ID,
+                                        message=QUESTIONS[turn % len(QUESTIONS)])
+        latencies.append(time.perf_counter() - start)
+        if first_tokens is not None:
+            first_tokens.extend(first)
+        if "error" in response:
+            errors.append(response["error"])
+
+
+async def main_async(args, db, checkpoint_db):
+    process = await asyncio.create_subprocess_exec(
+        sys.executable, "serve.py", "--db", db, "--checkpoint-db", checkpoint_db,
+        "--stub-llm-latency", str(args.stub_llm_latency), "--stub-token-latency", str(args.stub_token_latency),
+        stdin=asyncio.subprocess.PIPE, stdout=asyncio.subprocess.PIPE,
+        env={**os.environ, "TAVILY_API_KEY": os.environ.get("TAVILY_API_KEY", "offline"),
+             "OPENAI_API_KEY": os.environ.get("OPENAI_API_KEY", "offline")},
+    )
+    client = Client(process)
+    reader = asyncio.create_task(client.read_responses())
+    # one warm-up turn so server start-up is not counted
+    await conversation(client, 1, [], [])
+
+    latencies, errors = [], []
+    first_tokens = [] if args.stream else None
+    start = time.perf_counter()
+    await asyncio.gather(*(conversation(client, args.turns, latencies, errors, first_tokens)
+                           for _ in range(args.conversations)))
+    wall = time.perf_counter() - start
+
+    process.stdin.close()
+    await process.wait()
+    reader.cancel()
+
+    print(f"{args.conversations} conversations x {args.turns} turns, LLM stand-in {args.stub_llm_latency}s/call")
+    print(f"throughput {len(latencies) / wall:8.1f} turns/s over {wall:.2f}s")
+    print(f"latency    p50 {percentile(latencies, 0.5) * 1e3:8.1f}ms  p99 {percentile(latencies, 0.99) * 1e3:8.1f}ms")
+    if first_tokens:
+        print(f"1st token  p50 {percentile(first_tokens, 0.5) * 1e3:8.1f}ms  p99 {percentile(first_tokens, 0.99) * 1e3:8.1f}ms"
+              f"  ({len(first_tokens)} of {len(latencies)} turns streamed a reply)")
+    if errors:
+        print(f"{len(errors)} errors, first: {errors[0]}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--conversations", type=int, default=200)
+    parser.add_argument("--turns", type=int, default=3)
+    parser.add_argument("--stub-llm-latency", type=float, default=0.2)
+    parser.add_argument("--stub-token-latency", type=float, default=0.0,
+                        help="seconds between the words of a streamed stand-in answer")
+    parser.add_argument("--stream", action="store_true", help="stream the turns")
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as tmp:
+        db = make_travel_db(os.path.join(tmp, "travel.sqlite"))
+        asyncio.run(main_async(args, db, os.path.join(tmp, "checkpoints.sqlite")))
+
+
+if __name__ == "__main__":
+    main()
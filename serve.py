@@ -0,0 +1,69 @@
+import argparse
+import asyncio
+import os
+
+if __name__=="__main__":
+    parser = argparse.ArgumentParser(
+        description="Serve conversations as JSON lines on stdin/stdout: "
+                    '{"id": ..., "thread_id": ..., "passenger_id": ..., "message": ..., "stream": false}'
+    )
+    parser.add_argument("--model", default="gpt-3.5-turbo-0125")
+    parser.add_argument("--db", help="travel database path (default travel2.sqlite)")
+    parser.add_argument("--max-concurrency", type=int, default=256)
+    parser.add_argument("--checkpoint-db", default="checkpoints.sqlite",
+                        help="conversation checkpoints file, ':memory:' to keep them in RAM")
+    parser.add_argument("--keep-checkpoints", type=int, default=20,
+                        help="checkpoints kept per conversation")
+    parser.add_argument("--thread-ttl", type=float, default=7 * 24 * 3600,
+                        help="seconds after which an idle conversation is deleted")
+    parser.add_argument("--hedge-quantile", type=float,
+                        help="start a second LLM call when the first runs past this latency quantile, e.g. 0.95")
+    parser.add_argument("--stub-llm-latency", type=float,
+                        help="answer with a local stand-in model that sleeps this many seconds per call")
+    parser.add_argument("--stub-token-latency", type=float, default=0.0,
+                        help="seconds between the words of a streamed stand-in answer")
+    parser.add_argument("--retrieval-mode", choices=["vector", "bm25", "hybrid"],
+                        help="how lookup_policy searches the policy (default vector)")
+    parser.add_argument("--intent-router", action="store_true",
+                        help="route confidently classified messages to a skill without the primary assistant")
+    parser.add_argument("--answer-cache", type=float, metavar="THRESHOLD", nargs="?", const=0.75,
+                        help="answer reworded policy questions from earlier answers (similarity threshold, default 0.75)")
+    parser.add_argument("--spans-file", help="append node, tool and model call spans here as OTLP/JSON lines")
+    parser.add_argument("--metrics-file", help="write latency quantiles here in the Prometheus text format")
+    parser.add_argument("--metrics-port", type=int, help="serve the same at http://127.0.0.1:PORT/metrics")
+    parser.add_argument("--telemetry-interval", type=float, default=10.0,
+                        help="seconds between writes of the spans and metrics files")
+    args = parser.parse_args()
+
+    if args.db:
+        os.environ["TRAVEL_DB_PATH"] = args.db
+
+    from src.agent import CustomerSupportAgent
+    from src.checkpoint import DurableSqliteSaver
+    from src.models.answer_cache import AnswerCache
+    from src.models.intent import IntentRouter
+    from src.models.retry import RetryPolicy
+    from src.server import ChatServer
+    from src.telemetry import Telemetry
+
+    llm = None
+    if args.stub_llm_latency is not None:
+        from src.models.stub_llm import StubChatModel
+        llm = StubChatModel(latency=args.stub_llm_latency, token_latency=args.stub_token_latency)
+
+    checkpointer = DurableSqliteSaver.from_conn_string(
+        args.checkpoint_db, max_checkpoints=args.keep_checkpoints, thread_ttl=args.thread_ttl
+    )
+    telemetry = Telemetry(spans_file=args.spans_file, metrics_file=args.metrics_file,
+                          export_interval=args.telemetry_interval)
+    if args.metrics_port is not None:
+        telemetry.serve_prometheus(args.metrics_port)
+    agent = CustomerSupportAgent(model_name=args.model, llm=llm, checkpointer=checkpointer,
+                                 retry=RetryPolicy(hedge_quantile=args.hedge_quantile),
+                                 retrieval_mode=args.retrieval_mode,
+                                 telemetry=telemetry,
+                                 intent_router=IntentRouter() if args.intent_router else None,
+                                 answer_cache=(AnswerCache(threshold=args.answer_cache)
+                                               if args.answer_cache is not None else None))
+    agent.warmup(["database", "flight"])
+    asyncio.run(ChatServer(agent, max_concurrency=args.max_concurrency).serve_jsonl())
@@ -1,14 +1,25 @@
-from typing import Literal
+import asyncio
+from typing import TYPE_CHECKING, AsyncIterator, Awaitable, Callable, Iterator, Literal, Optional, Union
 
-from langchain_openai import ChatOpenAI
 from langgraph.graph import END, StateGraph
-from langgraph.checkpoint.sqlite import SqliteSaver
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.chat_models import BaseChatModel
 from langchain_core.messages import ToolMessage
+from langgraph.utils import RunnableCallable
 
+from .checkpoint import DurableSqliteSaver
 from .logger import Logger
-from .models.state import State
+from .telemetry import Telemetry
+from .tools.registry import handlers
+from .models.state import State, pending_tool_calls
 from .models.assistant import Assistant
-from .graph_utils import (user_info, create_entry_node, 
+from .models.history import HistoryManager
+from .models.intent import IntentRouter
+from .models.retry import RetryPolicy
+from .models.streaming import REPLY_TAG, StreamStats, TurnStream
+from .models.usage import UsageStats
+from .graph_utils import (ENTRY_NODES, user_info, auser_info, create_entry_node, 
+                          create_intent_node, create_answer_cache_nodes, route_cached_answer,
                           CompleteOrEscalate, create_route, 
                           pop_dialog_state, route_primary_assistant,
                           route_to_workflow)
@@ -23,22 +34,81 @@ from .tools.prompts import (get_flight_booking_prompt,
                             get_book_excursion_prompt, 
                             get_primary_assistant_prompt)
 
+if TYPE_CHECKING:
+    from .models.answer_cache import AnswerCache
+
+APPROVAL_PROMPT = (
+    "Do you approve of the above actions? Type 'y' to continue;"
+    " otherwise, explain your requested changed.\n\n"
+)
+
 class CustomerSupportAgent:
-    def __init__(self, model_name='gpt-3.5-turbo-0125') -> None:
+    def __init__(self, model_name='gpt-3.5-turbo-0125',
+                 llm: Optional[BaseChatModel] = None,
+                 tool_llm: Optional[BaseChatModel] = None,
+                 embeddings: Optional[Embeddings] = None,
+                 retrieval_mode: Optional[str] = None,
+                 checkpoint_db: str = ":memory:",
+                 checkpointer: Optional[DurableSqliteSaver] = None,
+                 history: Optional[HistoryManager] = None,
+                 retry: Optional[RetryPolicy] = None,
+                 logger: Optional[Logger] = None,
+                 telemetry: Optional[Telemetry] = None,
+                 intent_router: Optional[IntentRouter] = None,
+                 answer_cache: Optional["AnswerCache"] = None) -> None:
         # TODO get config file as input
-        self.llm = ChatOpenAI(model=model_name)
+        if llm is None:
+            from langchain_openai import ChatOpenAI
+            # retries are done by self.retry, not inside the client
+            llm = ChatOpenAI(model=model_name, max_retries=0)
+        self.llm = llm
+        # models used inside tools (policy translation and retrieval)
+        if tool_llm is not None:
+            handlers.configure("general", llm=tool_llm)
+        if embeddings is not None:
+            handlers.configure("general", embeddings=embeddings)
+        # "vector", "bm25" or "hybrid", see GeneralToolHandler
+        if retrieval_mode is not None:
+            handlers.configure("general", retrieval_mode=retrieval_mode)
+        # checkpoints of all conversations; a file path keeps them across restarts
+        self.memory = checkpointer or DurableSqliteSaver.from_conn_string(checkpoint_db)
+        # shared by all assistants, see self.retry.stats()
+        self.retry = retry or RetryPolicy()
+        # prompt tokens sent and read from the provider's prompt cache, see self.usage.stats()
+        self.usage = UsageStats()
+        # time to first token and between tokens of streamed turns, see self.stream_stats.stats()
+        self.stream_stats = StreamStats()
+        # spans and latency quantiles of every graph node, see self.telemetry.stats()
+        self.telemetry = telemetry or Telemetry()
+        # with a router, confident messages skip the primary assistant's routing call
+        self.intent_router = intent_router
+        # with a cache, reworded policy questions get the answer given before, see self.answer_cache.stats()
+        self.answer_cache = answer_cache
+        # keeps every assistant prompt within a token budget
+        self.history = history or HistoryManager(entry_tools=[
+            ToFlightBookingAssistant.__name__,
+            ToBookCarRental.__name__,
+            ToHotelBookingAssistant.__name__,
+            ToBookExcursion.__name__,
+        ])
         self.initialize_skills()
         self.init_primary_assistant()
         self.init_graph()
-        self.logger = Logger()
+        # JSON lines on stdout, written by a background thread
+        self.logger = logger or Logger()
 
+    def warmup(self, names=None):
+        # Tool handlers (DB, retriever, LLM clients) are built on first use.
+        # Call this to pay that cost before the first conversation instead.
+        handlers.warmup(names)
 
     def initialize_skills(self):
         # this method initialized all the tools and returns an empty state
         self.skills = {'flight':{'tools':{'safe':get_flight_safe_tools(), 'sensitive':get_flight_sensitive_tools()},
                                  'assistant_name': "Flight Updates & Booking Assistant",
                                  'route':{"name":"update_flight",
-                                          "type_hint":Literal["update_flight_sensitive_tools",
+                                          "type_hint":Literal["update_flight",
+                                                              "update_flight_sensitive_tools",
                                                               "update_flight_safe_tools",
                                                               "leave_skill",
                                                               "__end__",]},
@@ -46,7 +116,8 @@ class CustomerSupportAgent:
                        'hotel':{'tools':{'safe':get_hotel_safe_tools(), 'sensitive':get_hotel_sensitive_tools()},
                                 'assistant_name': "Hotel Booking Assistant",
                                 'route': {"name":"book_hotel",
-                                          "type_hint":Literal["leave_skill", 
+                                          "type_hint":Literal["book_hotel",
+                                                              "leave_skill", 
                                                               "book_hotel_safe_tools", 
                                                               "book_hotel_sensitive_tools", 
                                                               "__end__"]},
@@ -54,7 +125,8 @@ class CustomerSupportAgent:
                        'car':{'tools':{'safe':get_car_safe_tools(), 'sensitive':get_car_sensitive_tools()},
                               'assistant_name':"Car Rental Assistant",
                               "route":{"name":"book_car_rental",
-                                       "type_hint":Literal["book_car_rental_safe_tools",
+                                       "type_hint":Literal["book_car_rental",
+                                                           "book_car_rental_safe_tools",
                                                            "book_car_rental_sensitive_tools",
                                                            "leave_skill",
                                                            "__end__",]},
@@ -62,7 +134,8 @@ class CustomerSupportAgent:
                        'excursion':{'tools':{'safe':get_excursion_safe_tools(), 'sensitive':get_excursion_sensitive_tools()},
                                     'assistant_name':"Trip Recommendation Assistant",
                                     "route":{"name":"book_excursion",
-                                             "type_hint":Literal["book_excursion_safe_tools",
+                                             "type_hint":Literal["book_excursion",
+                                                                 "book_excursion_safe_tools",
                                                                  "book_excursion_sensitive_tools",
                                                                  "leave_skill",
                                                                  "__end__",]},
@@ -82,66 +155,99 @@ class CustomerSupportAgent:
                 ToBookCarRental,
                 ToHotelBookingAssistant,
                 ToBookExcursion,
-                ])
+                ]).with_config(tags=[REPLY_TAG])
         
     def get_runnable_skill(self, prompt, tools):
-        return prompt | self.llm.bind_tools(tools + [CompleteOrEscalate])
+        return prompt | self.llm.bind_tools(tools + [CompleteOrEscalate]).with_config(tags=[REPLY_TAG])
     
     def init_graph(self):
         builder = StateGraph(State)
-        builder.add_node("fetch_user_info", user_info)
+
+        def add_node(name, action, entry=False):
+            # every node records a timing span, see Telemetry.wrap
+            builder.add_node(name, self.telemetry.wrap(name, action, entry=entry))
+
+        add_node("fetch_user_info", RunnableCallable(user_info, auser_info, name="fetch_user_info"), entry=True)
         builder.set_entry_point("fetch_user_info")
 
         for k, v in self.skills.items():
-            builder.add_node(
+            add_node(
             "enter_"+v["route"]["name"],
             create_entry_node(v["assistant_name"], v["route"]["name"]),
             )
-            builder.add_node(v["route"]["name"], Assistant(self.skill_runnables[k]))
+            add_node(v["route"]["name"], Assistant(self.skill_runnables[k], self.history, self.retry, self.usage).as_node(v["route"]["name"]))
             builder.add_edge("enter_"+v["route"]["name"], v["route"]["name"])
-            builder.add_node(
+            safe, sensitive = v['tools']['safe'], v['tools']['sensitive']
+            add_node(
                 v["route"]["name"] + "_sensitive_tools",
-                create_tool_node_with_fallback(v['tools']['sensitive']),
+                create_tool_node_with_fallback(sensitive),
             )
-            builder.add_node(
+            add_node(
                 v["route"]["name"] + "_safe_tools",
-                create_tool_node_with_fallback(v['tools']['safe']),
+                # also answers calls to tools this skill doesn't have
+                create_tool_node_with_fallback(
+                    safe, known_names=[t.name for t in safe + sensitive] + [CompleteOrEscalate.__name__]
+                ),
             )
 
-            builder.add_edge(v["route"]["name"] + "_sensitive_tools", v["route"]["name"])
-            builder.add_edge(v["route"]["name"] + "_safe_tools", v["route"]["name"])
-            builder.add_conditional_edges(v["route"]["name"], create_route(v["tools"]["safe"], 
-                                                                           v["route"]["name"], 
-                                                                           v["route"]["type_hint"]))
-        builder.add_node("leave_skill", pop_dialog_state)
+            # the calls of one message may need several tool nodes, the route
+            # goes back to the assistant once all of them are answered
+            route = create_route(safe, sensitive, v["route"]["name"], v["route"]["type_hint"])
+            builder.add_conditional_edges(v["route"]["name"], route)
+            builder.add_conditional_edges(v["route"]["name"] + "_safe_tools", route)
+            builder.add_conditional_edges(v["route"]["name"] + "_sensitive_tools", route)
+        add_node("leave_skill", pop_dialog_state)
         builder.add_edge("leave_skill", "primary_assistant")
 
         # Primary assistant
-        builder.add_node("primary_assistant", Assistant(self.assistant_runnable))
-        builder.add_node(
-            "primary_assistant_tools", create_tool_node_with_fallback(get_primary_assistant_tools())
-        )
-        
-        builder.add_conditional_edges(
-             "primary_assistant",
-             route_primary_assistant,
-             {
-                "enter_update_flight": "enter_update_flight",
-                "enter_book_car_rental": "enter_book_car_rental",
-                "enter_book_hotel": "enter_book_hotel",
-                "enter_book_excursion": "enter_book_excursion",
-                "primary_assistant_tools": "primary_assistant_tools",
-                END: END,
-            },
+        add_node("primary_assistant", Assistant(self.assistant_runnable, self.history, self.retry, self.usage).as_node("primary_assistant"))
+        primary_assistant_tools = get_primary_assistant_tools()
+        add_node(
+            "primary_assistant_tools",
+            create_tool_node_with_fallback(
+                primary_assistant_tools, known_names=[t.name for t in primary_assistant_tools] + list(ENTRY_NODES)
+            ),
         )
-        builder.add_edge("primary_assistant_tools", "primary_assistant")
+        primary_routes = {
+            "primary_assistant": "primary_assistant",
+            "enter_update_flight": "enter_update_flight",
+            "enter_book_car_rental": "enter_book_car_rental",
+            "enter_book_hotel": "enter_book_hotel",
+            "enter_book_excursion": "enter_book_excursion",
+            "primary_assistant_tools": "primary_assistant_tools",
+            END: END,
+        }
+        builder.add_conditional_edges("primary_assistant_tools", route_primary_assistant, primary_routes)
 
-        builder.add_conditional_edges("fetch_user_info", route_to_workflow)
+        # a new message at the primary assistant passes the answer cache and the
+        # intent router first, when they are enabled
+        first = "primary_assistant"
+        if self.intent_router is not None:
+            add_node("route_intent", create_intent_node(self.intent_router))
+            builder.add_conditional_edges("route_intent", route_primary_assistant, primary_routes)
+            first = "route_intent"
+        if self.answer_cache is None:
+            builder.add_conditional_edges("primary_assistant", route_primary_assistant, primary_routes)
+        else:
+            check, acheck, update, aupdate = create_answer_cache_nodes(self.answer_cache)
+            add_node("check_answer_cache", RunnableCallable(check, acheck, name="check_answer_cache"))
+            builder.add_conditional_edges("check_answer_cache", route_cached_answer,
+                                          {"primary_assistant": first, END: END})
+            first = "check_answer_cache"
+            # final answers of the primary assistant may be stored for later questions
+            add_node("update_answer_cache", RunnableCallable(update, aupdate, name="update_answer_cache"))
+            builder.add_conditional_edges("primary_assistant", route_primary_assistant,
+                                          {**primary_routes, END: "update_answer_cache"})
+            builder.add_edge("update_answer_cache", END)
+        builder.add_conditional_edges("fetch_user_info", route_to_workflow, {
+            "primary_assistant": first,
+            **{name: name for name in ("update_flight", "book_car_rental", "book_hotel", "book_excursion")},
+        })
 
         self.builder = builder
 
         # Compile graph
-        self.memory = SqliteSaver.from_conn_string(":memory:")
+        self.memory.start_compaction()
         self.graph = builder.compile(
             checkpointer=self.memory,
             # Let the user approve or deny the use of sensitive tools
@@ -153,43 +259,112 @@ class CustomerSupportAgent:
             ],
         )
 
-    def run(self, question, config):
-        events = self.graph.stream(
-            {"messages": ("user", question)}, config, stream_mode="values"
-        )
+    def _resume_input(self, snapshot, user_input: str):
+        if user_input.strip() == "y":
+            # Just continue
+            return None
+        # Satisfy every pending tool invocation by
+        # providing instructions on the requested changes / change of mind
+        return {
+            "messages": [
+                ToolMessage(
+                    tool_call_id=tc["id"],
+                    content=f"API call denied by user. Reasoning: '{user_input}'. Continue assisting, accounting for the user's input.",
+                )
+                for tc in pending_tool_calls(snapshot.values["messages"])
+            ]
+        }
 
-        for event in events:
-            self.logger.log_event(event)
+    def run(self, question, config, stream_tokens: bool = False):
+        # with stream_tokens the reply is printed as it is generated,
+        # together with the nodes and tools it goes through
+        if stream_tokens:
+            for event in self.stream_turn(question, config):
+                self.logger.log_stream_event(event, config)
+        else:
+            events = self.graph.stream(
+                {"messages": ("user", question)}, config, stream_mode="values"
+            )
+
+            for event in events:
+                self.logger.log_event(event, config)
 
         snapshot = self.graph.get_state(config)
         while snapshot.next:
             # We have an interrupt! The agent is
             # trying to use a tool.
-            # The user can approve or deny it
-            user_input = input(
-                "Do you approve of the above actions? Type 'y' to continue;"
-                " otherwise, explain your requested changed.\n\n"
-            )
-            if user_input.strip() == "y":
-                # Just continue
-                result = self.graph.invoke(
-                    None,
-                    config,
-                )
+            # The user can approve or deny it, once they see it: the
+            # pending call is still in the logger's buffer
+            self.logger.flush()
+            user_input = input(APPROVAL_PROMPT)
+            if stream_tokens:
+                for event in self.stream_turn(self._resume_input(snapshot, user_input), config):
+                    self.logger.log_stream_event(event, config)
             else:
-                # Satisfy the tool invocation by
-                # providing instructions on the requested changes / change of mind
-                result = self.graph.invoke(
-                    {
-                        "messages": [
-                            ToolMessage(
-                                tool_call_id=event["messages"][-1].tool_calls[0]["id"],
-                                content=f"API call denied by user. Reasoning: '{user_input}'. Continue assisting, accounting for the user's input.",
-                            )
-                        ]
-                    },
-                    config,
-                )
+                result = self.graph.invoke(self._resume_input(snapshot, user_input), config)
             snapshot = self.graph.get_state(config)
 
-    
+    async def astream_turn(self, input: Union[str, dict, None], config) -> AsyncIterator[dict]:
+        """Stream one turn as events while it runs.
+
+        `input` is the user's message, or the graph input to resume with (see
+        `_resume_input`). Yields the node, token and tool events of
+        `TurnStream`, then {"event": "end", "metrics": {...}} with the time to
+        first token and inter-token latency of the turn, which are also
+        recorded in `self.stream_stats`.
+        """
+        if isinstance(input, str):
+            input = {"messages": ("user", input)}
+        turn = TurnStream()
+        async for event in self.graph.astream_events(input, config, version="v2"):
+            converted = turn.convert(event)
+            if converted is not None:
+                yield converted
+        self.stream_stats.record(turn)
+        yield {"event": "end", "metrics": turn.metrics()}
+
+    def stream_turn(self, input: Union[str, dict, None], config) -> Iterator[dict]:
+        """`astream_turn` for synchronous callers, run on a private event loop."""
+        loop = asyncio.new_event_loop()
+        events = self.astream_turn(input, config)
+        try:
+            while True:
+                try:
+                    yield loop.run_until_complete(events.__anext__())
+                except StopAsyncIteration:
+                    break
+        finally:
+            loop.run_until_complete(events.aclose())
+            loop.close()
+
+    async def astream(self, question, config) -> AsyncIterator[dict]:
+        """Async counterpart of `graph.stream` for one user message.
+
+        LLM calls are awaited and blocking tools run on the bounded blocking
+        pool, so many conversations can interleave on one event loop.
+        """
+        async for event in self.graph.astream(
+            {"messages": ("user", question)}, config, stream_mode="values"
+        ):
+            yield event
+
+    async def arun(self, question, config,
+                   approve: Optional[Callable[[object], Awaitable[str]]] = None):
+        """Async version of `run`.
+
+        `approve` receives the interrupted state snapshot and returns the user's
+        answer ('y' to continue); without it the console is asked, off the loop.
+        """
+        async for event in self.astream(question, config):
+            self.logger.log_event(event, config)
+
+        snapshot = await self.graph.aget_state(config)
+        while snapshot.next:
+            if approve is None:
+                # show the pending call before asking
+                await asyncio.to_thread(self.logger.flush)
+                user_input = await asyncio.to_thread(input, APPROVAL_PROMPT)
+            else:
+                user_input = await approve(snapshot)
+            await self.graph.ainvoke(self._resume_input(snapshot, user_input), config)
+            snapshot = await self.graph.aget_state(config)
@@ -0,0 +1,207 @@
+import sqlite3
+import sys
+import threading
+import time
+from typing import Any, AsyncIterator, Iterator, Optional
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import Checkpoint, CheckpointMetadata, CheckpointTuple
+from langgraph.checkpoint.sqlite import SqliteSaver
+
+from .tools.db import run_blocking
+
+
+class ThreadedSqliteSaver(SqliteSaver):
+    """SqliteSaver that also serves the async graph API.
+
+    The async methods run the synchronous ones on the bounded blocking pool, so
+    `graph.astream`/`ainvoke` work against the same checkpoints as `stream`/`invoke`.
+    """
+
+    @classmethod
+    def from_conn_string(cls, conn_string: str) -> "ThreadedSqliteSaver":
+        return cls(conn=sqlite3.connect(conn_string, check_same_thread=False))
+
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        return await run_blocking(self.get_tuple, config)
+
+    async def alist(self, config: Optional[RunnableConfig], **kwargs: Any) -> AsyncIterator[CheckpointTuple]:
+        for item in await run_blocking(lambda: list(self.list(config, **kwargs))):
+            yield item
+
+    async def aput(self, config: RunnableConfig, *args: Any, **kwargs: Any) -> RunnableConfig:
+        return await run_blocking(self.put, config, *args, **kwargs)
+
+    async def aput_writes(self, config: RunnableConfig, *args: Any, **kwargs: Any) -> None:
+        return await run_blocking(self.put_writes, config, *args, **kwargs)
+
+
+class DurableSqliteSaver(ThreadedSqliteSaver):
+    """File-backed checkpointer with a retention policy.
+
+    Only the newest `max_checkpoints` checkpoints of a thread are kept, and
+    threads idle for longer than `thread_ttl` seconds are dropped entirely.
+    Retention is enforced by `compact()`, which `start_compaction()` runs on a
+    daemon thread every `compaction_interval` seconds. Threads written since the
+    last compaction are marked dirty in the `thread_activity` table, so a pass
+    only touches conversations that grew and survives restarts.
+    """
+
+    def __init__(self, conn: sqlite3.Connection, *,
+                 max_checkpoints: int = 20,
+                 thread_ttl: Optional[float] = 7 * 24 * 3600,
+                 compaction_interval: float = 60.0,
+                 compaction_batch: int = 500,
+                 **kwargs: Any) -> None:
+        super().__init__(conn, **kwargs)
+        # the latest checkpoint and its parent are needed to resume an interrupt
+        self.max_checkpoints = max(2, max_checkpoints)
+        self.thread_ttl = thread_ttl
+        self.compaction_interval = compaction_interval
+        self.compaction_batch = compaction_batch
+        self._stop = threading.Event()
+        self._compactor: Optional[threading.Thread] = None
+
+    @classmethod
+    def from_conn_string(cls, conn_string: str, **kwargs: Any) -> "DurableSqliteSaver":
+        conn = sqlite3.connect(conn_string, check_same_thread=False, timeout=30)
+        if conn_string != ":memory:":
+            # only takes effect on a new file; lets compaction return pages to the OS
+            conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+        return cls(conn, **kwargs)
+
+    def setup(self) -> None:
+        if self.is_setup:
+            return
+        super().setup()
+        self.conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS thread_activity (
+                thread_id TEXT PRIMARY KEY,
+                last_seen REAL NOT NULL,
+                dirty INTEGER NOT NULL DEFAULT 1
+            );
+            CREATE INDEX IF NOT EXISTS thread_activity_last_seen ON thread_activity (last_seen);
+            CREATE INDEX IF NOT EXISTS thread_activity_dirty ON thread_activity (dirty) WHERE dirty = 1;
+            """
+        )
+
+    # Reads share the one connection with compaction, so they take the lock too;
+    # otherwise a VACUUM/checkpoint pragma can fail with "table is locked".
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        with self.lock:
+            return super().get_tuple(config)
+
+    def list(self, config: Optional[RunnableConfig], **kwargs: Any) -> Iterator[CheckpointTuple]:
+        with self.lock:
+            items = list(super().list(config, **kwargs))
+        yield from items
+
+    def put(self, config: RunnableConfig, checkpoint: Checkpoint,
+            metadata: CheckpointMetadata) -> RunnableConfig:
+        thread_id = str(config["configurable"]["thread_id"])
+        with self.lock, self.cursor() as cur:
+            cur.execute(
+                "INSERT OR REPLACE INTO checkpoints (thread_id, thread_ts, parent_ts, checkpoint, metadata) VALUES (?, ?, ?, ?, ?)",
+                (
+                    thread_id,
+                    checkpoint["id"],
+                    config["configurable"].get("thread_ts"),
+                    self.serde.dumps(checkpoint),
+                    self.serde.dumps(metadata),
+                ),
+            )
+            cur.execute(
+                "INSERT INTO thread_activity (thread_id, last_seen, dirty) VALUES (?, ?, 1)"
+                " ON CONFLICT (thread_id) DO UPDATE SET last_seen = excluded.last_seen, dirty = 1",
+                (thread_id, time.time()),
+            )
+        return {"configurable": {"thread_id": thread_id, "thread_ts": checkpoint["id"]}}
+
+    def delete_thread(self, thread_id: str) -> None:
+        with self.lock, self.cursor() as cur:
+            self._delete_threads(cur, [thread_id])
+
+    @staticmethod
+    def _delete_threads(cur: sqlite3.Cursor, thread_ids: list) -> None:
+        rows = [(thread_id,) for thread_id in thread_ids]
+        cur.executemany("DELETE FROM writes WHERE thread_id = ?", rows)
+        cur.executemany("DELETE FROM checkpoints WHERE thread_id = ?", rows)
+        cur.executemany("DELETE FROM thread_activity WHERE thread_id = ?", rows)
+
+    def _trim_threads(self, cur: sqlite3.Cursor, thread_ids: list) -> int:
+        removed = 0
+        for thread_id in thread_ids:
+            cur.execute(
+                "SELECT thread_ts FROM checkpoints WHERE thread_id = ? ORDER BY thread_ts DESC LIMIT 1 OFFSET ?",
+                (thread_id, self.max_checkpoints - 1),
+            )
+            row = cur.fetchone()
+            if row is not None:
+                cur.execute("DELETE FROM checkpoints WHERE thread_id = ? AND thread_ts < ?", (thread_id, row[0]))
+                removed += cur.rowcount
+                cur.execute("DELETE FROM writes WHERE thread_id = ? AND thread_ts < ?", (thread_id, row[0]))
+        cur.executemany("UPDATE thread_activity SET dirty = 0 WHERE thread_id = ?",
+                        [(thread_id,) for thread_id in thread_ids])
+        return removed
+
+    def compact(self, now: Optional[float] = None) -> dict:
+        """Apply the retention policy once and return what was removed.
+
+        Works in batches of `compaction_batch` threads, taking the saver lock per
+        batch so running conversations are only paused briefly.
+        """
+        self.setup()
+        now = time.time() if now is None else now
+        stats = {"expired_threads": 0, "trimmed_checkpoints": 0}
+        if self.thread_ttl is not None:
+            while True:
+                with self.lock, self.cursor() as cur:
+                    cur.execute("SELECT thread_id FROM thread_activity WHERE last_seen < ? LIMIT ?",
+                                (now - self.thread_ttl, self.compaction_batch))
+                    expired = [row[0] for row in cur.fetchall()]
+                    self._delete_threads(cur, expired)
+                stats["expired_threads"] += len(expired)
+                if len(expired) < self.compaction_batch:
+                    break
+        while True:
+            with self.lock, self.cursor() as cur:
+                cur.execute("SELECT thread_id FROM thread_activity WHERE dirty = 1 LIMIT ?",
+                            (self.compaction_batch,))
+                dirty = [row[0] for row in cur.fetchall()]
+                stats["trimmed_checkpoints"] += self._trim_threads(cur, dirty)
+            if len(dirty) < self.compaction_batch:
+                break
+        with self.lock:
+            self.conn.execute("PRAGMA incremental_vacuum")
+            self.conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        return stats
+
+    def start_compaction(self) -> None:
+        """Run `compact()` every `compaction_interval` seconds on a daemon thread."""
+        if self._compactor is not None and self._compactor.is_alive():
+            return
+        self._stop.clear()
+        self._compactor = threading.Thread(target=self._compaction_loop, name="checkpoint-compaction", daemon=True)
+        self._compactor.start()
+
+    def stop_compaction(self) -> None:
+        self._stop.set()
+        if self._compactor is not None:
+            self._compactor.join()
+            self._compactor = None
+
+    def _compaction_loop(self) -> None:
+        while not self._stop.wait(self.compaction_interval):
+            try:
+                self.compact()
+            except sqlite3.Error as e:
+                # retried on the next tick; a failed pass leaves the data consistent.
+                # stderr: stdout may carry a protocol, like serve.py's JSON lines
+                print(f"checkpoint compaction failed: {e!r}", file=sys.stderr, flush=True)
+
+    def __exit__(self, *exc_info: Any) -> Optional[bool]:
+        self.stop_compaction()
+        return super().__exit__(*exc_info)
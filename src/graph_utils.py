@@ -1,17 +1,24 @@
-from typing import Callable, Annotated, Literal, Optional, List
+import uuid
+from typing import TYPE_CHECKING, Callable, Annotated, Literal, Optional, List
 
 from langchain_core.pydantic_v1 import BaseModel
-from langchain_core.messages import ToolMessage
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+from langchain_core.runnables import RunnableConfig
 from langgraph.graph import END, StateGraph
-from langgraph.prebuilt import tools_condition
 
-from .models.state import State
+from .models.intent import IntentRouter
+from .models.state import State, pending_tool_calls
 from .tools.flight_tools import fetch_user_flight_information
+from .tools.general_tools import offload_blocking
 from .tools.flight_tools import ToFlightBookingAssistant
 from .tools.car_rental_tools import ToBookCarRental
 from .tools.hotel_booking_tools import ToHotelBookingAssistant
 from .tools.excursion_booking_tools import ToBookExcursion
 
+if TYPE_CHECKING:
+    # numpy, imported by answer_cache, doubles the import time of src.agent
+    from .models.answer_cache import AnswerCache
+
 class CompleteOrEscalate(BaseModel):
     """A tool to mark the current task as completed and/or to escalate control of the dialog to the main assistant,
     who can re-route the dialog based on the user's needs."""
@@ -37,7 +44,9 @@ class CompleteOrEscalate(BaseModel):
 
 def create_entry_node(assistant_name: str, new_dialog_state: str) -> Callable:
     def entry_node(state: State) -> dict:
-        tool_call_id = state["messages"][-1].tool_calls[0]["id"]
+        # the router sends here once only skill entry calls are pending;
+        # only one skill can be entered, the others are declined for now
+        entry, *others = pending_tool_calls(state["messages"])
         return {
             "messages": [
                 ToolMessage(
@@ -46,8 +55,15 @@ def create_entry_node(assistant_name: str, new_dialog_state: str) -> Callable:
                     " and the booking, update, other other action is not complete until after you have successfully invoked the appropriate tool."
                     " If the user changes their mind or needs help for other tasks, call the CompleteOrEscalate function to let the primary host assistant take control."
                     " Do not mention who you are - just act as the proxy for the assistant.",
-                    tool_call_id=tool_call_id,
+                    tool_call_id=entry["id"],
+                )
+            ] + [
+                ToolMessage(
+                    content=f"Not started: the {assistant_name} is handling the user's request first."
+                    f" Call {tc['name']} again once that task is complete.",
+                    tool_call_id=tc["id"],
                 )
+                for tc in others
             ],
             "dialog_state": new_dialog_state,
         }
@@ -57,21 +73,30 @@ def create_entry_node(assistant_name: str, new_dialog_state: str) -> Callable:
 def user_info(state: State):
     return {"user_info": fetch_user_flight_information.invoke({})}
 
-def create_route(safe_tools: List, route_name: str, type_hint) -> Callable:
+async def auser_info(state: State, config: RunnableConfig):
+    tool = offload_blocking(fetch_user_flight_information)
+    return {"user_info": await tool.ainvoke({}, config)}
+
+def create_route(safe_tools: List, sensitive_tools: List, route_name: str, type_hint) -> Callable:
+    safe_toolnames = {t.name for t in safe_tools}
+    sensitive_toolnames = {t.name for t in sensitive_tools}
+    known = safe_toolnames | sensitive_toolnames | {CompleteOrEscalate.__name__}
+
     def route_skill(
         state: State,
     ) -> type_hint:
-        route = tools_condition(state)
-        if route == END:
-            return END
-        tool_calls = state["messages"][-1].tool_calls
-        did_cancel = any(tc["name"] == CompleteOrEscalate.__name__ for tc in tool_calls)
-        if did_cancel:
-            return "leave_skill"
-        safe_toolnames = [t.name for t in safe_tools]
-        if all(tc["name"] in safe_toolnames for tc in tool_calls):
+        # the calls of one message are answered in turn: safe tools, then
+        # sensitive tools (after approval), then leaving the skill
+        messages = state["messages"]
+        pending = {tc["name"] for tc in pending_tool_calls(messages)}
+        if not pending:
+            # back to the assistant once a tool node answered everything
+            return END if isinstance(messages[-1], AIMessage) else route_name
+        if pending & safe_toolnames or pending - known:
             return route_name + "_safe_tools"
-        return route_name + "_sensitive_tools"
+        if pending & sensitive_toolnames:
+            return route_name + "_sensitive_tools"
+        return "leave_skill"
     
     return route_skill
 
@@ -82,58 +107,143 @@ def pop_dialog_state(state: State) -> dict:
     This lets the full graph explicitly track the dialog flow and delegate control
     to specific sub-graphs.
     """
-    messages = []
-    if state["messages"][-1].tool_calls:
-        # Note: Doesn't currently handle the edge case where the llm performs parallel tool calls
-        messages.append(
-            ToolMessage(
-                content="Resuming dialog with the host assistant. Please reflect on the past conversation and assist the user as needed.",
-                tool_call_id=state["messages"][-1].tool_calls[0]["id"],
-            )
+    messages = [
+        ToolMessage(
+            content="Resuming dialog with the host assistant. Please reflect on the past conversation and assist the user as needed.",
+            tool_call_id=tc["id"],
         )
+        for tc in pending_tool_calls(state["messages"])
+    ]
     return {
         "dialog_state": "pop",
         "messages": messages,
     }
 
+ENTRY_NODES = {
+    ToFlightBookingAssistant.__name__: "enter_update_flight",
+    ToBookCarRental.__name__: "enter_book_car_rental",
+    ToHotelBookingAssistant.__name__: "enter_book_hotel",
+    ToBookExcursion.__name__: "enter_book_excursion",
+}
+
 def route_primary_assistant(
     state: State,
 ) -> Literal[
+    "primary_assistant",
     "primary_assistant_tools",
     "enter_update_flight",
     "enter_book_hotel",
     "enter_book_excursion",
-    "enter_book_car_rental"
+    "enter_book_car_rental",
     "__end__",
 ]:
-    route = tools_condition(state)
-    if route == END:
-        return END
-    tool_calls = state["messages"][-1].tool_calls
-    
-    if tool_calls:
-        if len(tool_calls)>0:
-            tool_calls = [tool_calls[0]]
-        if tool_calls[0]["name"] == "multi_tool_use.parallel":
-            # a multi tool use has happened and we should decide what we're gonna do as next step
-            # at this step I just select one of the tool calls and ignore the other one
-            # TODO manage this situation better
-            tool_calls[0]["name"] = tool_calls[0]["args"]["tool_uses"][0]["recipient_name"]
-            tool_calls[0]["args"] = tool_calls[0]["args"]["tool_uses"][0]["parameters"]
-
-        state["messages"][-1].tool_calls = tool_calls
-        
-        if tool_calls[0]["name"] == ToFlightBookingAssistant.__name__:
-            return "enter_update_flight"
-        elif tool_calls[0]["name"] == ToBookCarRental.__name__:
-            return "enter_book_car_rental"
-        elif tool_calls[0]["name"] == ToHotelBookingAssistant.__name__:
-            return "enter_book_hotel"
-        elif tool_calls[0]["name"] == ToBookExcursion.__name__:
-            return "enter_book_excursion"
-        
+    messages = state["messages"]
+    pending = pending_tool_calls(messages)
+    if not pending:
+        return END if isinstance(messages[-1], AIMessage) else "primary_assistant"
+    # run every tool call first (concurrently), then enter a skill
+    if any(tc["name"] not in ENTRY_NODES for tc in pending):
         return "primary_assistant_tools"
-    raise ValueError("Invalid route")
+    return ENTRY_NODES[pending[0]["name"]]
+
+# The call the intent router makes for each label, and the argument the user's message goes to
+INTENT_CALLS = {
+    "flight": (ToFlightBookingAssistant.__name__, "request"),
+    "hotel": (ToHotelBookingAssistant.__name__, "request"),
+    "car": (ToBookCarRental.__name__, "request"),
+    "excursion": (ToBookExcursion.__name__, "request"),
+    "policy": ("lookup_policy", "query"),
+}
+
+def create_intent_node(router: IntentRouter) -> Callable:
+    def route_intent(state: State) -> dict:
+        # when the router is confident, make the call the primary assistant
+        # would have made, so its first model round trip is skipped;
+        # route_primary_assistant then enters the skill or runs the lookup
+        message = state["messages"][-1]
+        if not isinstance(message, HumanMessage) or not isinstance(message.content, str):
+            return {"messages": []}
+        label = router.route(message.content)
+        if label is None:
+            return {"messages": []}
+        name, arg = INTENT_CALLS[label]
+        return {
+            "messages": AIMessage(
+                content="",
+                tool_calls=[{"name": name, "args": {arg: message.content}, "id": f"call_{uuid.uuid4().hex[:24]}"}],
+            )
+        }
+
+    return route_intent
+
+def policy_only_answer(state: State) -> Optional[tuple[str, str]]:
+    """(question, answer) of the turn just answered, if it may be reused for other passengers.
+
+    That is the first turn of the conversation, so that the question stands
+    on its own, answered by the primary assistant whose only calls were to
+    lookup_policy, and whose answer repeats nothing of the passenger's flight
+    information (tickets, bookings, flights, dates, airports).
+    """
+    from .models.answer_cache import mentions_passenger
+
+    messages = state["messages"]
+    start = next((i for i in range(len(messages) - 1, -1, -1) if isinstance(messages[i], HumanMessage)), None)
+    if start is None or state.get("dialog_state") or not _first_question(messages, start):
+        return None
+    question, answer = messages[start], messages[-1]
+    calls = [tc for m in messages[start + 1:] if isinstance(m, AIMessage) for tc in m.tool_calls]
+    if not calls or any(tc["name"] != "lookup_policy" for tc in calls):
+        return None
+    if not isinstance(answer, AIMessage) or answer.tool_calls or not isinstance(answer.content, str) or not answer.content:
+        return None
+    if not isinstance(question.content, str) or mentions_passenger(answer.content, state.get("user_info")):
+        return None
+    return question.content, answer.content
+
+def _first_question(messages: list, index: int) -> bool:
+    # a follow-up ("and for business class?") means something else in another
+    # conversation, so only the opening question of a thread is cached
+    return not any(isinstance(m, HumanMessage) for m in messages[:index])
+
+def _new_question(state: State) -> Optional[str]:
+    messages = state["messages"]
+    message = messages[-1]
+    if (isinstance(message, HumanMessage) and isinstance(message.content, str)
+            and _first_question(messages, len(messages) - 1)):
+        return message.content
+    return None
+
+def create_answer_cache_nodes(cache: "AnswerCache") -> tuple[Callable, Callable, Callable, Callable]:
+    """check_answer_cache and update_answer_cache, each as a sync and an async function."""
+    def answer(text: Optional[str]) -> dict:
+        if text is None:
+            return {"messages": []}
+        return {"messages": AIMessage(content=text, response_metadata={"answer_cache": "hit"})}
+
+    def check_answer_cache(state: State) -> dict:
+        question = _new_question(state)
+        return answer(cache.lookup(question) if question else None)
+
+    async def acheck_answer_cache(state: State) -> dict:
+        question = _new_question(state)
+        return answer(await cache.alookup(question) if question else None)
+
+    def update_answer_cache(state: State) -> dict:
+        reusable = policy_only_answer(state)
+        if reusable is not None:
+            cache.store(*reusable)
+        return {"messages": []}
+
+    async def aupdate_answer_cache(state: State) -> dict:
+        reusable = policy_only_answer(state)
+        if reusable is not None:
+            await cache.astore(*reusable)
+        return {"messages": []}
+
+    return check_answer_cache, acheck_answer_cache, update_answer_cache, aupdate_answer_cache
+
+def route_cached_answer(state: State) -> Literal["primary_assistant", "__end__"]:
+    return END if isinstance(state["messages"][-1], AIMessage) else "primary_assistant"
 
 # Each delegated workflow can directly respond to the user
 # When the user responds, we want to return to the currently active workflow
@@ -1,22 +1,263 @@
+import atexit
+import json
+import sys
+import threading
+import time
+from collections import OrderedDict, deque
+from datetime import datetime, timezone
+from typing import Any, Optional, TextIO
+
+LEVELS = {"debug": 10, "info": 20, "warning": 30, "error": 40}
+
+# records rendered before they are written out together
+BATCH_SIZE = 1000
+
+
+def _thread_id(config: Optional[dict]) -> Optional[str]:
+    if not config:
+        return None
+    thread_id = config.get("configurable", {}).get("thread_id")
+    return None if thread_id is None else str(thread_id)
+
+
 class Logger:
-    def __init__(self) -> None:
-        self._printed = set()
-        
-    def log(self, events):
-        for event in events:
-            self.log_event(event)
+    """Structured event log written by a background thread.
+
+    Every record is one JSON line (`fmt="json"`) with a timestamp, a level,
+    an event name, the conversation's thread_id and the event's fields; with
+    `fmt="text"` the conversation is printed for a human, as main.py does.
+    Records below `level` are dropped where they are logged.
+
+    The caller only appends the record to a buffer of `queue_size` entries; a
+    writer thread takes everything buffered, renders it and writes it in one
+    go. When the buffer is full the record is dropped and counted, and the
+    writer reports how many were lost, so a slow stream never blocks a
+    conversation. Records the stream fails to take are counted in `stats()`
+    as failed. Graph states are reduced to the
+    messages not logged before, remembered per thread_id for the last
+    `dedupe_window` messages of the last `max_threads` conversations.
+    """
+
+    def __init__(self, stream: Optional[TextIO] = None, level: str = "info", fmt: str = "json",
+                 queue_size: int = 10000, dedupe_window: int = 256, max_threads: int = 10000,
+                 max_length: int = 1500) -> None:
+        if fmt not in ("json", "text"):
+            raise ValueError(f"Unknown log format {fmt!r}, use 'json' or 'text'.")
+        self.stream = stream
+        self.level = LEVELS[level]
+        self.fmt = fmt
+        self.dedupe_window = dedupe_window
+        self.max_threads = max_threads
+        self.max_length = max_length
+        self.queue_size = queue_size
+        self._buffer: deque = deque()
+        self._wakeup = threading.Event()
+        self._lock = threading.Lock()
+        self._writer: Optional[threading.Thread] = None
+        # written by the writer thread only
+        self._seen: "OrderedDict[Optional[str], dict]" = OrderedDict()
+        self._reported_drops = 0
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+        self.last_error: Optional[str] = None
+
+    # request path
+
+    def _enqueue(self, level: int, kind: str, thread_id: Optional[str], payload: Any) -> None:
+        if level < self.level:
+            return
+        if self._writer is None:
+            self._start()
+        if len(self._buffer) >= self.queue_size:
+            with self._lock:
+                self.dropped += 1
+            return
+        self._buffer.append((time.time(), level, kind, thread_id, payload))
+        # only an idle writer needs waking, a busy one takes the record with the rest
+        if not self._wakeup.is_set():
+            self._wakeup.set()
+
+    def record(self, level: str, event: str, config: Optional[dict] = None, **fields: Any) -> None:
+        self._enqueue(LEVELS[level], "record", _thread_id(config), (event, fields))
+
+    def debug(self, event: str, config: Optional[dict] = None, **fields: Any) -> None:
+        self.record("debug", event, config, **fields)
+
+    def info(self, event: str, config: Optional[dict] = None, **fields: Any) -> None:
+        self.record("info", event, config, **fields)
+
+    def warning(self, event: str, config: Optional[dict] = None, **fields: Any) -> None:
+        self.record("warning", event, config, **fields)
+
+    def error(self, event: str, config: Optional[dict] = None, **fields: Any) -> None:
+        self.record("error", event, config, **fields)
 
-    def log_event(self, event: dict, max_length=1500):
-        current_state = event.get("dialog_state")
-        if current_state:
-            print(f"Currently in: ", current_state[-1])
+    def log_event(self, event: dict, config: Optional[dict] = None) -> None:
+        """A graph state from stream_mode="values": its dialog state and latest message."""
         message = event.get("messages")
-        if message:
-            if isinstance(message, list):
-                message = message[-1]
-            if message.id not in self._printed:
-                msg_repr = message.pretty_repr(html=True)
-                if len(msg_repr) > max_length:
-                    msg_repr = msg_repr[:max_length] + " ... (truncated)"
-                print(msg_repr)
-                self._printed.add(message.id)
\ No newline at end of file
+        if isinstance(message, list):
+            message = message[-1] if message else None
+        self._enqueue(LEVELS["info"], "state", _thread_id(config), (event.get("dialog_state"), message))
+
+    def log(self, events, config: Optional[dict] = None) -> None:
+        """Every graph state of `events`, e.g. the output of graph.stream(..., stream_mode="values")."""
+        for event in events:
+            self.log_event(event, config)
+
+    def log_stream_event(self, event: dict, config: Optional[dict] = None) -> None:
+        """An event of CustomerSupportAgent.stream_turn; in JSON, tokens and nodes are debug records."""
+        level = LEVELS["debug"] if self.fmt == "json" and event["event"] in ("token", "node") else LEVELS["info"]
+        self._enqueue(level, "stream", _thread_id(config), event)
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Wait until everything queued so far is written; False on timeout."""
+        if self._writer is None:
+            return True
+        done = threading.Event()
+        self._buffer.append(("flush", done))
+        self._wakeup.set()
+        return done.wait(timeout)
+
+    def close(self, timeout: Optional[float] = 5.0) -> None:
+        self.flush(timeout)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"queued": len(self._buffer), "written": self.written, "dropped": self.dropped,
+                    "failed": self.failed, "last_error": self.last_error}
+
+    # writer thread
+
+    def _start(self) -> None:
+        with self._lock:
+            if self._writer is not None:
+                return
+            self._writer = threading.Thread(target=self._run, name="logger", daemon=True)
+            self._writer.start()
+        atexit.register(self.close)
+
+    def _run(self) -> None:
+        while True:
+            self._wakeup.wait()
+            self._wakeup.clear()
+            while self._buffer:
+                self._write_batch()
+
+    def _write_batch(self) -> None:
+        lines, flushed = [], []
+        for _ in range(BATCH_SIZE):
+            if not self._buffer:
+                break
+            item = self._buffer.popleft()
+            if item[0] == "flush":
+                flushed.append(item[1])
+                continue
+            try:
+                self._write(lines, *item)
+            except Exception as e:  # a record that cannot be rendered must not stop the log
+                self._emit(lines, time.time(), LEVELS["error"], "log_failed", item[3], {"error": repr(e)})
+        with self._lock:
+            lost = self.dropped - self._reported_drops
+            self._reported_drops = self.dropped
+        if lost:
+            self._emit(lines, time.time(), LEVELS["warning"], "log_dropped", None, {"records": lost})
+        try:
+            if lines:
+                out = self._out()
+                out.write("".join(lines))
+                out.flush()
+                self.written += len(lines)
+        except Exception as e:  # the stream failed, the writer must keep going
+            with self._lock:
+                self.failed += len(lines)
+                self.last_error = repr(e)
+        for done in flushed:
+            done.set()
+
+    def _out(self) -> TextIO:
+        return self.stream or sys.stdout
+
+    def _thread_state(self, thread_id: Optional[str]) -> dict:
+        state = self._seen.get(thread_id)
+        if state is None:
+            state = self._seen[thread_id] = {"messages": OrderedDict(), "dialog_state": None}
+            while len(self._seen) > self.max_threads:
+                self._seen.popitem(last=False)
+        else:
+            self._seen.move_to_end(thread_id)
+        return state
+
+    def _write(self, lines: list, ts: float, level: int, kind: str, thread_id: Optional[str], payload: Any) -> None:
+        if kind == "record":
+            event, fields = payload
+            self._emit(lines, ts, level, event, thread_id, fields)
+        elif kind == "state":
+            self._write_state(lines, ts, level, thread_id, *payload)
+        elif kind == "stream":
+            self._write_stream(lines, ts, level, thread_id, payload)
+
+    def _write_state(self, lines, ts, level, thread_id, dialog_state, message) -> None:
+        state = self._thread_state(thread_id)
+        current = dialog_state[-1] if dialog_state else None
+        if current != state["dialog_state"]:
+            state["dialog_state"] = current
+            if current:
+                if self.fmt == "text":
+                    lines.append(f"Currently in:  {current}\n")
+                else:
+                    self._emit(lines, ts, level, "dialog_state", thread_id, {"dialog_state": current})
+        if message is None or message.id in state["messages"]:
+            return
+        state["messages"][message.id] = None
+        while len(state["messages"]) > self.dedupe_window:
+            state["messages"].popitem(last=False)
+        if self.fmt == "text":
+            text = message.pretty_repr(html=True)
+            if len(text) > self.max_length:
+                text = text[:self.max_length] + " ... (truncated)"
+            lines.append(text + "\n")
+            return
+        content = message.content if isinstance(message.content, str) else json.dumps(message.content)
+        fields = {"type": message.type, "id": message.id, "content": content[:self.max_length]}
+        if getattr(message, "tool_calls", None):
+            fields["tool_calls"] = [{"name": tc["name"], "args": tc["args"]} for tc in message.tool_calls]
+        if getattr(message, "tool_call_id", None):
+            fields["tool_call_id"] = message.tool_call_id
+        self._emit(lines, ts, level, "message", thread_id, fields)
+
+    def _write_stream(self, lines, ts, level, thread_id, event) -> None:
+        if self.fmt == "json":
+            fields = {k: v for k, v in event.items() if k != "event"}
+            if isinstance(fields.get("output"), str):
+                fields["output"] = fields["output"][:self.max_length]
+            self._emit(lines, ts, level, event["event"], thread_id, fields)
+            return
+        kind = event["event"]
+        if kind == "token":
+            lines.append(event["text"])
+        elif kind == "tool_start":
+            args = json.dumps(event["input"], ensure_ascii=False, default=str)
+            lines.append(f"\n[{event['node']}] {event['tool']}({args})\n")
+        elif kind == "tool_end":
+            output = event["output"]
+            if len(output) > self.max_length:
+                output = output[:self.max_length] + " ... (truncated)"
+            lines.append(output + "\n")
+        elif kind == "end":
+            lines.append("\n")
+
+    def _emit(self, lines: list, ts: float, level: int, event: str, thread_id: Optional[str], fields: dict) -> None:
+        if self.fmt == "text":
+            name = next(name for name, value in LEVELS.items() if value == level)
+            lines.append(f"{name.upper()} {event} {json.dumps(fields, ensure_ascii=False, default=str)}\n")
+            return
+        record = {
+            "ts": datetime.fromtimestamp(ts, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": next(name for name, value in LEVELS.items() if value == level),
+            "event": event,
+        }
+        if thread_id is not None:
+            record["thread_id"] = thread_id
+        record.update(fields)
+        lines.append(json.dumps(record, ensure_ascii=False, default=str) + "\n")
@@ -0,0 +1,190 @@
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from ..tools.policy_cache import FileFingerprint, normalize_query
+from .intent import NgramEmbeddings
+
+# values in the user's flight information that identify the passenger's bookings:
+# ticket and booking numbers, flight numbers, dates and times, airport codes
+_PASSENGER_TOKEN = re.compile(r"\b(?=[\w:-]*\d)[\w:-]{3,}\b|\b[A-Z]{3}\b")
+
+
+def passenger_tokens(user_info: Optional[str]) -> set[str]:
+    return set(_PASSENGER_TOKEN.findall(user_info or ""))
+
+
+def mentions_passenger(text: str, user_info: Optional[str]) -> bool:
+    """Whether `text` repeats a ticket, booking, flight, date or airport of `user_info`."""
+    return any(token in text for token in passenger_tokens(user_info))
+
+
+class AnswerCache:
+    """Final answers to policy questions, found again for reworded questions.
+
+    `store` keeps an answer under the embedding of its question; `lookup`
+    returns the answer of the most similar stored question when the cosine
+    similarity is at least `threshold` (which depends on `embeddings`: 0.75
+    suits the default local NgramEmbeddings). Entries expire after `ttl`
+    seconds, the least recently used go beyond `max_entries`, and all of them
+    are dropped when the content of `policy_file` changes.
+
+    Only what the graph stores is cached: answers to the opening question of
+    a conversation that only consulted the policy and do not mention the
+    passenger's bookings (see graph_utils.policy_only_answer).
+    """
+
+    def __init__(self, embeddings: Optional[Embeddings] = None, threshold: float = 0.75,
+                 policy_file: str = "files/alibaba.md", max_entries: int = 1024,
+                 ttl: Optional[float] = 24 * 3600) -> None:
+        self.embeddings = embeddings or NgramEmbeddings()
+        self.threshold = threshold
+        self.fingerprint = FileFingerprint(policy_file)
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        # normalized question -> (created, answer); the rows of _vectors follow its order
+        self._entries: "OrderedDict[str, tuple[float, str]]" = OrderedDict()
+        self._vectors: dict[str, np.ndarray] = {}
+        self._matrix: Optional[np.ndarray] = None
+        self._keys: list[str] = []
+        self._created: Optional[np.ndarray] = None
+        # embeddings of recently looked up questions, reused when their answer is stored
+        self._recent: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._policy_digest = self.fingerprint.current()
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.invalidations = 0
+        self.lookup_seconds = 0.0
+
+    def _check_policy(self) -> None:
+        digest = self.fingerprint.current()
+        if digest != self._policy_digest:
+            self._policy_digest = digest
+            if self._entries:
+                self.invalidations += 1
+            self._entries.clear()
+            self._vectors.clear()
+            self._matrix = None
+
+    def _remember(self, key: str, vector: np.ndarray) -> None:
+        self._recent[key] = vector
+        self._recent.move_to_end(key)
+        while len(self._recent) > 256:
+            self._recent.popitem(last=False)
+
+    @staticmethod
+    def _unit(vector) -> np.ndarray:
+        vector = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _build(self) -> None:
+        if self._matrix is None and self._entries:
+            self._keys = list(self._entries)
+            self._matrix = np.stack([self._vectors[k] for k in self._keys])
+            self._created = np.array([self._entries[k][0] for k in self._keys])
+
+    def _expire(self) -> None:
+        """Drop the expired entries, so they never hide a fresh match behind them."""
+        if self.ttl is None:
+            return
+        self._build()
+        if self._matrix is None:
+            return
+        for i in np.flatnonzero(self._created < time.time() - self.ttl):
+            self._drop(self._keys[i])
+        self._build()
+
+    def _search(self, key: str, vector: np.ndarray) -> Optional[str]:
+        with self._lock:
+            self._check_policy()
+            self._remember(key, vector)
+            self._expire()
+            self._build()
+            if self._matrix is None:
+                return None
+            similarities = self._matrix @ vector
+            best = int(np.argmax(similarities))
+            if similarities[best] < self.threshold:
+                return None
+            match = self._keys[best]
+            self._entries.move_to_end(match)
+            return self._entries[match][1]
+
+    def _record(self, answer: Optional[str], start: float) -> None:
+        with self._lock:
+            self.lookup_seconds += time.perf_counter() - start
+            if answer is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+
+    def lookup(self, question: str) -> Optional[str]:
+        start = time.perf_counter()
+        key = normalize_query(question)
+        answer = self._search(key, self._unit(self.embeddings.embed_query(key)))
+        self._record(answer, start)
+        return answer
+
+    async def alookup(self, question: str) -> Optional[str]:
+        start = time.perf_counter()
+        key = normalize_query(question)
+        answer = self._search(key, self._unit(await self.embeddings.aembed_query(key)))
+        self._record(answer, start)
+        return answer
+
+    def _put(self, key: str, vector: np.ndarray, answer: str) -> None:
+        with self._lock:
+            self._check_policy()
+            self._entries[key] = (time.time(), answer)
+            self._entries.move_to_end(key)
+            self._vectors[key] = vector
+            while len(self._entries) > self.max_entries:
+                self._drop(next(iter(self._entries)))
+            self._matrix = None
+            self.stores += 1
+
+    def _drop(self, key: str) -> None:
+        self._entries.pop(key, None)
+        self._vectors.pop(key, None)
+        self._matrix = None
+
+    def store(self, question: str, answer: str) -> None:
+        key = normalize_query(question)
+        vector = self._recent.get(key)
+        if vector is None:
+            vector = self._unit(self.embeddings.embed_query(key))
+        self._put(key, vector, answer)
+
+    async def astore(self, question: str, answer: str) -> None:
+        key = normalize_query(question)
+        vector = self._recent.get(key)
+        if vector is None:
+            vector = self._unit(await self.embeddings.aembed_query(key))
+        self._put(key, vector, answer)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._vectors.clear()
+            self._matrix = None
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "lookups": lookups,
+                "hits": self.hits,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "stores": self.stores,
+                "size": len(self._entries),
+                "invalidations": self.invalidations,
+                "lookup_ms_mean": round(self.lookup_seconds / lookups * 1000, 3) if lookups else None,
+            }
@@ -1,24 +1,102 @@
+from typing import Optional
+
+from .history import HistoryManager, approximate_tool_tokens
+from .retry import RetryPolicy
 from .state import State
+from .usage import UsageStats
 
-from langchain_core.runnables import Runnable, RunnableConfig
+from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.runnables import Runnable, RunnableConfig, RunnableSequence
+from langgraph.utils import RunnableCallable
 
 class Assistant:
-    def __init__(self, runnable: Runnable):
+    def __init__(self, runnable: Runnable, history: Optional[HistoryManager] = None,
+                 retry: Optional[RetryPolicy] = None, usage: Optional[UsageStats] = None):
         self.runnable = runnable
+        self.history = history
+        self.retry = retry or RetryPolicy()
+        self.usage = usage
+        # prompt | llm.bind_tools(tools): the parts of every prompt besides the conversation
+        self.prompt = None
+        self._tool_tokens = 0
+        if isinstance(runnable, RunnableSequence) and isinstance(runnable.first, ChatPromptTemplate):
+            self.prompt = runnable.first
+            self._tool_tokens = approximate_tool_tokens(getattr(runnable.last, "kwargs", {}).get("tools") or [])
+
+    def fixed_tokens(self, state: State) -> int:
+        """Tokens of the prompt for `state` without its messages: instructions, context, tool schemas."""
+        if self.prompt is None or self.history is None:
+            return 0
+        rendered = self.prompt.invoke({**state, "messages": []}).to_messages()
+        return self.history.count_tokens(rendered) + self._tool_tokens
 
     def __call__(self, state: State, config: RunnableConfig):
-        while True:
-            result = self.runnable.invoke(state)
-
-            if not result.tool_calls and (
-                not result.content
-                or isinstance(result.content, list)
-                and not result.content[0].get("text")
-            ):
-                messages = state["messages"] + [("user", "Respond with a real output.")]
-                state = {**state, "messages": messages}
-                messages = state["messages"] + [("user", "Respond with a real output.")]
-                state = {**state, "messages": messages}
-            else:
+        update = {}
+        if self.history is not None:
+            update = self.history.update(state, self.fixed_tokens(state))
+            state = self.history.prepare({**state, **update})
+        # an empty answer is asked for again, at most max_attempts times in total
+        prompt_state = state
+        for _ in range(self.retry.max_attempts):
+            result = self._expand_parallel(self.retry.invoke(lambda: self.runnable.invoke(prompt_state)))
+            self._record(result)
+            if not self._is_empty(result):
                 break
-        return {"messages": result}
\ No newline at end of file
+            self.retry.record("empty_responses")
+            prompt_state = self._ask_for_real_output(state)
+        return {"messages": result, **update}
+
+    async def acall(self, state: State, config: RunnableConfig):
+        update = {}
+        if self.history is not None:
+            update = await self.history.aupdate(state, self.fixed_tokens(state))
+            state = self.history.prepare({**state, **update})
+        prompt_state = state
+        for _ in range(self.retry.max_attempts):
+            result = self._expand_parallel(await self.retry.ainvoke(lambda: self.runnable.ainvoke(prompt_state)))
+            self._record(result)
+            if not self._is_empty(result):
+                break
+            self.retry.record("empty_responses")
+            prompt_state = self._ask_for_real_output(state)
+        return {"messages": result, **update}
+
+    def _record(self, result) -> None:
+        if self.usage is not None:
+            self.usage.record(result)
+
+    def as_node(self, name: str) -> Runnable:
+        # a graph node with both a sync and an async implementation
+        return RunnableCallable(self.__call__, self.acall, name=name)
+
+    @staticmethod
+    def _expand_parallel(result):
+        # Some models wrap parallel calls in one `multi_tool_use.parallel` call;
+        # unpack it so that every call is routed and answered on its own
+        if not any(tc["name"] == "multi_tool_use.parallel" for tc in result.tool_calls):
+            return result
+        tool_calls = []
+        for tc in result.tool_calls:
+            if tc["name"] != "multi_tool_use.parallel":
+                tool_calls.append(tc)
+                continue
+            for i, use in enumerate(tc["args"].get("tool_uses", [])):
+                tool_calls.append({
+                    "name": use["recipient_name"].split(".")[-1],
+                    "args": use.get("parameters", {}),
+                    "id": f"{tc['id']}_{i}",
+                })
+        return result.copy(update={"tool_calls": tool_calls})
+
+    @staticmethod
+    def _is_empty(result) -> bool:
+        return not result.tool_calls and (
+            not result.content
+            or isinstance(result.content, list)
+            and not result.content[0].get("text")
+        )
+
+    @staticmethod
+    def _ask_for_real_output(state: State) -> State:
+        messages = state["messages"] + [("user", "Respond with a real output.")]
+        return {**state, "messages": messages}
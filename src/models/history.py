@@ -0,0 +1,185 @@
+import json
+from typing import Callable, Iterable, Optional, Sequence
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, SystemMessage, ToolMessage
+
+from .state import State
+
+SUMMARY_PROMPT = (
+    "Extend the summary of a customer support conversation with the new messages below."
+    " Keep ticket numbers, flight, hotel, car rental and excursion ids, dates, locations"
+    " and every decision the user made. Answer with the updated summary only.\n\n"
+    "Current summary:\n{summary}\n\nNew messages:\n{messages}"
+)
+SUMMARY_HEADER = "Summary of the earlier conversation:\n"
+
+
+def approximate_tokens(messages: Iterable[BaseMessage]) -> int:
+    """Cheap token estimate: ~3 characters per token plus a per-message overhead.
+
+    Errs on the high side for English and is close for Persian text, which
+    tokenizes into more pieces per character.
+    """
+    total = 0
+    for message in messages:
+        content = message.content if isinstance(message.content, str) else json.dumps(message.content)
+        total += 4 + len(content) // 3
+        if isinstance(message, AIMessage) and message.tool_calls:
+            total += len(json.dumps([tc["args"] for tc in message.tool_calls], ensure_ascii=False)) // 3
+    return total
+
+
+def approximate_tool_tokens(tools: Iterable) -> int:
+    """`approximate_tokens` for the tool schemas sent with a prompt (OpenAI tool dicts)."""
+    tools = list(tools)
+    return len(json.dumps(tools, ensure_ascii=False)) // 3 if tools else 0
+
+
+def group_messages(messages: Sequence[BaseMessage]) -> list[list[BaseMessage]]:
+    """Split the history into blocks that must be kept or dropped together.
+
+    An AIMessage with tool calls and the ToolMessages answering it form one
+    block; the chat APIs reject a ToolMessage without its call.
+    """
+    blocks: list[list[BaseMessage]] = []
+    for message in messages:
+        if isinstance(message, ToolMessage) and blocks and (
+            isinstance(blocks[-1][0], AIMessage) and blocks[-1][0].tool_calls
+        ):
+            blocks[-1].append(message)
+        else:
+            blocks.append([message])
+    return blocks
+
+
+def render_messages(messages: Iterable[BaseMessage], max_chars: int = 400) -> str:
+    lines = []
+    for message in messages:
+        content = message.content if isinstance(message.content, str) else json.dumps(message.content)
+        if isinstance(message, AIMessage) and message.tool_calls:
+            calls = ", ".join(f"{tc['name']}({json.dumps(tc['args'], ensure_ascii=False)})"
+                              for tc in message.tool_calls)
+            content = (content + " " if content else "") + "called " + calls
+        lines.append(f"{message.type}: {content[:max_chars]}")
+    return "\n".join(lines)
+
+
+class HistoryManager:
+    """Keeps the prompts sent to the LLM within a token budget.
+
+    `max_tokens` and `target_tokens` count the whole prompt: the `reserved`
+    tokens the caller passes for the instructions, context and tool schemas,
+    the summary, and the history since the last summary. When that grows past
+    `max_tokens`, the oldest blocks are folded into a rolling summary until
+    `target_tokens` remain (counting the summary at `max_summary_tokens`), so
+    the summary is only refreshed every few turns. The current turn is never
+    folded, so one very long turn can still go over the budget. The summary is
+    written to the graph state (`summary`, `summary_until`), and the prompt is
+    built from it plus the messages after `summary_until`.
+
+    While a specialized assistant is active, the call that entered it (and the
+    entry ToolMessage) stays in the prompt even after it was summarized.
+
+    Summaries are made by `llm` when given, otherwise extractively (user
+    questions, assistant answers and tool calls, without tool output) so no
+    extra model call is spent.
+    """
+
+    def __init__(self, max_tokens: int = 4000,
+                 target_tokens: Optional[int] = None,
+                 max_summary_tokens: int = 600,
+                 llm: Optional[BaseChatModel] = None,
+                 entry_tools: Iterable[str] = (),
+                 token_counter: Callable[[Iterable[BaseMessage]], int] = approximate_tokens) -> None:
+        self.max_tokens = max_tokens
+        self.target_tokens = target_tokens if target_tokens is not None else max_tokens // 2
+        self.max_summary_tokens = max_summary_tokens
+        self.llm = llm
+        self.entry_tools = set(entry_tools)
+        self.count_tokens = token_counter
+
+    def _unsummarized(self, state: State) -> list[BaseMessage]:
+        messages = state["messages"]
+        until = state.get("summary_until")
+        if until:
+            for i, message in enumerate(messages):
+                if message.id == until:
+                    return messages[i + 1:]
+        return messages
+
+    def _summary_tokens(self, summary: str) -> int:
+        return self.count_tokens([SystemMessage(content=SUMMARY_HEADER + summary)]) if summary else 0
+
+    def _to_fold(self, state: State, reserved: int = 0) -> list[BaseMessage]:
+        blocks = group_messages(self._unsummarized(state))
+        remaining = self.count_tokens(m for block in blocks for m in block)
+        if reserved + self._summary_tokens(state.get("summary") or "") + remaining <= self.max_tokens:
+            return []
+        # the summary grows with what is folded into it
+        reserved += max(self._summary_tokens(state.get("summary") or ""), self.max_summary_tokens)
+        # never fold the current turn, i.e. the last user message onwards
+        last_user = max((i for i, block in enumerate(blocks) if isinstance(block[0], HumanMessage)), default=0)
+        folded = []
+        for block in blocks[:last_user]:
+            if reserved + remaining <= self.target_tokens:
+                break
+            folded.extend(block)
+            remaining -= self.count_tokens(block)
+        return folded
+
+    def _extractive_summary(self, summary: str, folded: list[BaseMessage]) -> str:
+        kept = [m for m in folded if not isinstance(m, ToolMessage)]
+        text = "\n".join(filter(None, [summary, render_messages(kept, max_chars=200)]))
+        # keep the most recent part when over the summary budget
+        limit = self.max_summary_tokens * 3
+        return text[-limit:]
+
+    def _summary_prompt(self, summary: str, folded: list[BaseMessage]) -> str:
+        return SUMMARY_PROMPT.format(summary=summary or "(empty)", messages=render_messages(folded))
+
+    def update(self, state: State, reserved: int = 0) -> dict:
+        """Fold old messages into the summary if over budget; returns the state update.
+
+        `reserved` is the size of the rest of the prompt, see `Assistant.fixed_tokens`.
+        """
+        folded = self._to_fold(state, reserved)
+        if not folded:
+            return {}
+        summary = state.get("summary") or ""
+        if self.llm is None:
+            summary = self._extractive_summary(summary, folded)
+        else:
+            summary = self.llm.invoke(self._summary_prompt(summary, folded)).content
+        return {"summary": summary, "summary_until": folded[-1].id}
+
+    async def aupdate(self, state: State, reserved: int = 0) -> dict:
+        folded = self._to_fold(state, reserved)
+        if not folded:
+            return {}
+        summary = state.get("summary") or ""
+        if self.llm is None:
+            summary = self._extractive_summary(summary, folded)
+        else:
+            summary = (await self.llm.ainvoke(self._summary_prompt(summary, folded))).content
+        return {"summary": summary, "summary_until": folded[-1].id}
+
+    def _pinned(self, state: State, recent: list[BaseMessage]) -> list[BaseMessage]:
+        if not state.get("dialog_state") or not self.entry_tools:
+            return []
+        for block in reversed(group_messages(state["messages"])):
+            head = block[0]
+            if isinstance(head, AIMessage) and any(tc["name"] in self.entry_tools for tc in head.tool_calls):
+                recent_ids = {m.id for m in recent}
+                return [] if head.id in recent_ids else block
+        return []
+
+    def prepare(self, state: State) -> State:
+        """The state as the assistant prompt should see it."""
+        summary = state.get("summary")
+        if not summary:
+            return state
+        recent = self._unsummarized(state)
+        messages = [SystemMessage(content=SUMMARY_HEADER + summary)]
+        messages += self._pinned(state, recent) + recent
+        return {**state, "messages": messages}
@@ -0,0 +1,178 @@
+import math
+import re
+import threading
+import time
+import zlib
+from collections import Counter
+from typing import Iterable, Optional
+
+from langchain_core.embeddings import Embeddings
+
+# Arabic letters typed instead of their Persian forms, and the zero-width non-joiner
+_NORMALIZE = str.maketrans({"\u064a": "\u06cc", "\u0649": "\u06cc", "\u0643": "\u06a9",
+                            "\u0629": "\u0647", "\u06c0": "\u0647", "\u200c": " "})
+_DIACRITICS = re.compile("[\u064b-\u0652\u0670]")
+_NON_WORD = re.compile(r"[^\w]+")
+
+
+def normalize(text: str) -> str:
+    text = _DIACRITICS.sub("", text.translate(_NORMALIZE).lower())
+    return _NON_WORD.sub(" ", text).strip()
+
+
+def features(text: str, ngrams: Iterable[int] = (2, 3, 4)) -> Counter:
+    """Words and character n-grams of the words (padded with spaces) of `text`.
+
+    Character n-grams match Persian words across suffixes and joined forms
+    ("پروازم", "پرواز ها") as well as English inflections, without a tokenizer.
+    """
+    counts = Counter()
+    for word in normalize(text).split():
+        counts["w:" + word] += 1
+        padded = f" {word} "
+        for n in ngrams:
+            for i in range(len(padded) - n + 1):
+                counts[padded[i:i + n]] += 1
+    return counts
+
+
+def _unit(vector: dict) -> dict:
+    norm = math.sqrt(sum(v * v for v in vector.values()))
+    return {k: v / norm for k, v in vector.items()} if norm else vector
+
+
+class IntentClassifier:
+    """Nearest-centroid classifier over TF-IDF weighted words and character n-grams.
+
+    `fit` takes labeled messages; `predict` returns the best label with its
+    cosine similarity to the label's centroid and the margin to the second
+    best label.
+    """
+
+    def __init__(self, ngrams: Iterable[int] = (2, 3, 4)) -> None:
+        self.ngrams = tuple(ngrams)
+        self.idf: dict[str, float] = {}
+        self.centroids: dict[str, dict[str, float]] = {}
+        # feature -> [(label, weight in the label's centroid)]
+        self._index: dict[str, list[tuple[str, float]]] = {}
+
+    def vectorize(self, text: str) -> dict:
+        counts = features(text, self.ngrams)
+        # features never seen in training carry no information about the labels
+        return _unit({f: (1 + math.log(c)) * self.idf[f] for f, c in counts.items() if f in self.idf})
+
+    def fit(self, examples: dict[str, list[str]]) -> "IntentClassifier":
+        documents = [(label, features(text, self.ngrams)) for label, texts in examples.items() for text in texts]
+        df = Counter(f for _, counts in documents for f in counts)
+        self.idf = {f: math.log((1 + len(documents)) / (1 + n)) + 1 for f, n in df.items()}
+        sums: dict[str, Counter] = {label: Counter() for label in examples}
+        for label, counts in documents:
+            vector = _unit({f: (1 + math.log(c)) * self.idf[f] for f, c in counts.items()})
+            sums[label].update(vector)
+        self.centroids = {label: _unit(dict(total)) for label, total in sums.items()}
+        self._index = {}
+        for label, centroid in self.centroids.items():
+            for f, w in centroid.items():
+                self._index.setdefault(f, []).append((label, w))
+        return self
+
+    def scores(self, text: str) -> dict[str, float]:
+        totals = dict.fromkeys(self.centroids, 0.0)
+        for f, w in self.vectorize(text).items():
+            for label, weight in self._index[f]:
+                totals[label] += w * weight
+        return totals
+
+    def predict(self, text: str) -> tuple[str, float, float]:
+        """(label, similarity, margin to the second best label)."""
+        ranked = sorted(self.scores(text).items(), key=lambda item: -item[1])
+        (label, best), (_, second) = ranked[0], ranked[1]
+        return label, best, best - second
+
+
+_default: Optional[IntentClassifier] = None
+_default_lock = threading.Lock()
+
+
+def default_classifier() -> IntentClassifier:
+    """A classifier fitted on intent_examples.EXAMPLES, built once."""
+    global _default
+    with _default_lock:
+        if _default is None:
+            from .intent_examples import EXAMPLES
+
+            _default = IntentClassifier().fit(EXAMPLES)
+        return _default
+
+
+class IntentRouter:
+    """Decides from the user's message alone which skill (or the policy lookup) to start.
+
+    `route` returns the label of the message when the classifier is confident:
+    its similarity is at least `min_score`, its margin to the second label at
+    least `min_margin`, and the label is not one of `fallback_labels`;
+    otherwise None, and the primary assistant decides. `stats()` counts the
+    messages routed per label and those left to the assistant.
+    """
+
+    def __init__(self, classifier: Optional[IntentClassifier] = None, min_score: float = 0.2,
+                 min_margin: float = 0.1, fallback_labels: Iterable[str] = ("other",)) -> None:
+        self.classifier = classifier or default_classifier()
+        self.min_score = min_score
+        self.min_margin = min_margin
+        self.fallback_labels = set(fallback_labels)
+        self._lock = threading.Lock()
+        self.routed: Counter = Counter()
+        self.fallbacks = 0
+        self.seconds = 0.0
+
+    def decide(self, label: str, score: float, margin: float) -> Optional[str]:
+        if label in self.fallback_labels or score < self.min_score or margin < self.min_margin:
+            return None
+        return label
+
+    def route(self, text: str) -> Optional[str]:
+        start = time.perf_counter()
+        label = self.decide(*self.classifier.predict(text))
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            self.seconds += elapsed
+            if label is None:
+                self.fallbacks += 1
+            else:
+                self.routed[label] += 1
+        return label
+
+    def stats(self) -> dict:
+        with self._lock:
+            messages = sum(self.routed.values()) + self.fallbacks
+            return {
+                "messages": messages,
+                "routed": dict(self.routed),
+                "fallbacks": self.fallbacks,
+                "classify_us_mean": round(self.seconds / messages * 1e6, 1) if messages else None,
+            }
+
+
+class NgramEmbeddings(Embeddings):
+    """Local embeddings: the words and character n-grams of `features`, hashed to `size` dimensions.
+
+    No model and no request, so it suits keys that only need to match
+    rewordings of the same short message, such as AnswerCache's.
+    """
+
+    def __init__(self, size: int = 4096, ngrams: Iterable[int] = (2, 3, 4)) -> None:
+        self.size = size
+        self.ngrams = tuple(ngrams)
+
+    def embed_query(self, text: str) -> list[float]:
+        vector = [0.0] * self.size
+        for f, c in features(text, self.ngrams).items():
+            h = zlib.crc32(f.encode())
+            # the sign bit keeps colliding features from always adding up
+            vector[h % self.size] += (1 + math.log(c)) * (1 if h & 0x80000000 else -1)
+        norm = math.sqrt(sum(v * v for v in vector))
+        return [v / norm for v in vector] if norm else vector
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        return [self.embed_query(text) for text in texts]
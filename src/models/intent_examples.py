@@ -0,0 +1,144 @@
+# Training messages of the intent classifier (see intent.py), in Persian and
+# English. "other" is everything the primary assistant answers itself:
+# greetings, thanks, questions about the booked flight, small talk.
+EXAMPLES = {
+    "flight": [
+        "پروازم رو به هفته ی بعد تغییر بده",
+        "می خوام پروازم رو عوض کنم",
+        "لطفا بلیطم رو به یه پرواز دیگه منتقل کن",
+        "پرواز زودتری برای فردا هست؟",
+        "می خوام پروازم رو کنسل کنم",
+        "بلیط هواپیمام رو لغو کن",
+        "تاریخ پروازم رو جابجا کن",
+        "یه پرواز دیگه به زوریخ برام پیدا کن",
+        "پروازهای موجود از بازل به پاریس رو جستجو کن",
+        "می تونی بلیطم رو به پرواز ساعت ۸ تغییر بدی؟",
+        "پروازم رو به یک روز بعد موکول کن",
+        "پرواز برگشتم رو عوض کن",
+        "change my flight to next week",
+        "I want to move my flight to an earlier time",
+        "please rebook me on another flight",
+        "cancel my flight",
+        "cancel my ticket please",
+        "are there any flights to Zurich tomorrow",
+        "search flights from Basel to Paris",
+        "switch my ticket to the evening flight",
+        "can you update my flight to Friday",
+        "I need to reschedule my flight",
+    ],
+    "hotel": [
+        "یه هتل ارزون تو بازل برام رزرو کن",
+        "برای یک هفته هتل می خوام",
+        "هتل های نزدیک مرکز شهر رو پیدا کن",
+        "اقامتگاه مناسب برای سه شب می خوام",
+        "یه هتل لوکس در زوریخ پیشنهاد بده",
+        "رزرو هتلم رو لغو کن",
+        "تاریخ رزرو هتلم رو تغییر بده",
+        "یک اتاق هتل برای دو نفر رزرو کن",
+        "می خوام هتلم رو کنسل کنم",
+        "جای خواب برای اقامتم پیدا کن",
+        "book me a cheap hotel in Basel",
+        "I need a hotel for a week",
+        "find hotels near the city center",
+        "reserve a hotel room for two nights",
+        "cancel my hotel reservation",
+        "change the dates of my hotel booking",
+        "recommend an affordable hotel in Zurich",
+        "I want to stay somewhere luxurious",
+        "any hotels available in Lucerne",
+    ],
+    "car": [
+        "یه ماشین برای یک هفته اجاره کن",
+        "می خوام ماشین کرایه کنم",
+        "خودروی اجاره ای ارزون پیدا کن",
+        "اجاره ی ماشینم رو لغو کن",
+        "تاریخ اجاره ی خودرو رو تغییر بده",
+        "یه ماشین اقتصادی برای سه روز رزرو کن",
+        "گزینه های کرایه ی ماشین در بازل چیه؟",
+        "ماشین لوکس اجاره ای می خوام",
+        "رزرو ماشینم رو کنسل کن",
+        "برای رفت و آمد تو شهر خودرو کرایه کن",
+        "rent me a car for a week",
+        "I want to rent a car",
+        "find a cheap car rental",
+        "cancel my car rental",
+        "change my rental car dates",
+        "book an economy car for three days",
+        "what car rentals are available in Basel",
+        "I need a luxury rental car",
+        "reserve a car at the airport",
+    ],
+    "excursion": [
+        "چه جاهای دیدنی برای گشت و گذار پیشنهاد می کنی؟",
+        "یه تور گردشگری برام رزرو کن",
+        "موزه های خوب شهر کدومن؟",
+        "برنامه ی تفریحی برای آخر هفته پیشنهاد بده",
+        "می خوام از جاذبه های طبیعی دیدن کنم",
+        "یه گشت شهری برای روز دوم رزرو کن",
+        "تور کوهنوردی در لوسرن هست؟",
+        "چه فعالیت های تفریحی اونجا هست؟",
+        "بازدید از موزه رو لغو کن",
+        "جاهای دیدنی اطراف رو معرفی کن",
+        "what excursions do you recommend",
+        "book a city tour for the second day",
+        "which museums can I visit",
+        "recommend some sightseeing activities",
+        "are there any hiking trips near Lucerne",
+        "I like museums and art galleries",
+        "suggest things to do on the weekend",
+        "cancel my trip recommendation booking",
+        "any outdoor activities with scenic views",
+    ],
+    "policy": [
+        "آیا اجازه دارم پروازم رو عوض کنم؟ قوانینش چیه؟",
+        "سیاست استرداد بلیط چیه؟",
+        "هزینه ی کنسلی بلیط چقدره؟",
+        "چقدر بار می تونم با خودم ببرم؟",
+        "قوانین بار همراه چیه؟",
+        "آیا بلیط قابل استرداد هست؟",
+        "شرایط تغییر تاریخ پرواز چیه؟",
+        "تا چند ساعت قبل از پرواز میشه بلیط رو کنسل کرد؟",
+        "جریمه ی لغو رزرو چقدره؟",
+        "مدارک لازم برای سوار شدن به هواپیما چیه؟",
+        "چطوری می تونم پول بلیطم رو پس بگیرم؟",
+        "قوانین پرواز کودکان همراه چیه؟",
+        "what is the refund policy",
+        "can I get a refund for my ticket",
+        "what is the baggage allowance",
+        "how much does it cost to cancel a ticket",
+        "am I allowed to change my flight, what are the rules",
+        "what documents do I need to board",
+        "how many hours before departure can I cancel",
+        "what is the cancellation fee",
+        "rules for traveling with an infant",
+        "is my ticket refundable",
+    ],
+    "other": [
+        "سلام",
+        "سلام، پرواز من چه زمانی است؟",
+        "ممنون",
+        "خیلی ممنون، عالی بود",
+        "صندلی من کجاست؟",
+        "شماره ی بلیطم چیه؟",
+        "پروازم از کدوم ترمینال حرکت می کنه؟",
+        "ساعت حرکت پروازم کیه؟",
+        "باشه",
+        "خداحافظ",
+        "تو کی هستی؟",
+        "چه کمکی از دستت برمیاد؟",
+        "بله",
+        "نه",
+        "hello",
+        "hi, when is my flight",
+        "thanks a lot",
+        "what is my seat number",
+        "which gate does my flight leave from",
+        "what time does my flight depart",
+        "ok",
+        "goodbye",
+        "who are you",
+        "what can you help me with",
+        "yes",
+        "no thanks",
+    ],
+}
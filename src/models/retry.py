@@ -0,0 +1,235 @@
+import asyncio
+import contextvars
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from email.utils import parsedate_to_datetime
+from typing import Awaitable, Callable, Optional, TypeVar
+
+T = TypeVar("T")
+
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504}
+# provider client errors that carry no status code (openai, httpx)
+RETRYABLE_ERRORS = {"APIConnectionError", "APITimeoutError", "RateLimitError",
+                    "InternalServerError", "ConnectError", "ReadTimeout", "TimeoutException"}
+
+
+def status_code(exc: BaseException) -> Optional[int]:
+    code = getattr(exc, "status_code", None)
+    if code is None:
+        code = getattr(getattr(exc, "response", None), "status_code", None)
+    return code if isinstance(code, int) else None
+
+
+def is_rate_limit(exc: BaseException) -> bool:
+    return status_code(exc) == 429 or type(exc).__name__ == "RateLimitError"
+
+
+def is_retryable(exc: BaseException) -> bool:
+    if isinstance(exc, (ConnectionError, TimeoutError, asyncio.TimeoutError)):
+        return True
+    return status_code(exc) in RETRYABLE_STATUS or type(exc).__name__ in RETRYABLE_ERRORS
+
+
+def retry_after(exc: BaseException) -> Optional[float]:
+    """Seconds the provider asked us to wait, from retry-after(-ms) headers."""
+    headers = getattr(getattr(exc, "response", None), "headers", None) or {}
+    value = headers.get("retry-after-ms")
+    if value:
+        try:
+            return float(value) / 1000
+        except ValueError:
+            pass
+    value = headers.get("retry-after")
+    if value:
+        try:
+            return float(value)
+        except ValueError:
+            try:
+                return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+            except (TypeError, ValueError):
+                pass
+    return None
+
+
+class RetryPolicy:
+    """Bounded retries with exponential backoff, and optional hedged requests.
+
+    A failed call is retried up to `max_attempts` in total if the error is
+    transient (timeouts, connection errors, 408/409/429/5xx). The wait before
+    retry n is a random duration in [0, base_delay * 2**(n-1)], capped at
+    `max_delay`; a rate-limited call waits at least what the provider's
+    retry-after header asks for, up to `max_retry_after`.
+
+    With hedging, a second identical call is started if the first has not
+    returned after `hedge_after` seconds, or after the `hedge_quantile` of
+    recently observed latencies once `hedge_min_samples` were seen, and the
+    first answer wins.
+
+    One policy is shared by all assistants of an agent; `stats()` returns its
+    counters.
+    """
+
+    def __init__(self, max_attempts: int = 3,
+                 base_delay: float = 0.5,
+                 max_delay: float = 8.0,
+                 max_retry_after: float = 30.0,
+                 hedge_after: Optional[float] = None,
+                 hedge_quantile: Optional[float] = None,
+                 hedge_min_samples: int = 20,
+                 latency_window: int = 200,
+                 hedge_workers: int = 16) -> None:
+        self.max_attempts = max(1, max_attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_retry_after = max_retry_after
+        self.hedge_after = hedge_after
+        self.hedge_quantile = hedge_quantile
+        self.hedge_min_samples = hedge_min_samples
+        self.hedge_workers = hedge_workers
+        self._latencies: deque = deque(maxlen=latency_window)
+        self._lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._counters = dict.fromkeys(
+            ["calls", "attempts", "retries", "rate_limited", "failures",
+             "empty_responses", "hedges", "hedge_wins"], 0)
+
+    def record(self, counter: str, n: int = 1) -> None:
+        with self._lock:
+            self._counters[counter] += n
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._counters)
+        stats["hedge_deadline"] = self.hedge_deadline()
+        return stats
+
+    def hedge_deadline(self) -> Optional[float]:
+        if self.hedge_after is not None:
+            return self.hedge_after
+        if self.hedge_quantile is None:
+            return None
+        with self._lock:
+            samples = sorted(self._latencies)
+        if len(samples) < self.hedge_min_samples:
+            return None
+        return samples[min(len(samples) - 1, int(len(samples) * self.hedge_quantile))]
+
+    def backoff(self, attempt: int, exc: BaseException) -> float:
+        """Seconds to wait before retrying after failed attempt `attempt` (1-based)."""
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+        if is_rate_limit(exc):
+            self.record("rate_limited")
+            delay = max(delay, min(retry_after(exc) or 0.0, self.max_retry_after))
+        return delay
+
+    def _should_retry(self, attempt: int, exc: BaseException) -> bool:
+        if attempt >= self.max_attempts or not is_retryable(exc):
+            self.record("failures")
+            return False
+        self.record("retries")
+        return True
+
+    def _observe(self, start: float) -> None:
+        # response time as the caller saw it, hedged calls included, so the
+        # quantile does not drift down to the calls that were fast anyway
+        with self._lock:
+            self._latencies.append(time.perf_counter() - start)
+
+    def invoke(self, fn: Callable[[], T]) -> T:
+        """Call `fn` under this policy."""
+        self.record("calls")
+        attempt = 0
+        while True:
+            attempt += 1
+            self.record("attempts")
+            try:
+                return self._call_hedged(fn)
+            except Exception as e:
+                if not self._should_retry(attempt, e):
+                    raise
+                time.sleep(self.backoff(attempt, e))
+
+    async def ainvoke(self, fn: Callable[[], Awaitable[T]]) -> T:
+        """Await `fn()` under this policy; `fn` must return a new awaitable per call."""
+        self.record("calls")
+        attempt = 0
+        while True:
+            attempt += 1
+            self.record("attempts")
+            try:
+                return await self._acall_hedged(fn)
+            except Exception as e:
+                if not self._should_retry(attempt, e):
+                    raise
+                await asyncio.sleep(self.backoff(attempt, e))
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(self.hedge_workers, thread_name_prefix="hedge")
+        return self._executor
+
+    def _call_hedged(self, fn: Callable[[], T]) -> T:
+        start = time.perf_counter()
+        deadline = self.hedge_deadline()
+        if deadline is None:
+            result = fn()
+            self._observe(start)
+            return result
+        executor = self._get_executor()
+        # run in copies of the caller's context so callbacks/config still apply
+        first = executor.submit(contextvars.copy_context().run, fn)
+        done, _ = wait([first], timeout=deadline)
+        if not done:
+            self.record("hedges")
+            second = executor.submit(contextvars.copy_context().run, fn)
+            pending, error = {first, second}, None
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    if future.exception() is None:
+                        if future is second:
+                            self.record("hedge_wins")
+                        self._observe(start)
+                        # the slower call keeps running, its result is dropped
+                        return future.result()
+                    error = error or future.exception()
+            raise error
+        result = first.result()
+        self._observe(start)
+        return result
+
+    async def _acall_hedged(self, fn: Callable[[], Awaitable[T]]) -> T:
+        start = time.perf_counter()
+        deadline = self.hedge_deadline()
+        if deadline is None:
+            result = await fn()
+            self._observe(start)
+            return result
+        first = asyncio.ensure_future(fn())
+        done, _ = await asyncio.wait({first}, timeout=deadline)
+        if not done:
+            self.record("hedges")
+            second = asyncio.ensure_future(fn())
+            pending, error = {first, second}, None
+            try:
+                while pending:
+                    done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                    for task in done:
+                        if task.exception() is None:
+                            if task is second:
+                                self.record("hedge_wins")
+                            self._observe(start)
+                            return task.result()
+                        error = error or task.exception()
+            finally:
+                for task in pending:
+                    task.cancel()
+            raise error
+        result = first.result()
+        self._observe(start)
+        return result
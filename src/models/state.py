@@ -2,6 +2,7 @@ from typing import Annotated, Literal, Optional
 
 from typing_extensions import TypedDict
 
+from langchain_core.messages import AIMessage, ToolMessage
 from langgraph.graph.message import AnyMessage, add_messages
 
 def update_dialog_stack(left: list[str], right: Optional[str]) -> list[str]:
@@ -13,9 +14,30 @@ def update_dialog_stack(left: list[str], right: Optional[str]) -> list[str]:
     return left + [right]
 
 
+def pending_tool_calls(messages: list[AnyMessage]) -> list[dict]:
+    """Tool calls of the latest AIMessage that have no ToolMessage yet.
+
+    The calls of one message are answered in phases (safe tools, sensitive
+    tools, then leaving or entering a skill), each appending its ToolMessages
+    after the AIMessage.
+    """
+    answered = set()
+    for message in reversed(messages):
+        if isinstance(message, ToolMessage):
+            answered.add(message.tool_call_id)
+        elif isinstance(message, AIMessage):
+            return [tc for tc in message.tool_calls if tc["id"] not in answered]
+        else:
+            break
+    return []
+
+
 class State(TypedDict):
     messages: Annotated[list[AnyMessage], add_messages]
     user_info: str
+    # rolling summary of the messages up to `summary_until`, see HistoryManager
+    summary: str
+    summary_until: Optional[str]
     dialog_state: Annotated[
         list[
             Literal[
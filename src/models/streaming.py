@@ -0,0 +1,143 @@
+import threading
+import time
+from collections import deque
+from typing import Optional
+
+# Chat model runs of the assistants carry this tag (see CustomerSupportAgent),
+# so that only their tokens are streamed to the user and not those of models
+# used inside tools, such as the policy translation.
+REPLY_TAG = "assistant_reply"
+
+TOOL_OUTPUT_CHARS = 2000
+
+
+def percentile(samples, q: float) -> Optional[float]:
+    if not samples:
+        return None
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * q))]
+
+
+def _ms(seconds: Optional[float]) -> Optional[float]:
+    return None if seconds is None else round(seconds * 1000, 3)
+
+
+class TurnStream:
+    """Converts the astream_events (v2) of one graph turn into client events.
+
+    The events are plain JSON-serializable dicts with an "event" key:
+
+      {"event": "node", "node": ...}                        a graph node starts
+      {"event": "token", "node": ..., "text": ...}          a piece of the reply
+      {"event": "tool_start", "node": ..., "tool": ..., "input": {...}}
+      {"event": "tool_end", "node": ..., "tool": ..., "output": "..."}
+
+    Tokens come from the assistant models only, from one model run at a time
+    (a hedged duplicate call is not streamed twice). A model that does not
+    stream sends its whole answer as one token when it ends. Time to first
+    token is measured from the creation of the TurnStream, inter-token
+    latency between tokens of the same model run.
+    """
+
+    def __init__(self) -> None:
+        self.start = time.perf_counter()
+        self.first_token: Optional[float] = None
+        self.tokens = 0
+        self.gaps: list[float] = []
+        self._run: Optional[str] = None
+        self._last: Optional[float] = None
+        self._streamed: set[str] = set()
+
+    def _token(self, event: dict, text: str) -> dict:
+        now = time.perf_counter()
+        if self.first_token is None:
+            self.first_token = now - self.start
+        elif self._last is not None:
+            self.gaps.append(now - self._last)
+        self._last = now
+        self.tokens += 1
+        return {"event": "token", "node": event["metadata"].get("langgraph_node"), "text": text}
+
+    def convert(self, event: dict) -> Optional[dict]:
+        kind, tags = event["event"], event.get("tags") or []
+        node = event.get("metadata", {}).get("langgraph_node")
+        if kind == "on_chain_start" and any(tag.startswith("graph:step:") for tag in tags):
+            return {"event": "node", "node": event["name"]}
+        if kind == "on_tool_start":
+            return {"event": "tool_start", "node": node, "tool": event["name"],
+                    "input": event["data"].get("input")}
+        if kind == "on_tool_end":
+            output = event["data"].get("output")
+            output = getattr(output, "content", output)
+            if not isinstance(output, str):
+                output = str(output)
+            return {"event": "tool_end", "node": node, "tool": event["name"],
+                    "output": output[:TOOL_OUTPUT_CHARS]}
+        if REPLY_TAG not in tags:
+            return None
+        if kind == "on_chat_model_stream":
+            text = event["data"]["chunk"].content
+            if not isinstance(text, str) or not text:
+                return None
+            self._streamed.add(event["run_id"])
+            if self._run is None:
+                self._run = event["run_id"]
+                self._last = None
+            if self._run != event["run_id"]:
+                return None
+            return self._token(event, text)
+        if kind == "on_chat_model_end":
+            if self._run == event["run_id"]:
+                self._run = None
+                return None
+            text = getattr(event["data"].get("output"), "content", None)
+            if self._run is None and event["run_id"] not in self._streamed and isinstance(text, str) and text:
+                self._last = None
+                return self._token(event, text)
+        return None
+
+    def metrics(self) -> dict:
+        gaps = self.gaps
+        return {
+            "ttft_ms": _ms(self.first_token),
+            "tokens": self.tokens,
+            "itl_ms_mean": _ms(sum(gaps) / len(gaps)) if gaps else None,
+            "itl_ms_p50": _ms(percentile(gaps, 0.5)),
+            "itl_ms_max": _ms(max(gaps, default=None)),
+            "duration_ms": _ms(time.perf_counter() - self.start),
+        }
+
+
+class StreamStats:
+    """Time to first token and inter-token latency over the last streamed turns.
+
+    One instance is shared by all conversations of an agent; every streamed
+    turn is recorded and `stats()` returns percentiles over the last `window`
+    turns (turns without a token, e.g. ending at an approval, only count).
+    """
+
+    def __init__(self, window: int = 1000) -> None:
+        self._lock = threading.Lock()
+        self.turns = 0
+        self._ttft: deque = deque(maxlen=window)
+        self._itl: deque = deque(maxlen=window)
+
+    def record(self, turn: TurnStream) -> None:
+        with self._lock:
+            self.turns += 1
+            if turn.first_token is not None:
+                self._ttft.append(turn.first_token)
+            if turn.gaps:
+                self._itl.append(sum(turn.gaps) / len(turn.gaps))
+
+    def stats(self) -> dict:
+        with self._lock:
+            ttft, itl = list(self._ttft), list(self._itl)
+            turns = self.turns
+        return {
+            "turns": turns,
+            "ttft_ms_p50": _ms(percentile(ttft, 0.5)),
+            "ttft_ms_p99": _ms(percentile(ttft, 0.99)),
+            "itl_ms_p50": _ms(percentile(itl, 0.5)),
+            "itl_ms_p99": _ms(percentile(itl, 0.99)),
+        }
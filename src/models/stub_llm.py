@@ -0,0 +1,201 @@
+import asyncio
+import hashlib
+import json
+import re
+import threading
+import time
+from typing import Any, AsyncIterator, Callable, Iterator, List, Optional, Union
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.pydantic_v1 import PrivateAttr
+
+
+class StubChatModel(BaseChatModel):
+    """Offline stand-in for ChatOpenAI with a fixed per-call latency.
+
+    Every call answers with `response` after sleeping `latency` seconds
+    (`asyncio.sleep` on the async path), which is enough to measure how the
+    graph schedules LLM-bound work without any network. When streamed (e.g.
+    under astream_events), the answer comes word by word, `token_latency`
+    seconds apart, after the first word at `latency`.
+    """
+
+    latency: float = 0.0
+    token_latency: float = 0.0
+    response: str = "باشه، چه کمک دیگری از دستم برمی‌آید؟"
+
+    @property
+    def _llm_type(self) -> str:
+        return "stub"
+
+    def bind_tools(self, tools: Any, **kwargs: Any) -> "StubChatModel":
+        return self
+
+    def _respond(self, messages: List[BaseMessage]) -> AIMessage:
+        return AIMessage(content=self.response)
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        if self.latency:
+            time.sleep(self.latency)
+        return ChatResult(generations=[ChatGeneration(message=self._respond(messages))])
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                         run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return ChatResult(generations=[ChatGeneration(message=self._respond(messages))])
+
+    @staticmethod
+    def _chunks(message: AIMessage) -> List[AIMessageChunk]:
+        words = re.findall(r"\s*\S+", message.content) if isinstance(message.content, str) else []
+        chunks = [AIMessageChunk(content=word) for word in words] or [AIMessageChunk(content=message.content)]
+        chunks[-1] = AIMessageChunk(
+            content=chunks[-1].content,
+            tool_call_chunks=[
+                {"name": tc["name"], "args": json.dumps(tc["args"]), "id": tc["id"], "index": i}
+                for i, tc in enumerate(message.tool_calls)
+            ],
+            usage_metadata=message.usage_metadata,
+            response_metadata=message.response_metadata,
+        )
+        return chunks
+
+    def _stream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                run_manager: Any = None, **kwargs: Any) -> Iterator[ChatGenerationChunk]:
+        message = self._generate(messages, stop, run_manager, **kwargs).generations[0].message
+        for i, chunk in enumerate(self._chunks(message)):
+            if i and self.token_latency:
+                time.sleep(self.token_latency)
+            yield ChatGenerationChunk(message=chunk)
+
+    async def _astream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                       run_manager: Any = None, **kwargs: Any) -> AsyncIterator[ChatGenerationChunk]:
+        message = (await self._agenerate(messages, stop, run_manager, **kwargs)).generations[0].message
+        for i, chunk in enumerate(self._chunks(message)):
+            if i and self.token_latency:
+                await asyncio.sleep(self.token_latency)
+            yield ChatGenerationChunk(message=chunk)
+
+
+def tool_call(name: str, **args: Any) -> dict:
+    """A scripted tool call, e.g. tool_call("search_hotels", location="Basel")."""
+    return {"name": name, "args": args}
+
+
+ScriptStep = Union[str, dict, List[dict], AIMessage, Callable[[List[BaseMessage]], AIMessage]]
+
+
+class ScriptedChatModel(StubChatModel):
+    """Replays `script` one step per model call, in order, wrapping around.
+
+    A step is the text of a final answer, a `tool_call(...)` dict, a list of them
+    for parallel calls, a ready AIMessage, or a callable that builds the
+    AIMessage from the prompt messages. Tool call ids are deterministic
+    (`call_1`, `call_2`, ...), so a replay produces the same checkpoints every run.
+    """
+
+    script: List[Any] = []
+    _position: int = PrivateAttr(default=0)
+    _lock: Any = PrivateAttr(default_factory=threading.Lock)
+
+    def _respond(self, messages: List[BaseMessage]) -> AIMessage:
+        with self._lock:
+            step = self.script[self._position % len(self.script)]
+            self._position += 1
+            position = self._position
+        if callable(step):
+            step = step(messages)
+        if isinstance(step, AIMessage):
+            return step
+        if isinstance(step, str):
+            return AIMessage(content=step)
+        calls = step if isinstance(step, list) else [step]
+        return AIMessage(
+            content="",
+            tool_calls=[
+                {"name": call["name"], "args": call["args"], "id": f"call_{position}_{i}"}
+                for i, call in enumerate(calls)
+            ],
+        )
+
+    def reset(self) -> None:
+        with self._lock:
+            self._position = 0
+
+
+class PrefixCachingChatModel(ScriptedChatModel):
+    """ScriptedChatModel that reports prompt caching the way providers do.
+
+    Every prompt (the bound tool schemas, then the messages) is serialized and
+    cut into tokens of `chars_per_token` characters. Like OpenAI's automatic
+    caching, the longest prefix of `min_prefix_tokens` or more, in steps of
+    `block_tokens`, that an earlier call of any conversation already sent is
+    counted as cached. The counts are reported in the OpenAI usage format
+    (`usage_metadata` and `response_metadata["token_usage"]`), so they are read
+    back through the same code as a real ChatOpenAI answer.
+    """
+
+    chars_per_token: int = 3
+    min_prefix_tokens: int = 1024
+    block_tokens: int = 128
+    _prefixes: Any = PrivateAttr(default_factory=set)
+
+    def bind_tools(self, tools: Any, **kwargs: Any) -> Any:
+        from langchain_core.utils.function_calling import convert_to_openai_tool
+
+        return self.bind(tools=[convert_to_openai_tool(tool) for tool in tools], **kwargs)
+
+    def _serialize(self, messages: List[BaseMessage], tools: Optional[list]) -> str:
+        parts = [json.dumps(tools or [], sort_keys=True)]
+        for message in messages:
+            parts.append(json.dumps({
+                "role": message.type,
+                "content": message.content,
+                "tool_calls": [[tc["name"], tc["args"], tc["id"]] for tc in getattr(message, "tool_calls", [])],
+                "tool_call_id": getattr(message, "tool_call_id", None),
+            }, ensure_ascii=False, sort_keys=True))
+        return "\n".join(parts)
+
+    def _cache(self, prompt: str) -> tuple[int, int]:
+        """(prompt tokens, cached tokens), remembering the prefixes of `prompt`."""
+        tokens = -(-len(prompt) // self.chars_per_token)
+        block_chars = self.block_tokens * self.chars_per_token
+        digest, keys = hashlib.sha256(), []
+        for end in range(block_chars, len(prompt) + 1, block_chars):
+            digest.update(prompt[end - block_chars:end].encode())
+            if end // self.chars_per_token >= self.min_prefix_tokens:
+                keys.append((end // self.chars_per_token, digest.copy().digest()))
+        with self._lock:
+            cached = max((length for length, key in keys if key in self._prefixes), default=0)
+            self._prefixes.update(key for _, key in keys)
+        return tokens, cached
+
+    def _with_usage(self, result: ChatResult, messages: List[BaseMessage], tools: Optional[list]) -> ChatResult:
+        tokens, cached = self._cache(self._serialize(messages, tools))
+        message = result.generations[0].message
+        output = -(-len(str(message.content) + json.dumps([tc["args"] for tc in message.tool_calls])) // 3)
+        message.usage_metadata = {"input_tokens": tokens, "output_tokens": output, "total_tokens": tokens + output}
+        message.response_metadata["token_usage"] = {
+            "prompt_tokens": tokens,
+            "completion_tokens": output,
+            "total_tokens": tokens + output,
+            "prompt_tokens_details": {"cached_tokens": cached},
+        }
+        return result
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        result = super()._generate(messages, stop, run_manager)
+        return self._with_usage(result, messages, kwargs.get("tools"))
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                         run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        result = await super()._agenerate(messages, stop, run_manager)
+        return self._with_usage(result, messages, kwargs.get("tools"))
+
+    def reset_cache(self) -> None:
+        with self._lock:
+            self._prefixes.clear()
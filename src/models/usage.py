@@ -0,0 +1,87 @@
+import threading
+from typing import Optional
+
+from langchain_core.messages import BaseMessage
+
+
+def cached_tokens(message: BaseMessage) -> Optional[int]:
+    """Prompt tokens the provider served from its prompt cache, None if not reported.
+
+    Read from `usage_metadata.input_token_details.cache_read` (newer
+    langchain-core), or from the raw usage in `response_metadata`: OpenAI's
+    `prompt_tokens_details.cached_tokens` or Anthropic's
+    `cache_read_input_tokens`.
+    """
+    details = (getattr(message, "usage_metadata", None) or {}).get("input_token_details") or {}
+    if details.get("cache_read") is not None:
+        return details["cache_read"]
+    metadata = getattr(message, "response_metadata", None) or {}
+    usage = metadata.get("token_usage") or metadata.get("usage") or {}
+    if not isinstance(usage, dict):
+        return None
+    prompt_details = usage.get("prompt_tokens_details") or {}
+    if prompt_details.get("cached_tokens") is not None:
+        return prompt_details["cached_tokens"]
+    return usage.get("cache_read_input_tokens")
+
+
+def input_tokens(message: BaseMessage) -> Optional[int]:
+    usage_metadata = getattr(message, "usage_metadata", None)
+    if usage_metadata:
+        return usage_metadata["input_tokens"]
+    metadata = getattr(message, "response_metadata", None) or {}
+    usage = metadata.get("token_usage") or metadata.get("usage") or {}
+    if not isinstance(usage, dict):
+        return None
+    return usage.get("prompt_tokens", usage.get("input_tokens"))
+
+
+def output_tokens(message: BaseMessage) -> Optional[int]:
+    usage_metadata = getattr(message, "usage_metadata", None)
+    if usage_metadata:
+        return usage_metadata["output_tokens"]
+    metadata = getattr(message, "response_metadata", None) or {}
+    usage = metadata.get("token_usage") or metadata.get("usage") or {}
+    if not isinstance(usage, dict):
+        return None
+    return usage.get("completion_tokens", usage.get("output_tokens"))
+
+
+class UsageStats:
+    """Prompt tokens sent and served from the provider's prompt cache.
+
+    One instance is shared by all assistants of an agent; `record` is called
+    with every model answer and `stats()` returns the totals. Answers without
+    usage metadata only count as calls.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self.calls = 0
+            self.reported = 0
+            self.input_tokens = 0
+            self.cached_tokens = 0
+
+    def record(self, message: BaseMessage) -> None:
+        sent, cached = input_tokens(message), cached_tokens(message)
+        with self._lock:
+            self.calls += 1
+            if sent is None:
+                return
+            self.reported += 1
+            self.input_tokens += sent
+            self.cached_tokens += cached or 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "calls_with_usage": self.reported,
+                "input_tokens": self.input_tokens,
+                "cached_tokens": self.cached_tokens,
+                "cached_ratio": self.cached_tokens / self.input_tokens if self.input_tokens else 0.0,
+            }
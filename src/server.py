@@ -0,0 +1,155 @@
+import asyncio
+import json
+import sys
+import time
+import weakref
+from typing import AsyncIterator, Optional
+
+from langchain_core.messages import AIMessage
+
+from .agent import CustomerSupportAgent
+from .models.state import pending_tool_calls
+
+
+class ChatServer:
+    """Serves many conversations through one compiled graph.
+
+    Turns of the same thread_id are serialized (the checkpointer holds one
+    linear history per thread); different threads run concurrently, bounded by
+    `max_concurrency`.
+    """
+
+    def __init__(self, agent: CustomerSupportAgent, max_concurrency: int = 256) -> None:
+        self.agent = agent
+        self.max_concurrency = max_concurrency
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._thread_locks: "weakref.WeakValueDictionary[str, asyncio.Lock]" = weakref.WeakValueDictionary()
+
+    def _thread_lock(self, thread_id: str) -> asyncio.Lock:
+        lock = self._thread_locks.get(thread_id)
+        if lock is None:
+            lock = self._thread_locks[thread_id] = asyncio.Lock()
+        return lock
+
+    def _config(self, request: dict) -> dict:
+        return {
+            "configurable": {
+                "passenger_id": request["passenger_id"],
+                "thread_id": str(request["thread_id"]),
+            }
+        }
+
+    def _response(self, request: dict, snapshot, latency: float) -> dict:
+        messages = snapshot.values.get("messages", [])
+        last = messages[-1] if messages else None
+        response = {
+            "id": request.get("id"),
+            "thread_id": str(request["thread_id"]),
+            "reply": last.content if isinstance(last, AIMessage) else "",
+            "latency_ms": round(latency * 1000, 3),
+        }
+        if snapshot.next:
+            response["pending_approval"] = [
+                {"name": tc["name"], "args": tc["args"]} for tc in pending_tool_calls(messages)
+            ]
+        return response
+
+    async def handle(self, request: dict) -> dict:
+        """Run one turn. `request` holds thread_id, passenger_id and message.
+
+        If the previous turn stopped before a sensitive tool, `message` is the
+        approval answer: "y" runs the tool, anything else denies it with that
+        reason. The response carries the assistant's reply and, when the graph is
+        waiting for approval again, the pending tool calls.
+        """
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        config = self._config(request)
+        graph = self.agent.graph
+        lock = self._thread_lock(config["configurable"]["thread_id"])
+        async with lock, self._semaphore:
+            start = time.perf_counter()
+            snapshot = await graph.aget_state(config)
+            if snapshot.next:
+                await graph.ainvoke(self.agent._resume_input(snapshot, request["message"]), config)
+            else:
+                async for _ in self.agent.astream(request["message"], config):
+                    pass
+            snapshot = await graph.aget_state(config)
+            latency = time.perf_counter() - start
+        return self._response(request, snapshot, latency)
+
+    async def handle_stream(self, request: dict) -> AsyncIterator[dict]:
+        """Like `handle`, but yields the events of the turn as they happen.
+
+        Every event of `CustomerSupportAgent.astream_turn` (node, token,
+        tool_start, tool_end) is yielded with the request's id and thread_id;
+        the last one is {"event": "end", ...} with the fields of the `handle`
+        response plus the turn's time to first token and inter-token latency
+        under "metrics".
+        """
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        config = self._config(request)
+        graph = self.agent.graph
+        ids = {"id": request.get("id"), "thread_id": config["configurable"]["thread_id"]}
+        lock = self._thread_lock(ids["thread_id"])
+        async with lock, self._semaphore:
+            start = time.perf_counter()
+            snapshot = await graph.aget_state(config)
+            turn_input = request["message"]
+            if snapshot.next:
+                turn_input = self.agent._resume_input(snapshot, request["message"])
+            metrics = None
+            async for event in self.agent.astream_turn(turn_input, config):
+                if event["event"] == "end":
+                    metrics = event["metrics"]
+                else:
+                    yield {**ids, **event}
+            snapshot = await graph.aget_state(config)
+            latency = time.perf_counter() - start
+        yield {"event": "end", **self._response(request, snapshot, latency), "metrics": metrics}
+
+    async def _handle_line(self, line: str, write) -> None:
+        request = None
+        try:
+            request = json.loads(line)
+            if request.get("stream"):
+                async for event in self.handle_stream(request):
+                    await write(event)
+                return
+            response = await self.handle(request)
+        except Exception as e:
+            response = {"id": request.get("id") if isinstance(request, dict) else None,
+                        "error": repr(e)}
+        await write(response)
+
+    async def serve_jsonl(self, reader=None, writer=None) -> None:
+        """Read one JSON request per line and write one JSON response per line.
+
+        Requests are processed concurrently, so responses can come back out of
+        order; clients match them by the optional "id" field. A request with
+        "stream": true gets one line per event of `handle_stream` instead,
+        ending with the "end" event.
+        """
+        reader = reader or sys.stdin
+        writer = writer or sys.stdout
+        write_lock = asyncio.Lock()
+
+        async def write(response: dict) -> None:
+            async with write_lock:
+                writer.write(json.dumps(response, ensure_ascii=False, default=str) + "\n")
+                writer.flush()
+
+        tasks = set()
+        while True:
+            line = await asyncio.to_thread(reader.readline)
+            if not line:
+                break
+            if not line.strip():
+                continue
+            task = asyncio.create_task(self._handle_line(line, write))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+        if tasks:
+            await asyncio.gather(*tasks)
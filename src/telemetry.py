@@ -0,0 +1,435 @@
+import atexit
+import json
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Optional
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.runnables import Runnable, RunnableConfig
+from langgraph.utils import RunnableCallable, coerce_to_runnable
+
+from .models.streaming import REPLY_TAG, percentile
+from .models.usage import cached_tokens, input_tokens, output_tokens
+
+QUANTILES = (0.5, 0.95, 0.99)
+
+# OTLP status codes
+STATUS_OK, STATUS_ERROR = 1, 2
+
+SERVICE_NAME = "customer-support-agent"
+
+
+def _thread_id(config: Optional[dict]) -> Optional[str]:
+    # inside a node, configurable["thread_id"] may carry a task suffix, the metadata does not
+    config = config or {}
+    thread_id = (config.get("metadata") or {}).get("thread_id")
+    if thread_id is None:
+        thread_id = (config.get("configurable") or {}).get("thread_id")
+    return None if thread_id is None else str(thread_id)
+
+
+def _otlp_value(value: Any) -> dict:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    if isinstance(value, (list, tuple)):
+        return {"arrayValue": {"values": [_otlp_value(v) for v in value]}}
+    return {"stringValue": str(value)}
+
+
+def _otlp_attributes(attributes: dict) -> list:
+    return [{"key": key, "value": _otlp_value(value)} for key, value in attributes.items() if value is not None]
+
+
+class Span:
+    """One timed operation: a graph node, a tool run or a chat model call."""
+
+    __slots__ = ("name", "trace_id", "span_id", "parent_id", "start_ns", "end_ns", "attributes", "error")
+
+    def __init__(self, name: str, trace_id: str, parent_id: Optional[str] = None, **attributes: Any) -> None:
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+        self.attributes = attributes
+        self.error: Optional[str] = None
+
+    def end(self, error: Optional[BaseException] = None) -> float:
+        """Ends the span; returns its duration in seconds."""
+        self.end_ns = time.time_ns()
+        if error is not None:
+            self.error = repr(error)
+        return (self.end_ns - self.start_ns) / 1e9
+
+    def to_otlp(self) -> dict:
+        span = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": 1,  # SPAN_KIND_INTERNAL
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns),
+            "attributes": _otlp_attributes(self.attributes),
+            "status": {"code": STATUS_ERROR, "message": self.error} if self.error else {"code": STATUS_OK},
+        }
+        if self.parent_id:
+            span["parentSpanId"] = self.parent_id
+        return span
+
+
+class _NodeSpans(BaseCallbackHandler):
+    """Collects the tool and chat model runs inside one node as child spans."""
+
+    run_inline = True
+
+    def __init__(self, telemetry: "Telemetry", node: Span) -> None:
+        self.telemetry = telemetry
+        self.node = node
+        self.spans: list[Span] = []
+        self._parents: dict[UUID, Optional[UUID]] = {}
+        self._open: dict[UUID, Span] = {}
+
+    def _parent_span(self, parent_run_id: Optional[UUID]) -> str:
+        # the closest enclosing run that is a span; chains in between are not
+        run_id = parent_run_id
+        while run_id is not None:
+            span = self._open.get(run_id)
+            if span is not None:
+                return span.span_id
+            run_id = self._parents.get(run_id)
+        return self.node.span_id
+
+    def _start(self, name: str, run_id: UUID, parent_run_id: Optional[UUID], **attributes: Any) -> Span:
+        self._parents[run_id] = parent_run_id
+        span = self._open[run_id] = Span(name, self.node.trace_id, self._parent_span(parent_run_id),
+                                         **{"langgraph.node": self.node.attributes["langgraph.node"],
+                                            "thread_id": self.node.attributes["thread_id"], **attributes})
+        return span
+
+    def _end(self, run_id: UUID, error: Optional[BaseException] = None) -> Optional[Span]:
+        span = self._open.pop(run_id, None)
+        if span is None:
+            return None
+        duration = span.end(error)
+        self.spans.append(span)
+        self.telemetry._observe(span, duration)
+        return span
+
+    def on_chain_start(self, serialized, inputs, *, run_id, parent_run_id=None, **kwargs):
+        self._parents[run_id] = parent_run_id
+
+    def on_tool_start(self, serialized, input_str, *, run_id, parent_run_id=None, **kwargs):
+        name = kwargs.get("name") or (serialized or {}).get("name") or "tool"
+        self._start(f"tool {name}", run_id, parent_run_id, **{"tool.name": name})
+
+    def on_tool_end(self, output, *, run_id, **kwargs):
+        self._end(run_id)
+
+    def on_tool_error(self, error, *, run_id, **kwargs):
+        self._end(run_id, error)
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, parent_run_id=None, tags=None, **kwargs):
+        model = kwargs.get("name") or (serialized or {}).get("name") or "chat_model"
+        # assistant replies are tagged, other calls are made by tools (the policy translation)
+        role = "reply" if REPLY_TAG in (tags or []) else "tool"
+        self._start(f"llm {model}", run_id, parent_run_id, **{"gen_ai.request.model": model, "llm.role": role})
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        span = self._open.get(run_id)
+        if span is not None:
+            generations = response.generations[0] if response.generations else []
+            message = getattr(generations[0], "message", None) if generations else None
+            if message is not None:
+                span.attributes["gen_ai.usage.input_tokens"] = input_tokens(message)
+                span.attributes["gen_ai.usage.output_tokens"] = output_tokens(message)
+                span.attributes["gen_ai.usage.cached_tokens"] = cached_tokens(message)
+        self._end(run_id)
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        self._end(run_id, error)
+
+
+class Telemetry:
+    """Timing spans of graph nodes, with their tools and model calls, and latency quantiles.
+
+    `wrap` turns a graph node into one that records a span per run, carrying
+    the thread_id, node name, names of the tools it ran and the tokens its
+    model calls used; tool runs and model calls inside the node become child
+    spans. All spans of one user message share a trace id: a trace starts at
+    the entry node of the graph and lasts until the next message of the
+    thread, so the tools run after an approval belong to it too.
+
+    Durations are summarized per node, tool and model call kind over the last
+    `window` samples and rendered in the Prometheus text format by
+    `prometheus_text`, which can be served with `serve_prometheus` or written
+    to `metrics_file`. With a `spans_file`, finished spans are kept (at most
+    `max_spans`, further ones are dropped and counted) until `flush` appends
+    them to it as one OTLP/JSON `ExportTraceServiceRequest` per line. With an
+    `export_interval` a background thread flushes periodically; everything is
+    flushed at exit.
+    """
+
+    def __init__(self, spans_file: Optional[str] = None, metrics_file: Optional[str] = None,
+                 export_interval: Optional[float] = None, window: int = 1000,
+                 max_spans: int = 100000, max_threads: int = 10000) -> None:
+        self.spans_file = spans_file
+        self.metrics_file = metrics_file
+        self.export_interval = export_interval
+        self.window = window
+        self.max_spans = max_spans
+        self.max_threads = max_threads
+        self._lock = threading.Lock()
+        self._spans: deque = deque()
+        self._summaries: dict[tuple, list] = {}
+        self._counters: dict[tuple, float] = {}
+        self._traces: "OrderedDict[Optional[str], str]" = OrderedDict()
+        self._exporter: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self.dropped = 0
+        if spans_file or metrics_file:
+            atexit.register(self._export_once)
+
+    # nodes
+
+    def wrap(self, name: str, node: Any, entry: bool = False) -> Runnable:
+        """`node` (anything `add_node` takes) as a node named `name` that records its spans.
+
+        `entry` marks the entry node of the graph, where a new trace starts.
+        """
+        runnable = coerce_to_runnable(node, name=name, trace=False)
+
+        def invoke(input, config: RunnableConfig):
+            span, handler = self._start_node(name, config, entry)
+            error = None
+            try:
+                return runnable.invoke(input, self._with_handler(config, handler))
+            except BaseException as e:
+                error = e
+                raise
+            finally:
+                self._end_node(span, handler, error)
+
+        async def ainvoke(input, config: RunnableConfig):
+            span, handler = self._start_node(name, config, entry)
+            error = None
+            try:
+                return await runnable.ainvoke(input, self._with_handler(config, handler))
+            except BaseException as e:
+                error = e
+                raise
+            finally:
+                self._end_node(span, handler, error)
+
+        # not traced itself: the graph already opens a run for every node
+        return RunnableCallable(invoke, ainvoke, name=name, trace=False)
+
+    def _trace_id(self, thread_id: Optional[str], entry: bool) -> str:
+        with self._lock:
+            trace_id = None if entry else self._traces.get(thread_id)
+            if trace_id is None:
+                trace_id = self._traces[thread_id] = os.urandom(16).hex()
+                while len(self._traces) > self.max_threads:
+                    self._traces.popitem(last=False)
+            self._traces.move_to_end(thread_id)
+            return trace_id
+
+    def _start_node(self, name: str, config: RunnableConfig, entry: bool):
+        thread_id = _thread_id(config)
+        span = Span(f"node {name}", self._trace_id(thread_id, entry), **{
+            "thread_id": thread_id,
+            "langgraph.node": name,
+            "langgraph.step": (config.get("metadata") or {}).get("langgraph_step"),
+        })
+        return span, _NodeSpans(self, span)
+
+    @staticmethod
+    def _with_handler(config: RunnableConfig, handler: BaseCallbackHandler) -> RunnableConfig:
+        callbacks = config.get("callbacks")
+        if isinstance(callbacks, list) or callbacks is None:
+            callbacks = [*(callbacks or []), handler]
+        else:
+            callbacks = callbacks.copy()
+            callbacks.add_handler(handler, inherit=True)
+        return {**config, "callbacks": callbacks}
+
+    def _end_node(self, span: Span, handler: _NodeSpans, error: Optional[BaseException]) -> None:
+        # model calls that never ended (the losing call of a hedged request) are not reported
+        llm = [s for s in handler.spans if "gen_ai.request.model" in s.attributes]
+        span.attributes["tools"] = [s.attributes["tool.name"] for s in handler.spans if "tool.name" in s.attributes]
+        span.attributes["llm.calls"] = len(llm)
+        for key in ("gen_ai.usage.input_tokens", "gen_ai.usage.output_tokens", "gen_ai.usage.cached_tokens"):
+            span.attributes[key] = sum(s.attributes.get(key) or 0 for s in llm)
+        self._observe(span, span.end(error))
+
+    # metrics
+
+    def _observe(self, span: Span, duration: float) -> None:
+        attributes = span.attributes
+        node = attributes["langgraph.node"]
+        if "tool.name" in attributes:
+            series = ("agent_tool_duration_seconds", (("node", node), ("tool", attributes["tool.name"])))
+        elif "gen_ai.request.model" in attributes:
+            series = ("agent_llm_duration_seconds", (("node", node), ("role", attributes["llm.role"])))
+        else:
+            series = ("agent_node_duration_seconds", (("node", node),))
+        with self._lock:
+            summary = self._summaries.get(series)
+            if summary is None:
+                summary = self._summaries[series] = [deque(maxlen=self.window), 0.0, 0]
+            summary[0].append(duration)
+            summary[1] += duration
+            summary[2] += 1
+            if span.error:
+                self._count("agent_errors_total", (("node", node), ("span", span.name)))
+            if "gen_ai.request.model" in attributes:
+                for kind in ("input", "output", "cached"):
+                    tokens = attributes.get(f"gen_ai.usage.{kind}_tokens")
+                    if tokens:
+                        self._count("agent_llm_tokens_total", (("node", node), ("type", kind)), tokens)
+            if self.spans_file:
+                if len(self._spans) >= self.max_spans:
+                    self.dropped += 1
+                else:
+                    self._spans.append(span)
+        if self.export_interval and (self.spans_file or self.metrics_file) and self._exporter is None:
+            self._start_exporter()
+
+    def _count(self, name: str, labels: tuple, value: float = 1) -> None:
+        self._counters[(name, labels)] = self._counters.get((name, labels), 0) + value
+
+    def stats(self) -> dict:
+        """p50/p95/p99 duration in ms and count per node."""
+        with self._lock:
+            nodes = {dict(labels)["node"]: (list(summary[0]), summary[2])
+                     for (name, labels), summary in self._summaries.items()
+                     if name == "agent_node_duration_seconds"}
+        return {node: {"count": count, **{f"p{int(q * 100)}_ms": round(percentile(samples, q) * 1000, 3)
+                                          for q in QUANTILES}}
+                for node, (samples, count) in sorted(nodes.items())}
+
+    def prometheus_text(self) -> str:
+        with self._lock:
+            summaries = [(name, labels, list(samples), total, count)
+                         for (name, labels), (samples, total, count) in sorted(self._summaries.items())]
+            counters = sorted(self._counters.items())
+            dropped = self.dropped
+        help_text = {
+            "agent_node_duration_seconds": "Time spent in a graph node.",
+            "agent_tool_duration_seconds": "Time spent in a tool run.",
+            "agent_llm_duration_seconds": "Time spent in a chat model call (role reply or tool).",
+            "agent_errors_total": "Nodes, tools and model calls that raised.",
+            "agent_llm_tokens_total": "Tokens of chat model calls (input, output, cached input).",
+        }
+        lines, declared = [], set()
+
+        def declare(name, kind):
+            if name not in declared:
+                declared.add(name)
+                lines.append(f"# HELP {name} {help_text[name]}")
+                lines.append(f"# TYPE {name} {kind}")
+
+        for name, labels, samples, total, count in summaries:
+            declare(name, "summary")
+            for q in QUANTILES:
+                lines.append(f"{name}{_labels(labels + (('quantile', str(q)),))} {percentile(samples, q)!r}")
+            lines.append(f"{name}_sum{_labels(labels)} {total!r}")
+            lines.append(f"{name}_count{_labels(labels)} {count}")
+        for (name, labels), value in counters:
+            declare(name, "counter")
+            lines.append(f"{name}{_labels(labels)} {value}")
+        lines.append("# HELP agent_spans_dropped_total Spans not exported because too many were pending.")
+        lines.append("# TYPE agent_spans_dropped_total counter")
+        lines.append(f"agent_spans_dropped_total {dropped}")
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path: str) -> None:
+        """Writes `prometheus_text` to `path` atomically, e.g. for node_exporter's textfile collector."""
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w") as f:
+            f.write(self.prometheus_text())
+        os.replace(tmp, path)
+
+    def serve_prometheus(self, port: int, host: str = "127.0.0.1") -> ThreadingHTTPServer:
+        """Serves `prometheus_text` at http://host:port/metrics from a daemon thread."""
+        telemetry = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = telemetry.prometheus_text().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=server.serve_forever, name="metrics", daemon=True).start()
+        return server
+
+    # spans
+
+    def take_spans(self) -> list:
+        with self._lock:
+            spans, self._spans = list(self._spans), deque()
+        return spans
+
+    @staticmethod
+    def otlp_json(spans: list) -> dict:
+        """`spans` as an OTLP/JSON ExportTraceServiceRequest."""
+        return {"resourceSpans": [{
+            "resource": {"attributes": _otlp_attributes({"service.name": SERVICE_NAME})},
+            "scopeSpans": [{"scope": {"name": __name__}, "spans": [span.to_otlp() for span in spans]}],
+        }]}
+
+    def flush(self) -> None:
+        """Appends the pending spans to `spans_file` and rewrites `metrics_file`."""
+        if self.spans_file:
+            spans = self.take_spans()
+            if spans:
+                with open(self.spans_file, "a") as f:
+                    f.write(json.dumps(self.otlp_json(spans), ensure_ascii=False) + "\n")
+        if self.metrics_file:
+            self.write_prometheus(self.metrics_file)
+
+    def _start_exporter(self) -> None:
+        with self._lock:
+            if self._exporter is not None:
+                return
+            self._exporter = threading.Thread(target=self._export, name="telemetry", daemon=True)
+        self._exporter.start()
+
+    def _export(self) -> None:
+        while not self._stop.wait(self.export_interval):
+            self._export_once()
+
+    def _export_once(self) -> None:
+        try:
+            self.flush()
+        except OSError:
+            # the files may be unwritable for a while, the next round tries again
+            pass
+
+    def close(self) -> None:
+        self._stop.set()
+        self.flush()
+
+
+def _labels(labels: tuple) -> str:
+    def escape(value) -> str:
+        return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+    return "{" + ",".join(f'{key}="{escape(value)}"' for key, value in labels) + "}"
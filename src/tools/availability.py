@@ -0,0 +1,93 @@
+import sqlite3
+from datetime import date, datetime, timedelta
+from typing import Optional, Union
+
+# Reservations live in one table for all bookable items (see schema.TABLES).
+# An item is available for [start, end) if none of its reservations overlaps
+# that range; the checks run inside the INSERT/UPDATE so two concurrent
+# bookings of the same item cannot both succeed.
+
+DateLike = Union[datetime, date, str]
+
+OVERLAP = "r.kind = ? AND r.item_id = {item} AND r.start_date < ? AND r.end_date > ?"
+
+
+def to_day(value: Optional[DateLike]) -> Optional[str]:
+    if value is None or value == "":
+        return None
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value.strip()[:10])
+    if isinstance(value, datetime):
+        value = value.date()
+    return value.isoformat()
+
+
+def date_range(start: Optional[DateLike], end: Optional[DateLike]) -> Optional[tuple[str, str]]:
+    """[start, end) as ISO days; a missing end means one day, None if neither is given."""
+    start, end = to_day(start), to_day(end)
+    if start is None and end is None:
+        return None
+    if start is None:
+        start = (date.fromisoformat(end) - timedelta(days=1)).isoformat()
+    if end is None:
+        end = (date.fromisoformat(start) + timedelta(days=1)).isoformat()
+    if start >= end:
+        raise ValueError(f"The end date {end} must be after the start date {start}.")
+    return start, end
+
+
+def available_filter(kind: str, stay: tuple[str, str]) -> tuple[str, list]:
+    """WHERE clause (and its params) keeping items of `kind` free for `stay`."""
+    clause = f" AND NOT EXISTS (SELECT 1 FROM reservations r WHERE {OVERLAP.format(item=kind + '.id')})"
+    return clause, [kind, stay[1], stay[0]]
+
+
+def reserve(cursor: sqlite3.Cursor, kind: str, item_id: int, stay: tuple[str, str],
+            passenger_id: Optional[str]) -> bool:
+    """Book `item_id` for `stay` unless an existing reservation overlaps it."""
+    cursor.execute(
+        "INSERT INTO reservations (kind, item_id, passenger_id, start_date, end_date)"
+        f" SELECT ?, ?, ?, ?, ? WHERE NOT EXISTS (SELECT 1 FROM reservations r WHERE {OVERLAP.format(item='?')})",
+        (kind, item_id, passenger_id, stay[0], stay[1], kind, item_id, stay[1], stay[0]),
+    )
+    if cursor.rowcount > 0:
+        cursor.execute(f"UPDATE {kind} SET booked = 1 WHERE id = ?", (item_id,))
+        return True
+    return False
+
+
+def find_reservation(cursor: sqlite3.Cursor, kind: str, item_id: int,
+                     passenger_id: Optional[str]) -> Optional[tuple[int, str, str]]:
+    """(id, start, end) of the passenger's latest reservation of `item_id`."""
+    cursor.execute(
+        "SELECT id, start_date, end_date FROM reservations"
+        " WHERE passenger_id IS ? AND kind = ? AND item_id = ? ORDER BY id DESC LIMIT 1",
+        (passenger_id, kind, item_id),
+    )
+    return cursor.fetchone()
+
+
+def reschedule(cursor: sqlite3.Cursor, kind: str, reservation_id: int, item_id: int,
+               stay: tuple[str, str]) -> bool:
+    """Move a reservation to `stay` unless another reservation of the item overlaps it."""
+    cursor.execute(
+        "UPDATE reservations SET start_date = ?, end_date = ? WHERE id = ? AND NOT EXISTS"
+        f" (SELECT 1 FROM reservations r WHERE {OVERLAP.format(item='?')} AND r.id != ?)",
+        (stay[0], stay[1], reservation_id, kind, item_id, stay[1], stay[0], reservation_id),
+    )
+    return cursor.rowcount > 0
+
+
+def release(cursor: sqlite3.Cursor, kind: str, item_id: int, passenger_id: Optional[str]) -> int:
+    """Delete the passenger's reservations of `item_id`; returns how many there were."""
+    cursor.execute(
+        "DELETE FROM reservations WHERE passenger_id IS ? AND kind = ? AND item_id = ?",
+        (passenger_id, kind, item_id),
+    )
+    released = cursor.rowcount
+    cursor.execute(
+        f"UPDATE {kind} SET booked = EXISTS (SELECT 1 FROM reservations r"
+        f" WHERE r.kind = ? AND r.item_id = {kind}.id) WHERE id = ?",
+        (kind, item_id),
+    )
+    return released
@@ -3,11 +3,16 @@ from datetime import date, datetime
 from typing import Optional, Union
 
 from langchain_core.pydantic_v1 import BaseModel, Field
+from langchain_core.runnables import ensure_config
 from langchain_core.tools import tool
 
 from .car_tool_handler import CarToolHandler
+from .formatting import MAX_ROWS, render_capped
+from .registry import handlers
 
-car_tool_handler = CarToolHandler()
+handlers.register("car", CarToolHandler, requires=["database"])
+
+CAR_RENTAL_COLUMNS = ["id", "name", "location", "price_tier"]
 
 class ToBookCarRental(BaseModel):
     """Transfers work to a specialized assistant to handle car rental bookings."""
@@ -39,35 +44,45 @@ def search_car_rentals(
     price_tier: Optional[str] = None,
     start_date: Optional[Union[datetime, date]] = None,
     end_date: Optional[Union[datetime, date]] = None,
-) -> list[dict]:
+) -> str:
     """
     Search for car rentals based on location, name, price tier, start date, and end date. Inputs must be in english!
 
     Args:
         location (Optional[str]): The location of the car rental. Defaults to None.
         name (Optional[str]): The name of the car rental company. Defaults to None.
-        price_tier (Optional[str]): The price tier of the car rental. Defaults to None.
+        price_tier (Optional[str]): The price tier of the car rental. Defaults to None. Examples: Economy, Midscale, Premium, Luxury
         start_date (Optional[Union[datetime, date]]): The start date of the car rental. Defaults to None.
         end_date (Optional[Union[datetime, date]]): The end date of the car rental. Defaults to None.
 
     Returns:
-        list[dict]: A list of car rental dictionaries matching the search criteria.
+        str: A table of the car rentals matching the search criteria, and available from start_date to end_date when given.
     """
-    return car_tool_handler.search_car_rentals(location, name, price_tier, start_date, end_date)
+    rows = handlers.get("car").search_car_rentals(location, name, price_tier, start_date, end_date, MAX_ROWS + 1)
+    return render_capped(rows, CAR_RENTAL_COLUMNS)
 
 
 @tool
-def book_car_rental(rental_id: int) -> str:
+def book_car_rental(
+    rental_id: int,
+    start_date: Optional[Union[datetime, date]] = None,
+    end_date: Optional[Union[datetime, date]] = None,
+) -> str:
     """
-    Book a car rental by its ID. Inputs must be in english!
+    Book a car rental by its ID for the given dates. Inputs must be in english!
 
     Args:
         rental_id (int): The ID of the car rental to book.
+        start_date (Optional[Union[datetime, date]]): The start date of the car rental. Defaults to None.
+        end_date (Optional[Union[datetime, date]]): The end date of the car rental. Defaults to None.
 
     Returns:
         str: A message indicating whether the car rental was successfully booked or not.
     """
-    return car_tool_handler.book_car_rental(rental_id)
+    config = ensure_config()
+    configuration = config.get("configurable", {})
+    passenger_id = configuration.get("passenger_id", None)
+    return handlers.get("car").book_car_rental(rental_id, start_date, end_date, passenger_id)
 
 
 @tool
@@ -87,7 +102,10 @@ def update_car_rental(
     Returns:
         str: A message indicating whether the car rental was successfully updated or not.
     """
-    return car_tool_handler.update_car_rental(rental_id, start_date, end_date)
+    config = ensure_config()
+    configuration = config.get("configurable", {})
+    passenger_id = configuration.get("passenger_id", None)
+    return handlers.get("car").update_car_rental(rental_id, start_date, end_date, passenger_id)
 
 
 @tool
@@ -101,7 +119,10 @@ def cancel_car_rental(rental_id: int) -> str:
     Returns:
         str: A message indicating whether the car rental was successfully cancelled or not.
     """
-    return car_tool_handler.cancel_car_rental(rental_id)
+    config = ensure_config()
+    configuration = config.get("configurable", {})
+    passenger_id = configuration.get("passenger_id", None)
+    return handlers.get("car").cancel_car_rental(rental_id, passenger_id)
 
 def get_car_safe_tools():
     return [search_car_rentals]
@@ -1,11 +1,14 @@
-import sqlite3
 from datetime import date, datetime, timedelta
 from typing import Optional, Union
 
+from .availability import available_filter, date_range, find_reservation, release, reschedule, reserve
+from .db import get_pool
+from .fulltext import TextSearch
+
 class CarToolHandler:
-    def __init__(self) -> None:
-        # TODO add config here to set params
-        self.db = "travel2.sqlite"
+    def __init__(self, db: Optional[str] = None) -> None:
+        self.pool = get_pool(db)
+        self.db = self.pool.db_path
 
     def search_car_rentals(self,
         location: Optional[str] = None,
@@ -13,82 +16,80 @@ class CarToolHandler:
         price_tier: Optional[str] = None,
         start_date: Optional[Union[datetime, date]] = None,
         end_date: Optional[Union[datetime, date]] = None,
+        limit: Optional[int] = None,
     ) -> list[dict]:
-       
-        conn = sqlite3.connect(self.db)
-        cursor = conn.cursor()
-
-        query = "SELECT * FROM car_rentals WHERE 1=1"
-        params = []
 
-        if location:
-            query += " AND location LIKE ?"
-            params.append(f"%{location}%")
-        if name:
-            query += " AND name LIKE ?"
-            params.append(f"%{name}%")
-        # For our tutorial, we will let you match on any dates and price tier.
-        # (since our toy dataset doesn't have much data)
-        cursor.execute(query, params)
-        results = cursor.fetchall()
+        search = TextSearch("car_rentals")
+        search.add("location", location, ranked=False)
+        search.add("name", name)
+        where, params = search.where_clause()
+        query = (f"SELECT car_rentals.id, car_rentals.name, car_rentals.location, car_rentals.price_tier"
+                 f"{search.from_clause()} WHERE 1=1{where}")
 
-        conn.close()
+        if price_tier:
+            query += " AND price_tier = ? COLLATE NOCASE"
+            params.append(price_tier)
+        # only what can still be booked for the requested dates
+        stay = date_range(start_date, end_date)
+        if stay:
+            clause, clause_params = available_filter("car_rentals", stay)
+            query += clause
+            params.extend(clause_params)
+        query += search.order_clause()
+        if limit is not None:
+            query += " LIMIT ?"
+            params.append(limit)
+        with self.pool.cursor() as cursor:
+            cursor.execute(query, params)
+            results = cursor.fetchall()
+            column_names = [column[0] for column in cursor.description]
 
-        return [
-            dict(zip([column[0] for column in cursor.description], row)) for row in results
-        ]
+        return [dict(zip(column_names, row)) for row in results]
     
-    def book_car_rental(self, rental_id: int) -> str:
-        conn = sqlite3.connect(self.db)
-        cursor = conn.cursor()
+    def book_car_rental(self, rental_id: int,
+        start_date: Optional[Union[datetime, date]] = None,
+        end_date: Optional[Union[datetime, date]] = None,
+        passenger_id: Optional[str] = None,
+    ) -> str:
 
-        cursor.execute("UPDATE car_rentals SET booked = 1 WHERE id = ?", (rental_id,))
-        conn.commit()
+        with self.pool.cursor(commit=True) as cursor:
+            cursor.execute("SELECT start_date, end_date FROM car_rentals WHERE id = ?", (rental_id,))
+            item = cursor.fetchone()
+            if not item:
+                return f"No car rental found with ID {rental_id}."
+            # without dates, book the period stored with the rental
+            stay = date_range(start_date, end_date) or date_range(*item)
+            if stay is None:
+                return "Please provide the start_date and end_date."
+            if not reserve(cursor, "car_rentals", rental_id, stay, passenger_id):
+                return f"Car rental {rental_id} is not available from {stay[0]} to {stay[1]}."
 
-        if cursor.rowcount > 0:
-            conn.close()
-            return f"Car rental {rental_id} successfully booked."
-        else:
-            conn.close()
-            return f"No car rental found with ID {rental_id}."
-        
-    def update_car_rental(self, 
+        return f"Car rental {rental_id} successfully booked from {stay[0]} to {stay[1]}."
+
+    def update_car_rental(self,
         rental_id: int,
         start_date: Optional[Union[datetime, date]] = None,
         end_date: Optional[Union[datetime, date]] = None,
+        passenger_id: Optional[str] = None,
     ) -> str:
-        conn = sqlite3.connect(self.db)
-        cursor = conn.cursor()
 
-        if start_date:
-            cursor.execute(
-                "UPDATE car_rentals SET start_date = ? WHERE id = ?",
-                (start_date, rental_id),
-            )
-        if end_date:
-            cursor.execute(
-                "UPDATE car_rentals SET end_date = ? WHERE id = ?", (end_date, rental_id)
-            )
+        with self.pool.cursor(commit=True) as cursor:
+            reservation = find_reservation(cursor, "car_rentals", rental_id, passenger_id)
+            if not reservation:
+                return f"No booking found for car rental {rental_id}."
+            reservation_id, current_start, current_end = reservation
+            stay = date_range(start_date or current_start, end_date or current_end)
+            if not reschedule(cursor, "car_rentals", reservation_id, rental_id, stay):
+                return f"Car rental {rental_id} is not available from {stay[0]} to {stay[1]}."
 
-        conn.commit()
+        return f"Car rental {rental_id} successfully updated."
 
-        if cursor.rowcount > 0:
-            conn.close()
-            return f"Car rental {rental_id} successfully updated."
-        else:
-            conn.close()
-            return f"No car rental found with ID {rental_id}."
-        
-    def cancel_car_rental(self, rental_id: int) -> str:
-        conn = sqlite3.connect(self.db)
-        cursor = conn.cursor()
+    def cancel_car_rental(self, rental_id: int, passenger_id: Optional[str] = None) -> str:
 
-        cursor.execute("UPDATE car_rentals SET booked = 0 WHERE id = ?", (rental_id,))
-        conn.commit()
+        with self.pool.cursor(commit=True) as cursor:
+            updated = release(cursor, "car_rentals", rental_id, passenger_id) > 0
 
-        if cursor.rowcount > 0:
-            conn.close()
+        if updated:
             return f"Car rental {rental_id} successfully cancelled."
         else:
-            conn.close()
-            return f"No car rental found with ID {rental_id}."
\ No newline at end of file
+            return f"No booking found for car rental {rental_id}."
@@ -0,0 +1,206 @@
+import asyncio
+import contextvars
+import functools
+import os
+import shutil
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Any, Callable, Iterator, Optional
+
+from .registry import handlers
+from .schema import ensure_schema, shift_to_present
+
+DEFAULT_DB_PATH = "travel2.sqlite"
+DB_URL = "https://storage.googleapis.com/benchmarks-artifacts/travel-db/travel2.sqlite"
+BLOCKING_POOL_SIZE = int(os.environ.get("BLOCKING_POOL_SIZE", "16"))
+
+
+class ConnectionPool:
+    """Per-thread SQLite connections to one database file.
+
+    Every thread gets its own long-lived connection, so the schema is parsed and
+    the page cache warmed once instead of on every tool call. Connections run in
+    WAL mode with a busy timeout, and keep a cache of prepared statements keyed
+    on the SQL text.
+    """
+
+    def __init__(self, db_path: str = DEFAULT_DB_PATH,
+                 busy_timeout_ms: int = 5000,
+                 cached_statements: int = 256) -> None:
+        self.db_path = db_path
+        self.busy_timeout_ms = busy_timeout_ms
+        self.cached_statements = cached_statements
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        # connections by owning thread; those of exited threads (e.g. the
+        # short-lived executor threads of a sync graph.stream) are closed on
+        # the next connect
+        self._connections: dict[threading.Thread, sqlite3.Connection] = {}
+        self._generation = 0
+        # cursors open in any thread, close_all() refuses to run while there are some
+        self._busy = 0
+
+    @property
+    def generation(self) -> int:
+        """Bumped by close_all(), e.g. when reset_db() replaces the file."""
+        return self._generation
+
+    def connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.generation != self._generation:
+            conn = self._connect()
+        return conn
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(
+            self.db_path,
+            timeout=self.busy_timeout_ms / 1000,
+            cached_statements=self.cached_statements,
+            # connections are only used by the thread that opened them,
+            # close_all() is the single exception
+            check_same_thread=False,
+        )
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(f"PRAGMA busy_timeout={int(self.busy_timeout_ms)}")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        with self._lock:
+            for thread in [t for t in self._connections if not t.is_alive()]:
+                self._connections.pop(thread).close()
+            self._connections[threading.current_thread()] = conn
+            self._local.conn = conn
+            self._local.generation = self._generation
+        return conn
+
+    @contextmanager
+    def cursor(self, commit: bool = False) -> Iterator[sqlite3.Cursor]:
+        """Yield a cursor on this thread's connection.
+
+        With `commit=True` the transaction is committed when the block exits and
+        rolled back if it raises.
+        """
+        with self._lock:
+            self._busy += 1
+        try:
+            conn = self.connection()
+            cursor = conn.cursor()
+            try:
+                yield cursor
+                if commit:
+                    conn.commit()
+            except BaseException:
+                if commit:
+                    conn.rollback()
+                raise
+            finally:
+                cursor.close()
+        finally:
+            with self._lock:
+                self._busy -= 1
+
+    def close_all(self) -> None:
+        """Close every connection; threads reconnect lazily on next use.
+
+        Only call it when the pool is idle (no tool call running, e.g. between
+        two conversations): it raises RuntimeError while a cursor is open in
+        any thread instead of closing a connection under a running statement.
+        """
+        with self._lock:
+            if self._busy:
+                raise RuntimeError(f"close_all() called while {self._busy} cursor(s) of {self.db_path} are open")
+            self._generation += 1
+            connections, self._connections = list(self._connections.values()), {}
+        for conn in connections:
+            try:
+                conn.close()
+            except sqlite3.ProgrammingError:
+                pass
+
+
+_pools: dict[str, ConnectionPool] = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(db_path: Optional[str] = None) -> ConnectionPool:
+    """Return the process-wide pool for `db_path`, creating it on first use."""
+    db_path = db_path or os.environ.get("TRAVEL_DB_PATH", DEFAULT_DB_PATH)
+    key = os.path.abspath(db_path)
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = _pools[key] = ConnectionPool(db_path)
+        return pool
+
+
+def reset_db(db_path: str, backup_file: str) -> None:
+    """Restore `db_path` from `backup_file`.
+
+    Open pooled connections are closed first (the pool must be idle, see
+    ConnectionPool.close_all) and stale WAL/SHM files removed, otherwise
+    SQLite would replay an old log on top of the restored file. The
+    derived columns and indexes are recreated if the backup predates them.
+    """
+    key = os.path.abspath(db_path)
+    with _pools_lock:
+        pool = _pools.get(key)
+    if pool is not None:
+        pool.close_all()
+    for suffix in ("-wal", "-shm"):
+        if os.path.exists(db_path + suffix):
+            os.remove(db_path + suffix)
+    shutil.copy(backup_file, db_path)
+    conn = sqlite3.connect(db_path)
+    try:
+        ensure_schema(conn)
+    finally:
+        conn.close()
+
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def get_blocking_executor() -> ThreadPoolExecutor:
+    """Bounded thread pool the async path uses for blocking SQLite and tool calls."""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=BLOCKING_POOL_SIZE,
+                                               thread_name_prefix="blocking-io")
+    return _executor
+
+
+async def run_blocking(fn: Callable[..., Any], *args, **kwargs) -> Any:
+    """Run `fn` on the blocking pool without blocking the event loop.
+
+    The caller's context is copied so `ensure_config()` still sees the runnable
+    config inside the worker thread.
+    """
+    ctx = contextvars.copy_context()
+    call = functools.partial(ctx.run, fn, *args, **kwargs)
+    return await asyncio.get_running_loop().run_in_executor(get_blocking_executor(), call)
+
+
+def prepare_db(db: Optional[str] = None, db_url: str = DB_URL,
+               overwrite: bool = False) -> ConnectionPool:
+    """Download the travel DB if needed, move it to the present, index it and return its pool."""
+    pool = get_pool(db)
+    if overwrite or not os.path.exists(pool.db_path):
+        import requests
+
+        response = requests.get(db_url)
+        response.raise_for_status()  # Ensure the request was successful
+        with open(pool.db_path, "wb") as f:
+            f.write(response.content)
+        # Backup - we will use this to "reset" our DB in each section
+        shutil.copy(pool.db_path, os.path.splitext(pool.db_path)[0] + ".backup.sqlite")
+    # Convert the flights to present time for our tutorial.
+    # This runs once per DB file, the applied shift is kept in a metadata table
+    shift_to_present(pool.connection())
+    ensure_schema(pool.connection())
+    return pool
+
+
+handlers.register("database", prepare_db)
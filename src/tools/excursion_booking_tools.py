@@ -5,8 +5,12 @@ from langchain_core.pydantic_v1 import BaseModel, Field
 from langchain_core.tools import tool
 
 from .excursion_tool_handler import ExcursionToolHandler
+from .formatting import MAX_ROWS, render_capped
+from .registry import handlers
 
-excursion_tool_handler = ExcursionToolHandler()
+handlers.register("excursion", ExcursionToolHandler, requires=["database"])
+
+TRIP_RECOMMENDATION_COLUMNS = ["id", "name", "location", "keywords", "details", "booked"]
 
 class ToBookExcursion(BaseModel):
     """Transfers work to a specialized assistant to handle trip recommendation and other excursion bookings."""
@@ -31,7 +35,7 @@ def search_trip_recommendations(
     location: Optional[str] = None,
     name: Optional[str] = None,
     keywords: Optional[str] = None,
-) -> list[dict]:
+) -> str:
     """
     Search for trip recommendations based on location, name, and keywords. Args must be in english!
 چستجو برای پیشنهادهایی برای گشت و گذار
@@ -42,9 +46,10 @@ def search_trip_recommendations(
         keywords (Optional[str]): The keywords associated with the trip recommendation. Defaults to None.
 
     Returns:
-        list[dict]: A list of trip recommendation dictionaries matching the search criteria.
+        str: A table of the trip recommendations matching the search criteria.
     """
-    return excursion_tool_handler.search_trip_recommendations(location, name, keywords)
+    rows = handlers.get("excursion").search_trip_recommendations(location, name, keywords, MAX_ROWS + 1)
+    return render_capped(rows, TRIP_RECOMMENDATION_COLUMNS)
 
 
 @tool
@@ -58,7 +63,7 @@ def book_excursion(recommendation_id: int) -> str:
     Returns:
         str: A message indicating whether the trip recommendation was successfully booked or not.
     """
-    return excursion_tool_handler.book_excursion(recommendation_id)
+    return handlers.get("excursion").book_excursion(recommendation_id)
 
 
 @tool
@@ -73,7 +78,7 @@ def update_excursion(recommendation_id: int, details: str) -> str:
     Returns:
         str: A message indicating whether the trip recommendation was successfully updated or not.
     """
-    return excursion_tool_handler.update_excursion(recommendation_id, details)
+    return handlers.get("excursion").update_excursion(recommendation_id, details)
 
 
 @tool
@@ -87,7 +92,7 @@ def cancel_excursion(recommendation_id: int) -> str:
     Returns:
         str: A message indicating whether the trip recommendation was successfully cancelled or not.
     """
-    return excursion_tool_handler.cancel_excursion(recommendation_id)
+    return handlers.get("excursion").cancel_excursion(recommendation_id)
 
 def get_excursion_safe_tools():
     return [search_trip_recommendations]
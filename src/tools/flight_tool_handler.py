@@ -1,13 +1,30 @@
-import sqlite3
+import threading
 from datetime import date, datetime, timedelta
 from typing import Optional
 
 import pytz
 
+from .db import get_pool
+from .policy_cache import LRUCache
+from .schema import to_epoch
+
+FLIGHT_COLUMNS = ("flight_id, flight_no, scheduled_departure, scheduled_arrival, departure_airport,"
+                  " arrival_airport, status, aircraft_code, actual_departure, actual_arrival,"
+                  " scheduled_departure_epoch")
+
 class FlightToolHandler:
-    def __init__(self) -> None:
-        # TODO add config here to set params
-        self.db = "travel2.sqlite"
+    def __init__(self, db: Optional[str] = None,
+                 user_info_cache_size: int = 10000,
+                 user_info_ttl: Optional[float] = 3600) -> None:
+        self.pool = get_pool(db)
+        self.db = self.pool.db_path
+        # fetch_user_flight_information runs on every user message, but its
+        # result only changes through update_ticket_to_new_flight/cancel_ticket,
+        # which drop the passenger's entry. The TTL bounds staleness from
+        # writes made outside this process.
+        self.user_info_cache = LRUCache(max_entries=user_info_cache_size, ttl=user_info_ttl)
+        self._user_info_lock = threading.Lock()
+        self.user_info_queries = 0
 
     def fetch_user_flight_information(self, passenger_id) -> list[dict]:
         # config = ensure_config()  # Fetch from the context
@@ -16,8 +33,11 @@ class FlightToolHandler:
         if not passenger_id:
             raise ValueError("No passenger ID configured.")
 
-        conn = sqlite3.connect(self.db)
-        cursor = conn.cursor()
+        key = (passenger_id, self.pool.generation)
+        with self._user_info_lock:
+            cached = self.user_info_cache.get(key)
+        if cached is not None:
+            return list(cached)
 
         query = """
         SELECT 
@@ -32,27 +52,40 @@ class FlightToolHandler:
         WHERE 
             t.passenger_id = ?
         """
-        cursor.execute(query, (passenger_id,))
-        rows = cursor.fetchall()
-        column_names = [column[0] for column in cursor.description]
+        with self.pool.cursor() as cursor:
+            cursor.execute(query, (passenger_id,))
+            rows = cursor.fetchall()
+            column_names = [column[0] for column in cursor.description]
         results = [dict(zip(column_names, row)) for row in rows]
 
-        cursor.close()
-        conn.close()
+        with self._user_info_lock:
+            self.user_info_queries += 1
+            self.user_info_cache.put(key, results)
+        return list(results)
+
+    def invalidate_user_info(self, passenger_id) -> None:
+        with self._user_info_lock:
+            self.user_info_cache.pop((passenger_id, self.pool.generation))
 
-        return results
+    def user_info_stats(self) -> dict:
+        with self._user_info_lock:
+            return {"queries": self.user_info_queries, **self.user_info_cache.stats()}
     
     def search_flights(self, departure_airport: Optional[str] = None,
                        arrival_airport: Optional[str] = None,
-                       start_time: Optional[date | datetime] = None,
-                       end_time: Optional[date | datetime] = None,
+                       start_time: Optional[date | datetime | str] = None,
+                       end_time: Optional[date | datetime | str] = None,
                        limit: int = 20,
-                       ) -> list[dict]:
-       
-        conn = sqlite3.connect(self.db)
-        cursor = conn.cursor()
-
-        query = "SELECT * FROM flights WHERE 1 = 1"
+                       cursor: Optional[str] = None,
+                       ) -> dict:
+        """One page of flights ordered by departure, and the cursor of the next.
+
+        The cursor is the (departure, flight_id) of the last row, so a page
+        starts with an index seek right after it instead of skipping the rows
+        of earlier pages. It is None on the last page. Flights without a
+        departure time have no place in that order and are not listed.
+        """
+        query = f"SELECT {FLIGHT_COLUMNS} FROM flights WHERE scheduled_departure_epoch IS NOT NULL"
         params = []
 
         if departure_airport:
@@ -64,117 +97,112 @@ class FlightToolHandler:
             params.append(arrival_airport)
 
         if start_time:
-            query += " AND scheduled_departure >= ?"
-            params.append(start_time)
+            query += " AND scheduled_departure_epoch >= ?"
+            params.append(to_epoch(start_time))
 
         if end_time:
-            query += " AND scheduled_departure <= ?"
-            params.append(end_time)
-        query += " LIMIT ?"
-        params.append(limit)
-        cursor.execute(query, params)
-        rows = cursor.fetchall()
-        column_names = [column[0] for column in cursor.description]
-        results = [dict(zip(column_names, row)) for row in rows]
-
-        cursor.close()
-        conn.close()
-
-        return results
+            query += " AND scheduled_departure_epoch <= ?"
+            params.append(to_epoch(end_time))
+
+        if cursor:
+            try:
+                after_epoch, after_id = cursor.split(":")
+                params.extend([float(after_epoch), int(after_id)])
+            except ValueError:
+                raise ValueError(f"Invalid cursor {cursor!r}, pass next_cursor from the previous page.") from None
+            query += " AND (scheduled_departure_epoch, flight_id) > (?, ?)"
+        # one extra row tells whether there is a next page
+        query += " ORDER BY scheduled_departure_epoch, flight_id LIMIT ?"
+        params.append(limit + 1)
+        with self.pool.cursor() as db_cursor:
+            db_cursor.execute(query, params)
+            rows = db_cursor.fetchall()
+            column_names = [column[0] for column in db_cursor.description]
+        results = [dict(zip(column_names, row)) for row in rows[:limit]]
+
+        next_cursor = None
+        if len(rows) > limit and results:
+            next_cursor = f"{results[-1]['scheduled_departure_epoch']!r}:{results[-1]['flight_id']}"
+        for row in results:
+            del row["scheduled_departure_epoch"]
+        return {"flights": results, "next_cursor": next_cursor}
     
     def update_ticket_to_new_flight(self, ticket_no: str, new_flight_id: int, passenger_id) -> str:
         if not passenger_id:
             raise ValueError("No passenger ID configured.")
 
-        conn = sqlite3.connect(self.db)
-        cursor = conn.cursor()
-
-        cursor.execute(
-            "SELECT departure_airport, arrival_airport, scheduled_departure FROM flights WHERE flight_id = ?",
-            (new_flight_id,),
-        )
-        new_flight = cursor.fetchone()
-        if not new_flight:
-            cursor.close()
-            conn.close()
-            return "Invalid new flight ID provided."
-        column_names = [column[0] for column in cursor.description]
-        new_flight_dict = dict(zip(column_names, new_flight))
-        timezone = pytz.timezone("Etc/GMT-3")
-        current_time = datetime.now(tz=timezone)
-        departure_time = datetime.strptime(
-            new_flight_dict["scheduled_departure"], "%Y-%m-%d %H:%M:%S.%f%z"
-        )   
-        time_until = (departure_time - current_time).total_seconds()
-        if time_until < (3 * 3600):
-            return f"Not permitted to reschedule to a flight that is less than 3 hours from the current time. Selected flight is at {departure_time}."
-
-        cursor.execute(
-            "SELECT flight_id FROM ticket_flights WHERE ticket_no = ?", (ticket_no,)
-        )
-        current_flight = cursor.fetchone()
-        if not current_flight:
-            cursor.close()
-            conn.close()
-            return "No existing ticket found for the given ticket number."
-
-        # Check the signed-in user actually has this ticket
-        cursor.execute(
-            "SELECT * FROM tickets WHERE ticket_no = ? AND passenger_id = ?",
-            (ticket_no, passenger_id),
-        )
-        current_ticket = cursor.fetchone()
-        if not current_ticket:
-            cursor.close()
-            conn.close()
-            return f"Current signed-in passenger with ID {passenger_id} not the owner of ticket {ticket_no}"
-
-        # In a real application, you'd likely add additional checks here to enforce business logic,
-        # like "does the new departure airport match the current ticket", etc.
-        # While it's best to try to be *proactive* in 'type-hinting' policies to the LLM
-    # it's inevitably going to get things wrong, so you **also** need to ensure your
-        # API enforces valid behavior
-        cursor.execute(
-            "UPDATE ticket_flights SET flight_id = ? WHERE ticket_no = ?",
-            (new_flight_id, ticket_no),
-        )
-        conn.commit()
-
-        cursor.close()
-        conn.close()
+        with self.pool.cursor(commit=True) as cursor:
+            cursor.execute(
+                "SELECT departure_airport, arrival_airport, scheduled_departure FROM flights WHERE flight_id = ?",
+                (new_flight_id,),
+            )
+            new_flight = cursor.fetchone()
+            if not new_flight:
+                return "Invalid new flight ID provided."
+            column_names = [column[0] for column in cursor.description]
+            new_flight_dict = dict(zip(column_names, new_flight))
+            timezone = pytz.timezone("Etc/GMT-3")
+            current_time = datetime.now(tz=timezone)
+            departure_time = datetime.strptime(
+                new_flight_dict["scheduled_departure"], "%Y-%m-%d %H:%M:%S.%f%z"
+            )   
+            time_until = (departure_time - current_time).total_seconds()
+            if time_until < (3 * 3600):
+                return f"Not permitted to reschedule to a flight that is less than 3 hours from the current time. Selected flight is at {departure_time}."
+
+            cursor.execute(
+                "SELECT flight_id FROM ticket_flights WHERE ticket_no = ?", (ticket_no,)
+            )
+            current_flight = cursor.fetchone()
+            if not current_flight:
+                return "No existing ticket found for the given ticket number."
+
+            # Check the signed-in user actually has this ticket
+            cursor.execute(
+                "SELECT * FROM tickets WHERE ticket_no = ? AND passenger_id = ?",
+                (ticket_no, passenger_id),
+            )
+            current_ticket = cursor.fetchone()
+            if not current_ticket:
+                return f"Current signed-in passenger with ID {passenger_id} not the owner of ticket {ticket_no}"
+
+            # In a real application, you'd likely add additional checks here to enforce business logic,
+            # like "does the new departure airport match the current ticket", etc.
+            # While it's best to try to be *proactive* in 'type-hinting' policies to the LLM
+            # it's inevitably going to get things wrong, so you **also** need to ensure your
+            # API enforces valid behavior
+            cursor.execute(
+                "UPDATE ticket_flights SET flight_id = ? WHERE ticket_no = ?",
+                (new_flight_id, ticket_no),
+            )
+
+        self.invalidate_user_info(passenger_id)
         return "Ticket successfully updated to new flight."
 
     def cancel_ticket(self, ticket_no: str, passenger_id) -> str:
         """Cancel the user's ticket and remove it from the database."""
         if not passenger_id:
             raise ValueError("No passenger ID configured.")
-        conn = sqlite3.connect(self.db)
-        cursor = conn.cursor()
-
-        cursor.execute(
-            "SELECT flight_id FROM ticket_flights WHERE ticket_no = ?", (ticket_no,)
-        )
-        existing_ticket = cursor.fetchone()
-        if not existing_ticket:
-            cursor.close()
-            conn.close()
-            return "No existing ticket found for the given ticket number."
-
-        # Check the signed-in user actually has this ticket
-        cursor.execute(
-            "SELECT flight_id FROM tickets WHERE ticket_no = ? AND passenger_id = ?",
-            (ticket_no, passenger_id),
-        )
-        current_ticket = cursor.fetchone()
-        if not current_ticket:
-            cursor.close()
-            conn.close()
-            return f"Current signed-in passenger with ID {passenger_id} not the owner of ticket {ticket_no}"
-
-        cursor.execute("DELETE FROM ticket_flights WHERE ticket_no = ?", (ticket_no,))
-        conn.commit()
-
-        cursor.close()
-        conn.close()
+
+        with self.pool.cursor(commit=True) as cursor:
+            cursor.execute(
+                "SELECT flight_id FROM ticket_flights WHERE ticket_no = ?", (ticket_no,)
+            )
+            existing_ticket = cursor.fetchone()
+            if not existing_ticket:
+                return "No existing ticket found for the given ticket number."
+
+            # Check the signed-in user actually has this ticket
+            cursor.execute(
+                "SELECT ticket_no FROM tickets WHERE ticket_no = ? AND passenger_id = ?",
+                (ticket_no, passenger_id),
+            )
+            current_ticket = cursor.fetchone()
+            if not current_ticket:
+                return f"Current signed-in passenger with ID {passenger_id} not the owner of ticket {ticket_no}"
+
+            cursor.execute("DELETE FROM ticket_flights WHERE ticket_no = ?", (ticket_no,))
+
+        self.invalidate_user_info(passenger_id)
         return "Ticket successfully cancelled."
-    
\ No newline at end of file
+    
@@ -9,8 +9,16 @@ from langchain_core.pydantic_v1 import BaseModel, Field
 from langchain_core.tools import tool
 
 from .flight_tool_handler import FlightToolHandler
+from .formatting import render_table
+from .registry import handlers
 
-flight_tool_handler = FlightToolHandler()
+handlers.register("flight", FlightToolHandler, requires=["database"])
+
+USER_FLIGHT_COLUMNS = ["ticket_no", "book_ref", "flight_id", "flight_no", "departure_airport", "arrival_airport",
+                       "scheduled_departure", "scheduled_arrival", "seat_no", "fare_conditions"]
+MAX_FLIGHT_PAGE = 50
+SEARCH_FLIGHT_COLUMNS = ["flight_id", "flight_no", "departure_airport", "arrival_airport",
+                         "scheduled_departure", "scheduled_arrival", "status"]
 
 class ToFlightBookingAssistant(BaseModel):
     """Transfers work to a specialized assistant to handle flight updates and cancellations."""
@@ -20,18 +28,19 @@ class ToFlightBookingAssistant(BaseModel):
     )
 
 @tool
-def fetch_user_flight_information() -> list[dict]:
+def fetch_user_flight_information() -> str:
     """Fetch all tickets for the user along with corresponding flight information and seat assignments.Args must be in english!
 
     Returns:
-        A list of dictionaries where each dictionary contains the ticket details,
+        A table with one row per ticket and flight: the ticket details,
         associated flight details, and the seat assignments for each ticket belonging to the user.
     """
     config = ensure_config()  # Fetch from the context
     configuration = config.get("configurable", {})
     passenger_id = configuration.get("passenger_id", None)
 
-    return flight_tool_handler.fetch_user_flight_information(passenger_id)
+    rows = handlers.get("flight").fetch_user_flight_information(passenger_id)
+    return render_table(rows, USER_FLIGHT_COLUMNS, empty="The user has no booked flights.")
 
 
 @tool
@@ -41,10 +50,15 @@ def search_flights(
     start_time: Optional[date | datetime] = None,
     end_time: Optional[date | datetime] = None,
     limit: int = 20,
-) -> list[dict]:
-    """Search for flights based on departure airport, arrival airport, and departure time range. Args must be in english!"""
+    cursor: Optional[str] = None,
+) -> str:
+    """Search for flights based on departure airport, arrival airport, and departure time range. Args must be in english!
+    Flights are ordered by departure time. To get the next page, call again with the same filters and cursor set to the next_cursor of the previous result."""
 
-    return flight_tool_handler.search_flights(departure_airport,arrival_airport,start_time,end_time,limit)
+    limit = max(1, min(limit, MAX_FLIGHT_PAGE))
+    page = handlers.get("flight").search_flights(departure_airport,arrival_airport,start_time,end_time,limit,cursor)
+    more = page["next_cursor"] and f"(more flights: call again with cursor={page['next_cursor']})"
+    return render_table(page["flights"], SEARCH_FLIGHT_COLUMNS, more, empty="No flights found.")
 
 
 @tool
@@ -53,7 +67,7 @@ def update_ticket_to_new_flight(ticket_no: str, new_flight_id: int) -> str:
     config = ensure_config()
     configuration = config.get("configurable", {})
     passenger_id = configuration.get("passenger_id", None)
-    return flight_tool_handler.update_ticket_to_new_flight(ticket_no, new_flight_id, passenger_id)
+    return handlers.get("flight").update_ticket_to_new_flight(ticket_no, new_flight_id, passenger_id)
 
 
 @tool
@@ -62,7 +76,7 @@ def cancel_ticket(ticket_no: str) -> str:
     config = ensure_config()
     configuration = config.get("configurable", {})
     passenger_id = configuration.get("passenger_id", None)
-    return flight_tool_handler.cancel_ticket(ticket_no, passenger_id)
+    return handlers.get("flight").cancel_ticket(ticket_no, passenger_id)
 
 def get_flight_safe_tools():
     return [search_flights]
@@ -0,0 +1,45 @@
+import re
+from typing import Any, Iterable, Optional, Sequence
+
+# Tool results stay in the message history and are sent to the LLM again on
+# every later call, so the search tools render them as a table: the header
+# once, then one `|`-separated line per row, instead of a JSON object per row.
+
+# rows a search tool returns at most, the rest is announced by a last line
+MAX_ROWS = 20
+
+TIMESTAMP = re.compile(r"^(\d{4}-\d{2}-\d{2})[ T](\d{2}:\d{2}):\d{2}(?:\.\d+)?\s?([+-]\d{2}:?\d{2}|Z)?$")
+
+
+def compact_value(value: Any) -> str:
+    """A cell: timestamps to the minute, no separators or line breaks inside."""
+    if value is None or value == "\\N":
+        return ""
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    text = str(value)
+    match = TIMESTAMP.match(text)
+    if match:
+        day, minute, offset = match.groups()
+        return f"{day} {minute}{offset or ''}"
+    return text.replace("|", "/").replace("\n", " ")
+
+
+def render_table(rows: Sequence[dict], columns: Optional[Iterable[str]] = None,
+                 more: Optional[str] = None, empty: str = "No results found.") -> str:
+    """`rows` projected on `columns`, with `more` appended as a last line when set."""
+    if not rows:
+        return empty
+    columns = list(columns) if columns is not None else list(rows[0])
+    lines = ["|".join(columns)]
+    lines += ["|".join(compact_value(row.get(column)) for column in columns) for row in rows]
+    if more:
+        lines.append(more)
+    return "\n".join(lines)
+
+
+def render_capped(rows: Sequence[dict], columns: Iterable[str], max_rows: int = MAX_ROWS,
+                  hint: str = "narrow the search to see them") -> str:
+    """Like render_table, for rows fetched with a limit of `max_rows + 1`."""
+    more = f"(more than {max_rows} results, {hint})" if len(rows) > max_rows else None
+    return render_table(rows[:max_rows], columns, more)
@@ -0,0 +1,77 @@
+import re
+from typing import Optional
+
+# Name, location and keyword searches go through FTS5 tables kept next to the
+# inventory tables (see schema.FTS_TABLES): `<table>_fts`, whose rowid is the
+# item id. Words are stemmed, so "museums" finds "museum". The last word of a
+# name matches as a prefix, so "Hil" finds Hilton, and name searches are
+# ordered by BM25 rank. Locations and keywords only filter, on whole words: a
+# prefix or a rank over a term as common as a city or a tag costs a pass over
+# every row that has it.
+
+WORD = re.compile(r"\w+", re.UNICODE)
+
+
+def phrase(text: str, prefix: bool = True) -> Optional[str]:
+    """`text` as an FTS5 phrase, None if it has no word characters."""
+    words = WORD.findall(text.lower())
+    if not words:
+        return None
+    return '"' + " ".join(words) + ('" *' if prefix else '"')
+
+
+class TextSearch:
+    """FTS5 match over some columns of `table`, with a LIKE fallback.
+
+    `add(column, text)` requires the words of `text` in that column, with
+    `ranked=False` as whole words and without affecting the order.
+    `add_any(column, texts)` filters on any of the comma-separated `texts`. A value
+    without word characters (e.g. "%") cannot be matched by FTS5 and is
+    compared with LIKE instead, as the searches did before.
+    """
+
+    def __init__(self, table: str) -> None:
+        self.table = table
+        self.fts_table = table + "_fts"
+        self.terms: list[str] = []
+        self.like_clauses: list[str] = []
+        self.like_params: list[str] = []
+        self.ranked = False
+
+    def add(self, column: str, text: Optional[str], ranked: bool = True) -> None:
+        if not text:
+            return
+        term = phrase(text, prefix=ranked)
+        if term:
+            self.terms.append(f"{column} : ({term})")
+            self.ranked = self.ranked or ranked
+        else:
+            self.like_clauses.append(f"{self.table}.{column} LIKE ?")
+            self.like_params.append(f"%{text}%")
+
+    def add_any(self, column: str, texts: Optional[str]) -> None:
+        if not texts:
+            return
+        terms = [term for term in (phrase(text, prefix=False) for text in texts.split(",")) if term]
+        if terms:
+            self.terms.append(f"{column} : ({' OR '.join(terms)})")
+        else:
+            self.like_clauses.append(f"{self.table}.{column} LIKE ?")
+            self.like_params.append(f"%{texts.strip()}%")
+
+    def from_clause(self) -> str:
+        if not self.terms:
+            return f" FROM {self.table}"
+        return f" FROM {self.fts_table} JOIN {self.table} ON {self.table}.id = {self.fts_table}.rowid"
+
+    def where_clause(self) -> tuple[str, list]:
+        clause, params = "", []
+        if self.terms:
+            clause += f" AND {self.fts_table} MATCH ?"
+            params.append(" AND ".join(self.terms))
+        for like in self.like_clauses:
+            clause += f" AND {like}"
+        return clause, params + self.like_params
+
+    def order_clause(self) -> str:
+        return f" ORDER BY {self.fts_table}.rank" if self.ranked else ""
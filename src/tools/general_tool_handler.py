@@ -1,115 +1,193 @@
+import json
 import os
-import shutil
-import sqlite3
-import re
-
-import pandas as pd
-import requests
+import threading
+from typing import Optional
 
 from langchain_community.vectorstores import Chroma
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.chat_models import BaseChatModel
 from langchain_openai import OpenAIEmbeddings
 from langchain_openai import ChatOpenAI
 
+from .db import DB_URL, get_pool, prepare_db
+from .policy_cache import PolicyCache
+from .policy_index import BM25Index, fuse_scores, has_persian, section_hash, split_policy_sections
 from .prompts import get_translate_prompt
 
 class GeneralToolHandler:
-    def __init__(self) -> None:
+    def __init__(self, db: Optional[str] = None,
+                 policy_cache_path: Optional[str] = None,
+                 retrieval_mode: str = "vector",
+                 llm: Optional[BaseChatModel] = None,
+                 embeddings: Optional[Embeddings] = None,
+                 chroma_persist_dir: Optional[str] = None) -> None:
         # TODO add a config class to load all these configurations
         self.model_name = 'gpt-3.5-turbo-0125'
-        self.llm = ChatOpenAI(model=self.model_name)
+        self.llm = llm if llm is not None else ChatOpenAI(model=self.model_name)
         translate_prompt = get_translate_prompt()
         self.translator = translate_prompt | self.llm
         self.k = 2
-        self.embeddings = OpenAIEmbeddings(model="text-embedding-3-large")
-        self.db_url = "https://storage.googleapis.com/benchmarks-artifacts/travel-db/travel2.sqlite"
-        self.local_file = "travel2.sqlite"
-        self.backup_file = "travel2.backup.sqlite"
+        # "vector": translate + Chroma, "bm25": local lexical index only,
+        # "hybrid": BM25 and Chroma scores fused
+        if retrieval_mode not in ("vector", "bm25", "hybrid"):
+            raise ValueError(f"Unknown retrieval mode {retrieval_mode!r}.")
+        self.retrieval_mode = retrieval_mode
+        self.hybrid_alpha = 0.5
+        self.embedding_batch_size = 64
+        self.embeddings = embeddings
+        if self.embeddings is None and retrieval_mode != "bm25":
+            self.embeddings = OpenAIEmbeddings(model="text-embedding-3-large")
+        self.db_url = DB_URL
+        self.pool = get_pool(db)
+        self.local_file = self.pool.db_path
+        self.backup_file = os.path.splitext(self.local_file)[0] + ".backup.sqlite"
         self.policy_file = "files/alibaba.md"
-        self.chroma_persist_dir = 'files/chroma/'
+        # a different embedding model needs its own collection directory
+        self.chroma_persist_dir = chroma_persist_dir or 'files/chroma/'
         self.chroma_collection_name = 'policy'
+        # translations and retrieved sections, optionally persisted across restarts
+        self.cache = PolicyCache(self.policy_file, persist_path=policy_cache_path)
+        # tool calls run concurrently on the blocking pool; only one of them
+        # may rebuild the indexes after an edit, or sections get added twice
+        self._policy_lock = threading.Lock()
         self.init_db()
+        self._init_lexical_index()
         self._init_retriever()
 
     def init_db(self):
-        overwrite = False
-        if overwrite or not os.path.exists(self.local_file):
-            response = requests.get(self.db_url)
-            response.raise_for_status()  # Ensure the request was successful
-            with open(self.local_file, "wb") as f:
-                f.write(response.content)
-            # Backup - we will use this to "reset" our DB in each section
-            shutil.copy(self.local_file, self.backup_file)
-        # Convert the flights to present time for our tutorial
-        conn = sqlite3.connect(self.local_file)
-        cursor = conn.cursor()
-
-        tables = pd.read_sql(
-            "SELECT name FROM sqlite_master WHERE type='table';", conn
-        ).name.tolist()
-        tdf = {}
-        for t in tables:
-            tdf[t] = pd.read_sql(f"SELECT * from {t}", conn)
-
-        example_time = pd.to_datetime(
-            tdf["flights"]["actual_departure"].replace("\\N", pd.NaT)
-        ).max()
-        current_time = pd.to_datetime("now").tz_localize(example_time.tz)
-        time_diff = current_time - example_time
-
-        tdf["bookings"]["book_date"] = (
-            pd.to_datetime(tdf["bookings"]["book_date"].replace("\\N", pd.NaT), utc=True)
-            + time_diff
-        )
-
-        datetime_columns = [
-            "scheduled_departure",
-            "scheduled_arrival",
-            "actual_departure",
-            "actual_arrival",
-        ]
-        for column in datetime_columns:
-            tdf["flights"][column] = (
-                pd.to_datetime(tdf["flights"][column].replace("\\N", pd.NaT)) + time_diff
-            )
-
-        for table_name, df in tdf.items():
-            df.to_sql(table_name, conn, if_exists="replace", index=False)
-        del df
-        del tdf
-        conn.commit()
-        conn.close()
-
+        prepare_db(self.local_file, self.db_url)
         self.db = self.local_file  # We'll be using this local file as our DB in this tutorial
 
 
-    def _init_retriever(self):
-        if self._vector_db_initiated_before():
-            self.vector_db = Chroma(collection_name=self.chroma_collection_name, 
-                                    persist_directory=self.chroma_persist_dir, 
-                                    embedding_function=self.embeddings)
-        else:
-            # create the vector db and add embeddings
-            with open(self.policy_file, 'r') as f:
-                faq_text = f.read()
+    def _init_lexical_index(self):
+        with open(self.policy_file, 'r') as f:
+            self.policy_sections = split_policy_sections(f.read())
+        self._section_ids = {text: i for i, text in enumerate(self.policy_sections)}
+        self.lexical_index = BM25Index(self.policy_sections)
+        self._lexical_digest = self.cache.fingerprint.current()
 
-            # docs = [{"page_content": txt} for txt in re.split(r"(?=\n##)", faq_text)]
-            texts = re.split(r"(?=\n##)", faq_text)
+    def _refresh_policy(self):
+        # picks up edits to the policy file without a restart
+        with self._policy_lock:
+            if self.cache.fingerprint.current() != self._lexical_digest:
+                self._init_lexical_index()
+                if self.vector_db is not None:
+                    self._sync_vector_db()
 
-            self.vector_db = Chroma.from_texts(texts=texts,
-                                              embedding=self.embeddings, 
-                                              persist_directory=self.chroma_persist_dir, 
-                                              collection_name=self.chroma_collection_name)
-        # self.retriever = self.vector_db.as_retriever()
+    def _init_retriever(self):
+        # bm25 needs neither Chroma nor the embeddings API, not even to start
+        if self.retrieval_mode == "bm25":
+            self.vector_db = None
+            return
+        self.vector_db = Chroma(collection_name=self.chroma_collection_name,
+                                persist_directory=self.chroma_persist_dir,
+                                embedding_function=self.embeddings)
+        self._sync_vector_db()
 
     def _vector_db_initiated_before(self):
-        # TODO a better checking method
         db_file_path = os.path.join(self.chroma_persist_dir,"chroma.sqlite3")
         return os.path.exists(db_file_path)
-    
+
+    def _manifest_path(self):
+        return os.path.join(self.chroma_persist_dir, "manifest.json")
+
+    def _load_manifest(self) -> Optional[dict]:
+        if not self._vector_db_initiated_before() or not os.path.exists(self._manifest_path()):
+            return None
+        with open(self._manifest_path()) as f:
+            manifest = json.load(f)
+        if manifest.get("collection") != self.chroma_collection_name:
+            return None
+        return manifest
+
+    def _sync_vector_db(self):
+        """Bring the Chroma collection in line with the policy sections.
+
+        Sections are stored under the hash of their content, listed in a manifest
+        next to the collection. Only new or edited sections are embedded, in
+        batches, and removed ones are deleted. When the file digest matches the
+        manifest nothing is read from the collection at all.
+        """
+        digest = self.cache.fingerprint.current()
+        manifest = self._load_manifest()
+        if manifest is not None and manifest.get("policy_digest") == digest:
+            return
+
+        sections = {section_hash(text): text for text in self.policy_sections}
+        if manifest is not None:
+            stored = manifest["sections"]
+        else:
+            # collection written without a manifest (or not at all): reuse whatever
+            # embeddings already match a section instead of re-embedding everything
+            stored = {}
+            existing = self.vector_db.get(include=["documents"])
+            duplicates = []
+            for doc_id, text in zip(existing["ids"], existing["documents"]):
+                key = section_hash(text)
+                if key in stored:
+                    duplicates.append(doc_id)
+                else:
+                    stored[key] = doc_id
+            if duplicates:
+                self.vector_db.delete(ids=duplicates)
+
+        removed = [doc_id for key, doc_id in stored.items() if key not in sections]
+        if removed:
+            self.vector_db.delete(ids=removed)
+        added = [key for key in sections if key not in stored]
+        for start in range(0, len(added), self.embedding_batch_size):
+            batch = added[start:start + self.embedding_batch_size]
+            self.vector_db.add_texts(texts=[sections[key] for key in batch],
+                                     metadatas=[{"section_hash": key} for key in batch],
+                                     ids=batch)
+
+        manifest = {
+            "collection": self.chroma_collection_name,
+            "policy_digest": digest,
+            "sections": {key: stored.get(key, key) for key in sections},
+        }
+        with open(self._manifest_path(), "w") as f:
+            json.dump(manifest, f, indent=1)
+
+    def _translate(self, query: str) -> str:
+        translated = self.cache.get_translation(query)
+        if translated is None:
+            translated = self.translator.invoke({'query':query}).content
+            self.cache.put_translation(query, translated)
+        return translated
+
+    def _retrieve(self, query: str) -> list[str]:
+        if self.retrieval_mode == "vector":
+            retriever = self.vector_db.as_retriever(search_kwargs={"k": self.k})
+            return [d.page_content for d in retriever.invoke(query)]
+
+        index = self.lexical_index
+        if self.retrieval_mode == "bm25":
+            return [index.documents[i] for i, _ in index.search(query, self.k)]
+
+        fetch_k = min(len(index.documents), 4 * self.k)
+        vector_scores = {}
+        for doc, score in self.vector_db.similarity_search_with_relevance_scores(query, k=fetch_k):
+            doc_id = self._section_ids.get(doc.page_content)
+            if doc_id is not None:
+                vector_scores[doc_id] = score
+        fused = fuse_scores(index.scores(query), vector_scores, alpha=self.hybrid_alpha)
+        ranked = sorted(fused, key=fused.get, reverse=True)[:self.k]
+        return [index.documents[i] for i in ranked]
+
     def lookup_policy(self, query: str):
-        query = self.translator.invoke({'query':query}).content
+        self._refresh_policy()
+        # the policy is Persian, so the assistant passes Persian questions in
+        # the user's words and only other languages go through the translator,
+        # in bm25 mode too: the lexical index only matches Persian words
+        if has_persian(query):
+            translated = query
+        else:
+            translated = self._translate(query)
 
-        retriever = self.vector_db.as_retriever(search_kwargs={"k": self.k})
-        docs = retriever.invoke(query)
+        sections = self.cache.get_sections(translated, self.k, self.retrieval_mode)
+        if sections is None:
+            sections = self._retrieve(translated)
+            self.cache.put_sections(translated, self.k, sections, self.retrieval_mode)
 
-        return '\n\n'.join(d.page_content for d in docs)
\ No newline at end of file
+        return '\n\n'.join(sections)
@@ -1,28 +1,41 @@
+import functools
+from typing import Callable, Iterable, Optional
+
 from langchain_core.tools import tool
-from langchain_core.runnables import RunnableLambda
 from langgraph.prebuilt import ToolNode
-from langchain_core.messages import ToolMessage
-from langchain_community.tools.tavily_search import TavilySearchResults
+from langgraph.utils import RunnableCallable
+from langchain_core.messages import AIMessage, ToolMessage
+from langchain_core.runnables import RunnableConfig
 
-from .general_tool_handler import GeneralToolHandler
+from ..models.state import pending_tool_calls
+from .db import run_blocking
+from .registry import handlers
 from .flight_tools import search_flights
 
-general_tool_handler = GeneralToolHandler()
+def _build_general_tool_handler(**kwargs):
+    # imported here: building it pulls in the OpenAI and Chroma clients
+    from .general_tool_handler import GeneralToolHandler
+    return GeneralToolHandler(**kwargs)
+
+handlers.register("general", _build_general_tool_handler, requires=["database"])
 
 @tool
 def lookup_policy(query: str) -> str:
     """Consult the company policies to check whether certain options are permitted.
-    Use this before making any flight changes performing other 'write' events."""
+    Use this before making any flight changes performing other 'write' events.
+    Unlike the other tools, pass the customer's question in their own words and language."""
 
-    return general_tool_handler.lookup_policy(query)
+    return handlers.get("general").lookup_policy(query)
 
 def get_primary_assistant_tools():
+    from langchain_community.tools.tavily_search import TavilySearchResults
     return [TavilySearchResults(max_results=1), search_flights, lookup_policy,]
 
 
-def handle_tool_error(state) -> dict:
+def handle_tool_error(state, owns: Optional[Callable[[dict], bool]] = None) -> dict:
+    # only the calls of the failing node; the others belong to nodes still to run
     error = state.get("error")
-    tool_calls = state["messages"][-1].tool_calls
+    tool_calls = [tc for tc in pending_tool_calls(state["messages"]) if owns is None or owns(tc)]
     return {
         "messages": [
             ToolMessage(
@@ -34,8 +47,66 @@ def handle_tool_error(state) -> dict:
     }
 
 
-def create_tool_node_with_fallback(tools: list) -> dict:
-    return ToolNode(tools).with_fallbacks(
-        [RunnableLambda(handle_tool_error)], exception_key="error"
+def offload_blocking(tool):
+    # Give a sync-only tool a coroutine that runs it on the bounded blocking
+    # pool, so the async graph never blocks the event loop on SQLite or HTTP.
+    func = getattr(tool, "func", None)
+    if func is not None and getattr(tool, "coroutine", None) is None:
+        async def coroutine(*args, **kwargs):
+            return await run_blocking(func, *args, **kwargs)
+        tool.coroutine = coroutine
+    return tool
+
+
+class PendingToolNode(RunnableCallable):
+    """Runs, through a plain ToolNode, only the still unanswered calls it owns.
+
+    An AIMessage can mix safe, sensitive and routing calls, which are answered
+    by different nodes one after the other. This node runs, concurrently, the
+    pending calls to its own tools, plus calls to names outside `known_names`
+    (if given) so that a made-up tool gets its "not a valid tool" answer. The
+    ToolNode is handed a copy of the latest AIMessage trimmed to those calls.
+    """
+
+    def __init__(self, tools: list, known_names: Optional[Iterable[str]] = None, name: str = "tools") -> None:
+        self.tool_node = ToolNode(tools, name=name)
+        self.tools_by_name = self.tool_node.tools_by_name
+        self.known_names = set(known_names) if known_names is not None else None
+        super().__init__(self._func, self._afunc, name=name, trace=False)
+
+    def owns(self, call: dict) -> bool:
+        return call["name"] in self.tools_by_name or (
+            self.known_names is not None and call["name"] not in self.known_names
+        )
+
+    def _trim(self, input):
+        messages = input if isinstance(input, list) else input.get("messages", [])
+        calls = [call for call in pending_tool_calls(messages) if self.owns(call)]
+        if not calls:
+            return None
+        last_ai = next(m for m in reversed(messages) if isinstance(m, AIMessage))
+        trimmed = [*messages, last_ai.copy(update={"tool_calls": calls})]
+        return trimmed if isinstance(input, list) else {**input, "messages": trimmed}
+
+    def _func(self, input, config: RunnableConfig):
+        trimmed = self._trim(input)
+        if trimmed is None:
+            return [] if isinstance(input, list) else {"messages": []}
+        return self.tool_node.invoke(trimmed, config)
+
+    async def _afunc(self, input, config: RunnableConfig):
+        trimmed = self._trim(input)
+        if trimmed is None:
+            return [] if isinstance(input, list) else {"messages": []}
+        return await self.tool_node.ainvoke(trimmed, config)
+
+
+def create_tool_node_with_fallback(tools: list, known_names: Optional[Iterable[str]] = None) -> dict:
+    node = PendingToolNode([offload_blocking(t) for t in tools], known_names)
+    return node.with_fallbacks(
+        # RunnableCallable: unlike RunnableLambda its repr doesn't read the source
+        # file, and the whole graph is serialized on every stream() call
+        [RunnableCallable(functools.partial(handle_tool_error, owns=node.owns), name="handle_tool_error")],
+        exception_key="error",
     )
 
@@ -2,11 +2,16 @@ from typing import Optional, Union
 from datetime import date, datetime, timedelta
 
 from langchain_core.pydantic_v1 import BaseModel, Field
+from langchain_core.runnables import ensure_config
 from langchain_core.tools import tool
 
+from .formatting import MAX_ROWS, render_capped
 from .hotel_tool_handler import HotelToolHandler
+from .registry import handlers
 
-hotel_tool_handler = HotelToolHandler()
+handlers.register("hotel", HotelToolHandler, requires=["database"])
+
+HOTEL_COLUMNS = ["id", "name", "location", "price_tier"]
 
 class ToHotelBookingAssistant(BaseModel):
     """Transfer work to a specialized assistant to handle hotel bookings."""
@@ -37,7 +42,7 @@ def search_hotels(
     price_tier: Optional[str] = None,
     checkin_date: Optional[Union[datetime, date]] = None,
     checkout_date: Optional[Union[datetime, date]] = None,
-) -> list[dict]:
+) -> str:
     """
     Search for hotels based on location, name, price tier, check-in date, and check-out date. Args must be in english!
 
@@ -49,23 +54,33 @@ def search_hotels(
         checkout_date (Optional[Union[datetime, date]]): The check-out date of the hotel. Defaults to None.
 
     Returns:
-        list[dict]: A list of hotel dictionaries matching the search criteria.
+        str: A table of the hotels matching the search criteria, and available from checkin_date to checkout_date when given.
     """
-    return hotel_tool_handler.search_hotels(location, name, price_tier, checkin_date, checkout_date)
+    rows = handlers.get("hotel").search_hotels(location, name, price_tier, checkin_date, checkout_date, MAX_ROWS + 1)
+    return render_capped(rows, HOTEL_COLUMNS)
 
 
 @tool
-def book_hotel(hotel_id: int) -> str:
+def book_hotel(
+    hotel_id: int,
+    checkin_date: Optional[Union[datetime, date]] = None,
+    checkout_date: Optional[Union[datetime, date]] = None,
+) -> str:
     """
-    Book a hotel by its ID. Args must be in english!
+    Book a hotel by its ID for the given stay. Args must be in english!
 
     Args:
         hotel_id (int): The ID of the hotel to book.
+        checkin_date (Optional[Union[datetime, date]]): The check-in date of the stay. Defaults to None.
+        checkout_date (Optional[Union[datetime, date]]): The check-out date of the stay. Defaults to None.
 
     Returns:
         str: A message indicating whether the hotel was successfully booked or not.
     """
-    return hotel_tool_handler.book_hotel(hotel_id)
+    config = ensure_config()
+    configuration = config.get("configurable", {})
+    passenger_id = configuration.get("passenger_id", None)
+    return handlers.get("hotel").book_hotel(hotel_id, checkin_date, checkout_date, passenger_id)
 
 
 @tool
@@ -85,7 +100,10 @@ def update_hotel(
     Returns:
         str: A message indicating whether the hotel was successfully updated or not.
     """
-    return hotel_tool_handler.update_hotel(hotel_id, checkin_date, checkout_date)
+    config = ensure_config()
+    configuration = config.get("configurable", {})
+    passenger_id = configuration.get("passenger_id", None)
+    return handlers.get("hotel").update_hotel(hotel_id, checkin_date, checkout_date, passenger_id)
 
 
 @tool
@@ -99,7 +117,10 @@ def cancel_hotel(hotel_id: int) -> str:
     Returns:
         str: A message indicating whether the hotel was successfully cancelled or not.
     """
-    return hotel_tool_handler.cancel_hotel(hotel_id)
+    config = ensure_config()
+    configuration = config.get("configurable", {})
+    passenger_id = configuration.get("passenger_id", None)
+    return handlers.get("hotel").cancel_hotel(hotel_id, passenger_id)
 
 def get_hotel_safe_tools():
     return [search_hotels]
@@ -1,11 +1,14 @@
-import sqlite3
 from datetime import date, datetime, timedelta
 from typing import Optional, Union
 
+from .availability import available_filter, date_range, find_reservation, release, reschedule, reserve
+from .db import get_pool
+from .fulltext import TextSearch
+
 class HotelToolHandler:
-    def __init__(self) -> None:
-        # TODO add config here to set params
-        self.db = "travel2.sqlite"
+    def __init__(self, db: Optional[str] = None) -> None:
+        self.pool = get_pool(db)
+        self.db = self.pool.db_path
 
     def search_hotels(self,
         location: Optional[str] = None,
@@ -13,84 +16,80 @@ class HotelToolHandler:
         price_tier: Optional[str] = None,
         checkin_date: Optional[Union[datetime, date]] = None,
         checkout_date: Optional[Union[datetime, date]] = None,
+        limit: Optional[int] = None,
     ) -> list[dict]:
-       
-        conn = sqlite3.connect(self.db)
-        cursor = conn.cursor()
-
-        query = "SELECT * FROM hotels WHERE 1=1"
-        params = []
-
-        if location:
-            query += " AND location LIKE ?"
-            params.append(f"%{location}%")
-        if name:    
-            query += " AND name LIKE ?"
-            params.append(f"%{name}%")
-            # For the sake of this tutorial, we will let you match on any dates and price tier.
-        cursor.execute(query, params)
-        results = cursor.fetchall()
 
-        conn.close()
-
-        return [
-            dict(zip([column[0] for column in cursor.description], row)) for row in results
-        ]
+        search = TextSearch("hotels")
+        search.add("location", location, ranked=False)
+        search.add("name", name)
+        where, params = search.where_clause()
+        query = (f"SELECT hotels.id, hotels.name, hotels.location, hotels.price_tier"
+                 f"{search.from_clause()} WHERE 1=1{where}")
+
+        if price_tier:
+            query += " AND price_tier = ? COLLATE NOCASE"
+            params.append(price_tier)
+        # only what can still be booked for the requested dates
+        stay = date_range(checkin_date, checkout_date)
+        if stay:
+            clause, clause_params = available_filter("hotels", stay)
+            query += clause
+            params.extend(clause_params)
+        query += search.order_clause()
+        if limit is not None:
+            query += " LIMIT ?"
+            params.append(limit)
+        with self.pool.cursor() as cursor:
+            cursor.execute(query, params)
+            results = cursor.fetchall()
+            column_names = [column[0] for column in cursor.description]
+
+        return [dict(zip(column_names, row)) for row in results]
     
-    def book_hotel(self, hotel_id: int) -> str:
-  
-        conn = sqlite3.connect(self.db)
-        cursor = conn.cursor()
+    def book_hotel(self, hotel_id: int,
+        checkin_date: Optional[Union[datetime, date]] = None,
+        checkout_date: Optional[Union[datetime, date]] = None,
+        passenger_id: Optional[str] = None,
+    ) -> str:
 
-        cursor.execute("UPDATE hotels SET booked = 1 WHERE id = ?", (hotel_id,))
-        conn.commit()
+        with self.pool.cursor(commit=True) as cursor:
+            cursor.execute("SELECT checkin_date, checkout_date FROM hotels WHERE id = ?", (hotel_id,))
+            item = cursor.fetchone()
+            if not item:
+                return f"No hotel found with ID {hotel_id}."
+            # without dates, book the stay stored with the hotel
+            stay = date_range(checkin_date, checkout_date) or date_range(*item)
+            if stay is None:
+                return "Please provide the checkin_date and checkout_date."
+            if not reserve(cursor, "hotels", hotel_id, stay, passenger_id):
+                return f"Hotel {hotel_id} is not available from {stay[0]} to {stay[1]}."
 
-        if cursor.rowcount > 0:
-            conn.close()
-            return f"Hotel {hotel_id} successfully booked."
-        else:
-            conn.close()
-            return f"No hotel found with ID {hotel_id}." 
+        return f"Hotel {hotel_id} successfully booked from {stay[0]} to {stay[1]}."
 
     def update_hotel(self,
         hotel_id: int,
         checkin_date: Optional[Union[datetime, date]] = None,
         checkout_date: Optional[Union[datetime, date]] = None,
+        passenger_id: Optional[str] = None,
     ) -> str:
 
-        conn = sqlite3.connect(self.db)
-        cursor = conn.cursor()
-
-        if checkin_date:
-            cursor.execute(
-                "UPDATE hotels SET checkin_date = ? WHERE id = ?", (checkin_date, hotel_id)
-            )   
-        if checkout_date:
-            cursor.execute(
-                "UPDATE hotels SET checkout_date = ? WHERE id = ?",
-                (checkout_date, hotel_id),
-            )
+        with self.pool.cursor(commit=True) as cursor:
+            reservation = find_reservation(cursor, "hotels", hotel_id, passenger_id)
+            if not reservation:
+                return f"No booking found for hotel {hotel_id}."
+            reservation_id, current_start, current_end = reservation
+            stay = date_range(checkin_date or current_start, checkout_date or current_end)
+            if not reschedule(cursor, "hotels", reservation_id, hotel_id, stay):
+                return f"Hotel {hotel_id} is not available from {stay[0]} to {stay[1]}."
 
-        conn.commit()
-
-        if cursor.rowcount > 0:
-            conn.close()
-            return f"Hotel {hotel_id} successfully updated."
-        else:
-            conn.close()
-            return f"No hotel found with ID {hotel_id}."  
+        return f"Hotel {hotel_id} successfully updated."
 
-    def cancel_hotel(self, hotel_id: int) -> str:
-   
-        conn = sqlite3.connect(self.db)
-        cursor = conn.cursor()
+    def cancel_hotel(self, hotel_id: int, passenger_id: Optional[str] = None) -> str:
 
-        cursor.execute("UPDATE hotels SET booked = 0 WHERE id = ?", (hotel_id,))
-        conn.commit()
+        with self.pool.cursor(commit=True) as cursor:
+            updated = release(cursor, "hotels", hotel_id, passenger_id) > 0
 
-        if cursor.rowcount > 0:
-            conn.close()
+        if updated:
             return f"Hotel {hotel_id} successfully cancelled."
         else:
-            conn.close()
-            return f"No hotel found with ID {hotel_id}." 
\ No newline at end of file
+            return f"No booking found for hotel {hotel_id}."
@@ -0,0 +1,224 @@
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Optional
+
+
+def normalize_query(query: str) -> str:
+    query = re.sub(r"\s+", " ", query.strip().lower())
+    return query.strip(" ?!.،؟")
+
+
+class FileFingerprint:
+    """Content hash of a file, recomputed only when its mtime or size change."""
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._stat = None
+        self._digest = None
+
+    def current(self) -> str:
+        st = os.stat(self.path)
+        stat = (st.st_mtime_ns, st.st_size)
+        if stat != self._stat:
+            with open(self.path, "rb") as f:
+                self._digest = hashlib.sha256(f.read()).hexdigest()
+            self._stat = stat
+        return self._digest
+
+
+class LRUCache:
+    """In-memory LRU with per-entry TTL and hit/miss counters."""
+
+    def __init__(self, max_entries: int = 1024, ttl: Optional[float] = None) -> None:
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._data: OrderedDict[str, tuple[float, Any]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: str) -> Optional[Any]:
+        entry = self._data.get(key)
+        if entry is not None and self.ttl is not None and time.time() - entry[0] > self.ttl:
+            del self._data[key]
+            entry = None
+        if entry is None:
+            self.misses += 1
+            return None
+        self._data.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def put(self, key: str, value: Any, created: Optional[float] = None) -> None:
+        self._data[key] = (created or time.time(), value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_entries:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def pop(self, key: str) -> None:
+        self._data.pop(key, None)
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "size": len(self._data),
+        }
+
+
+class PolicyCache:
+    """Two-level cache for lookup_policy.
+
+    `translation` maps a normalized English query to its Persian translation and
+    `retrieval` maps a translated query (plus k) to the retrieved sections. The
+    retrieval level is bound to the content hash of the policy file and is
+    dropped as soon as the file changes. With `persist_path` every entry is also
+    written to a SQLite file, so a restarted process starts warm. The file is
+    held to the same limits: expired rows are purged at startup and on every
+    write, and each level keeps its `max_entries` most recently used rows.
+    """
+
+    LEVELS = ("translation", "retrieval")
+
+    def __init__(self, policy_file: str, max_entries: int = 1024,
+                 ttl: Optional[float] = 24 * 3600,
+                 persist_path: Optional[str] = None) -> None:
+        self.fingerprint = FileFingerprint(policy_file)
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._levels = {level: LRUCache(max_entries, ttl) for level in self.LEVELS}
+        self._persistent_hits = {level: 0 for level in self.LEVELS}
+        self._policy_digest = None
+        self._lock = threading.Lock()
+        self._conn = None
+        # (level, key) -> time of the last read since the last write; the
+        # accessed column is brought up to date before rows are evicted
+        self._touched: dict[tuple[str, str], float] = {}
+        if persist_path:
+            self._conn = sqlite3.connect(persist_path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS policy_cache ("
+                "level TEXT NOT NULL, key TEXT NOT NULL, policy_digest TEXT, "
+                "value TEXT NOT NULL, created REAL NOT NULL, accessed REAL NOT NULL DEFAULT 0, "
+                "PRIMARY KEY (level, key))"
+            )
+            columns = [row[1] for row in self._conn.execute("PRAGMA table_info(policy_cache)")]
+            if "accessed" not in columns:
+                # written before rows were evicted
+                self._conn.execute("ALTER TABLE policy_cache ADD COLUMN accessed REAL NOT NULL DEFAULT 0")
+                self._conn.execute("UPDATE policy_cache SET accessed = created")
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS policy_cache_accessed ON policy_cache (level, accessed)"
+            )
+            self._purge()
+            self._conn.commit()
+
+    def _purge(self) -> None:
+        """Drop expired rows, then all but the `max_entries` most recently used of each level."""
+        if self._touched:
+            self._conn.executemany(
+                "UPDATE policy_cache SET accessed = ? WHERE level = ? AND key = ?",
+                [(accessed, level, key) for (level, key), accessed in self._touched.items()],
+            )
+            self._touched.clear()
+        if self.ttl is not None:
+            self._conn.execute("DELETE FROM policy_cache WHERE created < ?", (time.time() - self.ttl,))
+        for level in self.LEVELS:
+            self._conn.execute(
+                "DELETE FROM policy_cache WHERE rowid IN (SELECT rowid FROM policy_cache WHERE level = ? "
+                "ORDER BY accessed DESC LIMIT -1 OFFSET ?)",
+                (level, self.max_entries),
+            )
+
+    def _check_policy(self) -> str:
+        digest = self.fingerprint.current()
+        if digest != self._policy_digest:
+            self._levels["retrieval"].clear()
+            if self._conn is not None:
+                self._conn.execute(
+                    "DELETE FROM policy_cache WHERE level = 'retrieval' AND policy_digest != ?",
+                    (digest,),
+                )
+                self._conn.commit()
+            self._policy_digest = digest
+        return digest
+
+    def _get(self, level: str, key: str) -> Optional[Any]:
+        with self._lock:
+            digest = self._check_policy()
+            value = self._levels[level].get(key)
+            if self._conn is None:
+                return value
+            if value is not None:
+                self._touched[(level, key)] = time.time()
+                return value
+            row = self._conn.execute(
+                "SELECT value, created FROM policy_cache WHERE level = ? AND key = ? "
+                "AND (level = 'translation' OR policy_digest = ?)",
+                (level, key, digest),
+            ).fetchone()
+            if row is None or (self.ttl is not None and time.time() - row[1] > self.ttl):
+                return None
+            value = json.loads(row[0])
+            self._touched[(level, key)] = time.time()
+            # a miss of the memory level served from disk, promote it for next time
+            self._persistent_hits[level] += 1
+            self._levels[level].put(key, value, created=row[1])
+            return value
+
+    def _put(self, level: str, key: str, value: Any) -> None:
+        with self._lock:
+            digest = self._check_policy()
+            self._levels[level].put(key, value)
+            if self._conn is not None:
+                now = time.time()
+                self._touched.pop((level, key), None)
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO policy_cache (level, key, policy_digest, value, created, accessed) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (level, key, digest, json.dumps(value, ensure_ascii=False), now, now),
+                )
+                self._purge()
+                self._conn.commit()
+
+    def get_translation(self, query: str) -> Optional[str]:
+        return self._get("translation", normalize_query(query))
+
+    def put_translation(self, query: str, translation: str) -> None:
+        self._put("translation", normalize_query(query), translation)
+
+    def get_sections(self, query: str, k: int, mode: str = "vector") -> Optional[list[str]]:
+        return self._get("retrieval", f"{mode}\x00{k}\x00{normalize_query(query)}")
+
+    def put_sections(self, query: str, k: int, sections: list[str], mode: str = "vector") -> None:
+        self._put("retrieval", f"{mode}\x00{k}\x00{normalize_query(query)}", sections)
+
+    def clear(self) -> None:
+        with self._lock:
+            for cache in self._levels.values():
+                cache.clear()
+            if self._conn is not None:
+                self._touched.clear()
+                self._conn.execute("DELETE FROM policy_cache")
+                self._conn.commit()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                level: {**cache.stats(), "persistent_hits": self._persistent_hits[level]}
+                for level, cache in self._levels.items()
+            }
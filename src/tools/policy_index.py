@@ -0,0 +1,121 @@
+import hashlib
+import heapq
+import math
+import re
+from collections import Counter, defaultdict
+
+_ARABIC_TO_PERSIAN = str.maketrans({
+    "\u064a": "\u06cc", "\u0649": "\u06cc", "\u0626": "\u06cc",  # ي ى ئ -> ی
+    "\u0643": "\u06a9",  # ك -> ک
+    "\u0629": "\u0647", "\u06c0": "\u0647",  # ة ۀ -> ه
+    "\u0623": "\u0627", "\u0625": "\u0627", "\u0671": "\u0627", "\u0622": "\u0627",  # أ إ ٱ آ -> ا
+    "\u0624": "\u0648",  # ؤ -> و
+    # zero-width non-joiner / joiner and RTL marks split words like a space
+    "\u200c": " ", "\u200d": " ", "\u200e": " ", "\u200f": " ",
+    **{chr(0x06F0 + i): str(i) for i in range(10)},
+    **{chr(0x0660 + i): str(i) for i in range(10)},
+})
+# harakat, superscript alef and tatweel
+_DIACRITICS = re.compile("[\u064b-\u065f\u0670\u0640]")
+_TOKEN = re.compile(r"\w+")
+
+PERSIAN_STOPWORDS = frozenset("""
+و در به از که این را با است برای آن یا تا هم بر می نمی شود شده باشد های ها
+یک خود بین پس اگر اما هر نیز دیگر کند کنید کرد کرده شد بود باید ای ی
+همه چه بی چون سایر طی ان اند ایم اید
+the a an of to in on for is are be can i my me do does and or with at by
+""".split())
+
+_SUFFIXES = ("هایی", "های", "ها", "ترین", "تر", "ات")
+
+
+def normalize_persian(text: str) -> str:
+    text = _DIACRITICS.sub("", text.translate(_ARABIC_TO_PERSIAN))
+    return text.lower()
+
+
+def _stem(token: str) -> str:
+    for suffix in _SUFFIXES:
+        if token.endswith(suffix) and len(token) - len(suffix) >= 2:
+            return token[: -len(suffix)]
+    return token
+
+
+def tokenize(text: str) -> list[str]:
+    """Tokenizer for mixed Persian/English text.
+
+    Arabic letter variants, Persian/Arabic digits and ZWNJ-joined compounds are
+    normalized, stopwords dropped and common plural/comparative suffixes removed.
+    """
+    return [
+        _stem(token)
+        for token in _TOKEN.findall(normalize_persian(text))
+        if token not in PERSIAN_STOPWORDS
+    ]
+
+
+def split_policy_sections(text: str) -> list[str]:
+    return re.split(r"(?=\n##)", text)
+
+
+def section_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def has_persian(text: str) -> bool:
+    return re.search("[\u0600-\u06ff]", text) is not None
+
+
+class BM25Index:
+    """Okapi BM25 over an in-memory list of documents."""
+
+    def __init__(self, documents: list[str], k1: float = 1.5, b: float = 0.75) -> None:
+        self.documents = documents
+        self.k1 = k1
+        self.b = b
+        self._postings: dict[str, list[tuple[int, int]]] = defaultdict(list)
+        self._doc_len = []
+        for doc_id, doc in enumerate(documents):
+            counts = Counter(tokenize(doc))
+            self._doc_len.append(sum(counts.values()))
+            for term, tf in counts.items():
+                self._postings[term].append((doc_id, tf))
+        n = len(documents)
+        avgdl = (sum(self._doc_len) / n) if n else 0.0
+        self._norm = [k1 * (1 - b + b * length / avgdl) for length in self._doc_len]
+        self._idf = {
+            term: math.log(1 + (n - len(posting) + 0.5) / (len(posting) + 0.5))
+            for term, posting in self._postings.items()
+        }
+
+    def scores(self, query: str) -> dict[int, float]:
+        scores: dict[int, float] = defaultdict(float)
+        for term in set(tokenize(query)):
+            idf = self._idf.get(term)
+            if idf is None:
+                continue
+            for doc_id, tf in self._postings[term]:
+                scores[doc_id] += idf * tf * (self.k1 + 1) / (tf + self._norm[doc_id])
+        return scores
+
+    def search(self, query: str, k: int = 2) -> list[tuple[int, float]]:
+        """Return up to k (document index, score) pairs, best first."""
+        return heapq.nlargest(k, self.scores(query).items(), key=lambda item: item[1])
+
+
+def fuse_scores(lexical: dict[int, float], vector: dict[int, float],
+                alpha: float = 0.5) -> dict[int, float]:
+    """Blend two score maps after min-max normalizing each; alpha weights lexical."""
+
+    def normalize(scores):
+        if not scores:
+            return {}
+        low, high = min(scores.values()), max(scores.values())
+        span = (high - low) or 1.0
+        return {doc_id: (score - low) / span for doc_id, score in scores.items()}
+
+    lexical, vector = normalize(lexical), normalize(vector)
+    return {
+        doc_id: alpha * lexical.get(doc_id, 0.0) + (1 - alpha) * vector.get(doc_id, 0.0)
+        for doc_id in set(lexical) | set(vector)
+    }
@@ -0,0 +1,63 @@
+import threading
+from typing import Any, Callable, Iterable, Optional
+
+
+class HandlerRegistry:
+    """Builds tool handlers on first use instead of at import time.
+
+    Tool modules register a factory per handler name; the handler is created the
+    first time a tool asks for it, or up front through `warmup()`.
+    """
+
+    def __init__(self) -> None:
+        self._factories: dict[str, Callable[..., Any]] = {}
+        self._kwargs: dict[str, dict] = {}
+        self._requires: dict[str, tuple] = {}
+        self._instances: dict[str, Any] = {}
+        self._lock = threading.RLock()
+
+    def register(self, name: str, factory: Callable[..., Any], requires: Iterable[str] = ()) -> None:
+        """Register `factory` under `name`; `requires` are built before it."""
+        with self._lock:
+            self._factories[name] = factory
+            self._requires[name] = tuple(requires)
+            self._kwargs.setdefault(name, {})
+
+    def configure(self, name: str, **kwargs) -> None:
+        """Set keyword arguments for the factory; drops an already built handler."""
+        with self._lock:
+            self._kwargs.setdefault(name, {}).update(kwargs)
+            self._instances.pop(name, None)
+
+    def get(self, name: str) -> Any:
+        handler = self._instances.get(name)
+        if handler is not None:
+            return handler
+        with self._lock:
+            handler = self._instances.get(name)
+            if handler is None:
+                if name not in self._factories:
+                    raise KeyError(f"No tool handler registered under {name!r}.")
+                for dependency in self._requires.get(name, ()):
+                    self.get(dependency)
+                handler = self._factories[name](**self._kwargs.get(name, {}))
+                self._instances[name] = handler
+            return handler
+
+    def is_built(self, name: str) -> bool:
+        return name in self._instances
+
+    def warmup(self, names: Optional[Iterable[str]] = None) -> None:
+        """Build the given handlers (all registered ones by default) now."""
+        for name in list(names or self._factories):
+            self.get(name)
+
+    def reset(self, name: Optional[str] = None) -> None:
+        with self._lock:
+            if name is None:
+                self._instances.clear()
+            else:
+                self._instances.pop(name, None)
+
+
+handlers = HandlerRegistry()
@@ -0,0 +1,258 @@
+import sqlite3
+from datetime import date, datetime, timezone
+from typing import Optional
+
+METADATA_TABLE = "_metadata"
+
+# Columns moved to the present by shift_to_present, per table. bookings.book_date
+# is normalised to UTC, the flight columns keep their original offset.
+SHIFTED_COLUMNS = {
+    "flights": ["scheduled_departure", "scheduled_arrival", "actual_departure", "actual_arrival"],
+    "bookings": ["book_date"],
+}
+
+
+# Numeric copies of text timestamp columns, kept in sync by triggers:
+# derived column -> (table, source column). Values are Unix seconds, rounded to
+# milliseconds, so range filters and ordering compare numbers instead of text
+# in mixed UTC offsets.
+EPOCH_COLUMNS = {
+    "scheduled_departure_epoch": ("flights", "scheduled_departure"),
+}
+
+
+def epoch_sql(column: str) -> str:
+    return f"ROUND((julianday({column}) - 2440587.5) * 86400.0, 3)"
+
+
+# Indexes the handler queries rely on, by name: (table, columns). The tables
+# come from an upstream dump without any, so ensure_schema() adds them after
+# every download or reset. The flight search indexes end in
+# (scheduled_departure_epoch, flight_id), its page order.
+INDEXES = {
+    "idx_tickets_passenger": ("tickets", ["passenger_id"]),
+    "idx_tickets_ticket_no": ("tickets", ["ticket_no"]),
+    "idx_ticket_flights_ticket_no": ("ticket_flights", ["ticket_no"]),
+    "idx_boarding_passes_ticket_flight": ("boarding_passes", ["ticket_no", "flight_id"]),
+    "idx_flights_flight_id": ("flights", ["flight_id"]),
+    "idx_flights_route_epoch": ("flights", ["departure_airport", "arrival_airport",
+                                            "scheduled_departure_epoch", "flight_id"]),
+    "idx_flights_departure_epoch": ("flights", ["departure_airport", "scheduled_departure_epoch", "flight_id"]),
+    "idx_flights_arrival_epoch": ("flights", ["arrival_airport", "scheduled_departure_epoch", "flight_id"]),
+    "idx_flights_epoch": ("flights", ["scheduled_departure_epoch", "flight_id"]),
+    "idx_hotels_id": ("hotels", ["id"]),
+    "idx_car_rentals_id": ("car_rentals", ["id"]),
+    "idx_trip_recommendations_id": ("trip_recommendations", ["id"]),
+    "idx_reservations_item": ("reservations", ["kind", "item_id", "start_date"]),
+    "idx_reservations_passenger": ("reservations", ["passenger_id", "kind", "item_id"]),
+}
+
+# Tables the dump does not have, created by ensure_schema(). reservations
+# holds one row per booked stay or rental: kind is the table of the item
+# (hotels, car_rentals), dates are ISO days and the range is [start, end).
+TABLES = {
+    "reservations": """
+        CREATE TABLE reservations (
+            id INTEGER PRIMARY KEY,
+            kind TEXT NOT NULL,
+            item_id INTEGER NOT NULL,
+            passenger_id TEXT,
+            start_date TEXT NOT NULL,
+            end_date TEXT NOT NULL
+        )""",
+}
+
+# FTS5 indexes of the searchable text columns, by table. `<table>_fts` keeps
+# its own (stemmed) copy of the text with the item id as rowid, and triggers
+# on the table keep it in sync. The 2 and 3 character prefix indexes make
+# short prefix queries as fast as whole words.
+FTS_TABLES = {
+    "hotels": ["name", "location"],
+    "car_rentals": ["name", "location"],
+    "trip_recommendations": ["name", "location", "keywords"],
+}
+
+# Bookings that predate the reservations table: (kind, start column, end column)
+BOOKED_ITEMS = [
+    ("hotels", "checkin_date", "checkout_date"),
+    ("car_rentals", "start_date", "end_date"),
+]
+
+
+def parse_timestamp(value: Optional[str]) -> Optional[datetime]:
+    if value is None or value == "\\N" or value == "":
+        return None
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        # e.g. "2024-04-28 17:00:00.000 -0400"
+        return datetime.fromisoformat(value.replace(" +", "+").replace(" -", "-"))
+
+
+def format_timestamp(value: datetime) -> str:
+    # same text pandas.to_sql writes for tz-aware timestamps
+    return value.isoformat(sep=" ", timespec="microseconds")
+
+
+def ensure_metadata_table(conn: sqlite3.Connection) -> None:
+    conn.execute(
+        f"CREATE TABLE IF NOT EXISTS {METADATA_TABLE} (key TEXT PRIMARY KEY, value TEXT)"
+    )
+
+
+def get_metadata(conn: sqlite3.Connection, key: str) -> Optional[str]:
+    ensure_metadata_table(conn)
+    row = conn.execute(f"SELECT value FROM {METADATA_TABLE} WHERE key = ?", (key,)).fetchone()
+    return row[0] if row else None
+
+
+def set_metadata(conn: sqlite3.Connection, key: str, value: str) -> None:
+    ensure_metadata_table(conn)
+    conn.execute(
+        f"INSERT OR REPLACE INTO {METADATA_TABLE} (key, value) VALUES (?, ?)", (key, value)
+    )
+
+
+def to_epoch(value: date | datetime | str | float) -> float:
+    """Unix seconds of a timestamp; dates and naive datetimes are taken as UTC."""
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, str):
+        value = parse_timestamp(value)
+    if not isinstance(value, datetime):
+        value = datetime(value.year, value.month, value.day)
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return round(value.timestamp(), 3)
+
+
+def ensure_schema(conn: sqlite3.Connection) -> list[str]:
+    """Add the missing TABLES, EPOCH_COLUMNS and FTS_TABLES (with their triggers) and INDEXES.
+
+    Tables that do not exist are skipped, `idx_` indexes no longer listed are
+    dropped. Returns the names of what was created or dropped; when anything
+    changed the planner statistics are refreshed too.
+    """
+    objects = {(type_, name) for type_, name in conn.execute("SELECT type, name FROM sqlite_master")}
+    tables = {name for type_, name in objects if type_ == "table"}
+    changed = []
+    with conn:
+        for table, ddl in TABLES.items():
+            if table not in tables:
+                conn.execute(ddl)
+                tables.add(table)
+                changed.append(table)
+                if table == "reservations":
+                    _import_booked_items(conn, tables)
+        for column, (table, source) in EPOCH_COLUMNS.items():
+            if table not in tables:
+                continue
+            columns = {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+            if column not in columns:
+                conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} REAL")
+                conn.execute(f"UPDATE {table} SET {column} = {epoch_sql(source)}")
+                changed.append(f"{table}.{column}")
+            for event in ("INSERT", f"UPDATE OF {source}"):
+                trigger = f"trg_{table}_{column}_{event.split()[0].lower()}"
+                if ("trigger", trigger) not in objects:
+                    conn.execute(
+                        f"CREATE TRIGGER {trigger} AFTER {event} ON {table} BEGIN"
+                        f" UPDATE {table} SET {column} = {epoch_sql('NEW.' + source)}"
+                        f" WHERE rowid = NEW.rowid; END"
+                    )
+                    changed.append(trigger)
+        for table, columns in FTS_TABLES.items():
+            if table in tables:
+                changed += _ensure_fts(conn, objects, table, columns)
+        for type_, name in objects:
+            if type_ == "index" and name.startswith("idx_") and name not in INDEXES:
+                conn.execute(f"DROP INDEX {name}")
+                changed.append(name)
+        for name, (table, columns) in INDEXES.items():
+            if table in tables and ("index", name) not in objects:
+                conn.execute(f"CREATE INDEX {name} ON {table} ({', '.join(columns)})")
+                changed.append(name)
+        if changed:
+            conn.execute("ANALYZE")
+    return changed
+
+
+def _ensure_fts(conn: sqlite3.Connection, objects: set, table: str, columns: list[str]) -> list[str]:
+    fts = table + "_fts"
+    names = ", ".join(columns)
+    values = ", ".join(f"NEW.{column}" for column in columns)
+    changed = []
+    if ("table", fts) not in objects:
+        conn.execute(f"CREATE VIRTUAL TABLE {fts} USING fts5({names}, tokenize='porter unicode61', prefix='2 3')")
+        conn.execute(f"INSERT INTO {fts} (rowid, {names}) SELECT id, {names} FROM {table}")
+        changed.append(fts)
+    triggers = {
+        "insert": f"AFTER INSERT ON {table} BEGIN"
+                  f" INSERT INTO {fts} (rowid, {names}) VALUES (NEW.id, {values}); END",
+        "update": f"AFTER UPDATE OF id, {names} ON {table} BEGIN DELETE FROM {fts} WHERE rowid = OLD.id;"
+                  f" INSERT INTO {fts} (rowid, {names}) VALUES (NEW.id, {values}); END",
+        "delete": f"AFTER DELETE ON {table} BEGIN DELETE FROM {fts} WHERE rowid = OLD.id; END",
+    }
+    for event, body in triggers.items():
+        trigger = f"trg_{fts}_{event}"
+        if ("trigger", trigger) not in objects:
+            conn.execute(f"CREATE TRIGGER {trigger} {body}")
+            changed.append(trigger)
+    return changed
+
+
+def _import_booked_items(conn: sqlite3.Connection, tables: set[str]) -> None:
+    for kind, start, end in BOOKED_ITEMS:
+        if kind in tables:
+            conn.execute(
+                f"INSERT INTO reservations (kind, item_id, start_date, end_date)"
+                f" SELECT ?, id, date({start}), date({end}) FROM {kind}"
+                f" WHERE booked = 1 AND date({start}) < date({end})",
+                (kind,),
+            )
+
+
+def shift_to_present(conn: sqlite3.Connection, now: Optional[datetime] = None) -> bool:
+    """Move flight and booking timestamps so the latest departure is `now`.
+
+    Only the datetime columns are rewritten, in place and in one transaction.
+    The applied shift is recorded in the metadata table, so calling this again
+    on the same file is a no-op. Returns True if the shift was applied.
+    """
+    if get_metadata(conn, "time_shift_seconds") is not None:
+        return False
+
+    latest = None
+    for (value,) in conn.execute("SELECT actual_departure FROM flights"):
+        parsed = parse_timestamp(value)
+        if parsed is not None and (latest is None or parsed > latest):
+            latest = parsed
+    if latest is None:
+        return False
+    if now is None:
+        now = datetime.now(latest.tzinfo)
+    time_diff = now - latest
+
+    def shift(value):
+        parsed = parse_timestamp(value)
+        return None if parsed is None else format_timestamp(parsed + time_diff)
+
+    def shift_utc(value):
+        parsed = parse_timestamp(value)
+        if parsed is None:
+            return None
+        if parsed.tzinfo is None:
+            parsed = parsed.replace(tzinfo=timezone.utc)
+        return format_timestamp((parsed + time_diff).astimezone(timezone.utc))
+
+    conn.create_function("shift_ts", 1, shift, deterministic=True)
+    conn.create_function("shift_ts_utc", 1, shift_utc, deterministic=True)
+    with conn:
+        conn.execute(
+            "UPDATE flights SET "
+            + ", ".join(f"{column} = shift_ts({column})" for column in SHIFTED_COLUMNS["flights"])
+        )
+        conn.execute("UPDATE bookings SET book_date = shift_ts_utc(book_date)")
+        set_metadata(conn, "time_shift_seconds", str(time_diff.total_seconds()))
+        set_metadata(conn, "time_shift_applied_at", datetime.now(timezone.utc).isoformat())
+    return True
@@ -0,0 +1,47 @@
+"""EXPLAIN QUERY PLAN checks for every query the handlers send.
+
+Each handler method runs once on the synthetic fixture database while its
+SQL is traced. Every statement must be answered from an index and no step
+may read a whole table or sort the result. The latency on scaled data is
+in benchmarks/bench_indexes.py.
+"""
+import re
+import sqlite3
+
+import pytest
+
+from benchmarks.fixtures import handler_calls, make_travel_db, traced
+from src.tools.schema import ensure_schema, shift_to_present
+
+INDEXED = ("USING INDEX", "USING COVERING INDEX", "USING INTEGER PRIMARY KEY")
+# FTS5 tables are searched through their own index, reported as a SCAN
+BARE_SCAN = re.compile(r"^SCAN (?!CONSTANT ROW$)(?!\w+ VIRTUAL TABLE INDEX )")
+
+
+@pytest.fixture(scope="module")
+def plans(tmp_path_factory):
+    db = make_travel_db(str(tmp_path_factory.mktemp("db") / "travel.sqlite"))
+    conn = sqlite3.connect(db)
+    shift_to_present(conn)  # so update_ticket_to_new_flight finds future flights
+    ensure_schema(conn)
+    calls, pool = handler_calls(db)
+    plans = [
+        (label, sql, [row[3] for row in conn.execute("EXPLAIN QUERY PLAN " + sql)])
+        for label, fn in calls
+        for sql in traced(pool, fn)
+    ]
+    pool.close_all()
+    conn.close()
+    return plans
+
+
+def test_queries_use_an_index(plans):
+    unindexed = [(label, sql) for label, sql, plan in plans
+                 if not any(marker in detail for detail in plan for marker in INDEXED)]
+    assert unindexed == []
+
+
+def test_queries_never_scan_or_sort_a_table(plans):
+    scans = [(label, detail) for label, _, plan in plans for detail in plan
+             if BARE_SCAN.match(detail) or detail.startswith("USE TEMP B-TREE")]
+    assert scans == []
@@ -0,0 +1,55 @@
+"""The assistant prompts keep a cacheable prefix, and cache hits are counted.
+
+Providers serve from their prompt cache only the part of a prompt that is
+byte for byte the same as an earlier one. The end-to-end ratio is measured
+in benchmarks/bench_prompt_cache.py.
+"""
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage
+
+from src.models.usage import UsageStats, cached_tokens
+from src.tools import prompts
+
+CONVERSATION = [HumanMessage("سلام، پرواز من کی است؟"), AIMessage("پرواز شما فردا است.")]
+
+
+def render(prompt, user_info, time):
+    messages = prompt.invoke({"messages": CONVERSATION, "user_info": user_info, "time": time}).to_messages()
+    return [(message.type, message.content.encode("utf-8")) for message in messages]
+
+
+@pytest.mark.parametrize("builder", ["get_flight_booking_prompt", "get_book_hotel_prompt", "get_car_rental_prompt",
+                                     "get_book_excursion_prompt", "get_primary_assistant_prompt"])
+def test_prefix_is_the_same_for_every_passenger_and_time(builder):
+    build = getattr(prompts, builder)
+    first = render(build(), "ticket 0000000000000, BSL to ZRH", "2024-05-01 09:00")
+    second = render(build(), "ticket 0000000000010, GVA to CDG", "2024-05-02 17:45")
+
+    # the static instructions, then the conversation; only the context after it changes
+    prefix = 1 + len(CONVERSATION)
+    assert first[:prefix] == second[:prefix]
+    assert first[prefix:] != second[prefix:]
+    assert first[0][0] == "system" and b"2024-05-01" not in first[0][1]
+
+
+@pytest.mark.parametrize("message, cached", [
+    (AIMessage("", usage_metadata={"input_tokens": 1000, "output_tokens": 10, "total_tokens": 1010,
+                                   "input_token_details": {"cache_read": 768}}), 768),
+    (AIMessage("", response_metadata={"token_usage": {"prompt_tokens": 1000, "completion_tokens": 10,
+                                                      "prompt_tokens_details": {"cached_tokens": 512}}}), 512),
+    (AIMessage("", response_metadata={"usage": {"input_tokens": 1000, "output_tokens": 10,
+                                                "cache_read_input_tokens": 256}}), 256),
+], ids=["usage_metadata", "openai", "anthropic"])
+def test_cached_tokens_read_from_every_usage_shape(message, cached):
+    assert cached_tokens(message) == cached
+
+    usage = UsageStats()
+    usage.record(message)
+    usage.record(AIMessage("no usage reported"))
+    assert usage.stats() == {
+        "calls": 2,
+        "calls_with_usage": 1,
+        "input_tokens": 1000,
+        "cached_tokens": cached,
+        "cached_ratio": cached / 1000,
+    }